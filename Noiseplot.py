@@ -1,97 +1,42 @@
-import csv
 import matplotlib.pyplot as plt
-import numpy
+from csvload import read_blocks
+from noise import DEFAULT_RBW, analyse_files, interp_rows, noise_temperature
 
 
 def readGainData(pathToFile):
-    f = open(pathToFile)
-    csv_reader = csv.reader(f)
-
-    freq = []
-    S21 = []
-
-    for line_no, line in enumerate(csv_reader, 1):
-        if line_no > 8:
-            if len(line) == 0:
-                print('Empty line...')
-            elif len(line) == 1:
-                if line[0] == 'END':
-                    print("end of file")
-                else:
-                    print('Channel Header...')
-            else:
-                freq.append(float(line[0])/1000000000)
-                S21.append(float(line[1]))
-
-    f.close()
-    return [freq, S21]
+    blocks, metadata = read_blocks(pathToFile)
+    S21 = blocks[0]
+    return [S21[:, 0]/1000000000, S21[:, 1]]
 
 def readNoiseData(pathToFile):
-    f = open(pathToFile)
-    csv_reader = csv.reader(f)
-
-    freq = []
-    TraceA = []  # dark current
-    TraceB = []
-
-    for line_no, line in enumerate(csv_reader, 1):
-        if line_no > 40:
-            if len(line) == 0:
-                print('Empty line...')
-            else:
-                freq.append(float(line[0])/1000000000)  # GHz
-                TraceA.append(float(line[1]))
-                TraceB.append(float(line[2]))
-    f.close()
-    return [freq, TraceA, TraceB]
-
-
-def computeNoise(data, gain):
-    darkCurrent = numpy.array(data[1])
-    traceB = numpy.array(data[2])
-    actualgain = numpy.array(gain[1])
-
-    # Convert from dB to linear
-    linearDark = 10**(darkCurrent/10)
-    linearB = 10**(traceB/10)
-    linearGain = 10**(actualgain/10)
-
-    # Divide by 1000 to convert to Watts
-    linearDark /= 1000
-    linearB /= 1000
-
-    # Subtract dark current from trace B
-    diff = linearB - linearDark
-
-    # Divide by linear gain to get power at input of laser in Watts
-    inputPow = diff / linearGain
-
-    print(inputPow)
-
-    kb = 1.380649e-23  # J/K
-
-    # divide by boltzmanns constant * bandwidth (megahert, 1e6) to get noise temp
-    noiseTemp = inputPow / (kb * 1e6)
-
-    return noiseTemp
-
-Shengshi = readNoiseData('C:\\Users\\ckeeler\\Desktop\\Shengshi_noise.csv')
-shenGain = readGainData('C:\\Users\\ckeeler\\Desktop\\Shengshi_gain.csv')
-
-shenNoise = computeNoise(Shengshi, shenGain)
-
-AGX = readNoiseData('C:\\Users\\ckeeler\\Desktop\\agx_noise.csv')
-AGXgain = readGainData('C:\\Users\\ckeeler\\Desktop\\agx_gain.csv')
-
-AGxNoise = computeNoise(AGX, AGXgain)
-
-fig, ax1 = plt.subplots(1, 1, layout='constrained', sharey=True)
-ax1.plot(Shengshi[0], shenNoise, label='Shengshi')
-ax1.plot(AGX[0], AGxNoise, label='AGx')
-ax1.legend()
-ax1.set_xlabel('Freq (GHz)')
-ax1.set_ylabel('Noise, K')
-
-fig.show()
-
-print("All done")
+    blocks, metadata = read_blocks(pathToFile)
+    traces = blocks[0]
+    # Trace A is the dark current
+    return [traces[:, 0]/1000000000, traces[:, 1], traces[:, 2]]  # GHz
+
+
+def computeNoise(data, gain, rbw=DEFAULT_RBW):
+    # The gain is interpolated onto the noise frequencies, so the two exports may use different grids
+    gainOnNoiseGrid = interp_rows(data[0], gain[0], gain[1])[0]
+    return noise_temperature(data[1], data[2], gainOnNoiseGrid, rbw)
+
+if __name__ == '__main__':
+    # Both DUTs in one batch, with the RBW of each taken from its SA export
+    Shengshi, AGX = analyse_files([('C:\\Users\\ckeeler\\Desktop\\Shengshi_noise.csv',
+                                    'C:\\Users\\ckeeler\\Desktop\\Shengshi_gain.csv'),
+                                   ('C:\\Users\\ckeeler\\Desktop\\agx_noise.csv',
+                                    'C:\\Users\\ckeeler\\Desktop\\agx_gain.csv')])
+
+    fig, ax1 = plt.subplots(1, 1, layout='constrained', sharey=True)
+    for name, result in (('Shengshi', Shengshi), ('AGx', AGX)):
+        freq = result['freq'] / 1000000000  # GHz
+        ax1.plot(freq, result['noise_temp'], label=name)
+        ax1.fill_between(freq, result['noise_temp'] - result['noise_temp_err'],
+                         result['noise_temp'] + result['noise_temp_err'], alpha=0.3)
+    ax1.legend()
+    ax1.set_xlabel('Freq (GHz)')
+    ax1.set_ylabel('Noise, K')
+
+    fig.show()
+
+    print("All done")
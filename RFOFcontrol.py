@@ -2,6 +2,7 @@ from pyftdi.ftdi import Ftdi
 from pyftdi.i2c import I2cController, I2cIOError
 from ftx_ctl.ftx import FTX
 from ftx_ctl.frx import FRX
+from ftx_ctl.adc import calibrate_all
 
 #  Ftdi.show_devices()
 
@@ -12,15 +13,14 @@ PID = "6048"
 i2c_receive = I2cController()
 i2c_receive.configure("ftdi://ftdi:4232h/1", interface=1)
 
-frx = FRX(i2c_receive)
-frx.adc.calibrate()
-frx.get_uuid()
-
 i2c_transmit = I2cController()
 i2c_transmit.configure("ftdi://ftdi:2232:TG110494/2", {"interface": 2})
 
-ftx = FTX(i2c_transmit)
-ftx.adc.calibrate()
+# Both ADCs calibrate at the same time
+frx = FRX(i2c_receive, wait_calibration=False)
+ftx = FTX(i2c_transmit, wait_calibration=False)
+calibrate_all([frx.adc, ftx.adc])
+frx.get_uuid()
 
 ftx.get_temp()
 ftx.get_rms_power()
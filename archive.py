@@ -0,0 +1,151 @@
+# Binary archive of two-tone measurement runs, one .npy/.json pair per DUT
+
+import datetime
+import json
+import os
+
+import numpy as np
+
+# Column order matches the CSV reports, freq is in Hz and everything else in dBm or dB
+TRACE_FIELDS = ('freq', 'pl', 'ph', 'im2', 'im3l', 'im3h', 'oip2', 'oip3', 'gain', 'iip2', 'iip3')
+CSV_HEADER = ('Frequency (Hz),PL Log Mag(dBm),PH Log Mag(dBm),IM2 Log Mag(dBm),IM3L Log Mag(dBm),'
+              'IM3H Log Mag(dBm),OIP2,OIP3,Gain,IIP2,IIP3')
+RUN_DTYPE = np.dtype([(name, '<f8') for name in TRACE_FIELDS])
+
+_MAGIC_LEN = 8  # \x93NUMPY plus the two version bytes
+_MAX_RUNS = 10**9  # header space is reserved for a run count this large
+
+
+def pack_run(freq, pl, ph, im2, im3l, im3h, oip2, oip3, gain, iip2, iip3) -> np.ndarray:
+    """Packs the eleven traces of one sweep into a structured array of RUN_DTYPE."""
+    traces = (freq, pl, ph, im2, im3l, im3h, oip2, oip3, gain, iip2, iip3)
+    run = np.empty(len(freq), dtype=RUN_DTYPE)
+    for name, values in zip(TRACE_FIELDS, traces):
+        run[name] = values
+    return run
+
+
+def _header(shape) -> str:
+    return repr({'descr': np.lib.format.dtype_to_descr(RUN_DTYPE), 'fortran_order': False, 'shape': shape})
+
+
+class MeasurementArchive:
+    """Stores every run taken on one DUT as rows of a (runs, points) structured array.
+
+    The traces live in <path>.npy, which np.load can memory map, and the per run
+    metadata (date, input power, FTX/FRX monitor snapshot, comments) is a list
+    in the <path>.json sidecar. append() adds the new row at the end and then
+    rewrites the .npy header, so a file holding many runs is never re-read and
+    an interrupted append leaves the earlier runs loadable.
+    """
+
+    def __init__(self, path):
+        base, ext = os.path.splitext(path)
+        if ext not in ('.npy', '.json'):
+            base = path
+        self.data_path = base + '.npy'
+        self.meta_path = base + '.json'
+
+    def __len__(self) -> int:
+        if not os.path.exists(self.data_path):
+            return 0
+        return self.load().shape[0]
+
+    def metadata(self) -> list:
+        if not os.path.exists(self.meta_path):
+            return []
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def load(self, mmap=True) -> np.ndarray:
+        """Returns all runs as a (runs, points) array, memory mapped read-only by default."""
+        return np.load(self.data_path, mmap_mode='r' if mmap else None)
+
+    def append(self, run, metadata=None) -> int:
+        """Adds one run (see pack_run) with its metadata dict and returns its index."""
+        run = np.ascontiguousarray(run, dtype=RUN_DTYPE)
+        if run.ndim != 1:
+            raise ValueError('Expected a single run of shape (points,), got ' + str(run.shape))
+        if os.path.exists(self.data_path):
+            index = self._append_in_place(run)
+        else:
+            self._write(run[np.newaxis])
+            index = 0
+
+        entry = {'date': datetime.datetime.now().isoformat(timespec='seconds')}
+        entry.update(metadata or {})
+        runs = self.metadata()
+        runs.append(entry)
+        # Write then rename, so a crash mid-write never leaves a truncated sidecar
+        with open(self.meta_path + '.tmp', 'w') as f:
+            json.dump(runs, f, indent=2)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+        return index
+
+    def _write(self, runs) -> None:
+        # Pad the header so it can hold _MAX_RUNS without growing, see _append_in_place
+        header = _header((_MAX_RUNS, runs.shape[1]))
+        header_len = -(-(_MAGIC_LEN + 4 + len(header) + 1) // 64) * 64 - _MAGIC_LEN - 4
+        with open(self.data_path + '.tmp', 'wb') as f:
+            f.write(np.lib.format.magic(2, 0))
+            f.write(header_len.to_bytes(4, 'little'))
+            f.write(_header(runs.shape).ljust(header_len - 1).encode('latin1') + b'\n')
+            f.write(runs.tobytes())
+        os.replace(self.data_path + '.tmp', self.data_path)
+
+    def _append_in_place(self, run) -> int:
+        with open(self.data_path, 'r+b') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+            if dtype != RUN_DTYPE or fortran_order or len(shape) != 2:
+                raise ValueError(self.data_path + ' is not a measurement archive')
+            if shape[1] != len(run):
+                raise ValueError('Run has ' + str(len(run)) + ' points, archive has ' + str(shape[1]))
+
+            len_bytes = 2 if version == (1, 0) else 4
+            header_len = data_offset - _MAGIC_LEN - len_bytes
+            header = _header((shape[0] + 1, shape[1]))
+            if len(header) + 1 > header_len:
+                # Written by something else without spare header room, rewrite it once with padding
+                runs = np.fromfile(f, dtype=RUN_DTYPE, count=shape[0] * shape[1]).reshape(shape)
+                f.close()
+                self._write(np.concatenate([runs, run[np.newaxis]]))
+                return shape[0]
+
+            # Data first, then the header that counts it, so a crash in between leaves the old runs readable
+            f.seek(data_offset + shape[0] * shape[1] * RUN_DTYPE.itemsize)
+            f.write(run.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(_MAGIC_LEN + len_bytes)
+            f.write(header.ljust(header_len - 1).encode('latin1') + b'\n')
+        return shape[0]
+
+    def export_csv(self, csv_path, runs=None) -> None:
+        """Writes the selected runs (all by default) as a CSV report readable by csvload."""
+        data = self.load()
+        metadata = self.metadata()
+        if runs is None:
+            runs = range(len(data))
+        with open(csv_path, 'w') as f:
+            for index in runs:
+                f.write('Run,' + str(index) + '\n')
+                for key, value in _flatten(metadata[index] if index < len(metadata) else {}):
+                    f.write(key + ',' + str(value) + '\n')
+                f.write(CSV_HEADER + '\n')
+                np.savetxt(f, data[index].tolist(), delimiter=',', fmt='%.10g')
+                f.write('END\n\n')
+
+
+def _flatten(metadata, prefix=''):
+    # Nested monitor snapshots come out as 'FTX Temp' style keys
+    for key, value in metadata.items():
+        if isinstance(value, dict):
+            yield from _flatten(value, prefix + key + ' ')
+        else:
+            yield prefix + key, value
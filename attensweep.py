@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+
+from archive import RUN_DTYPE, pack_run
+
+# Time for the attenuator and the RF path to settle after a new word
+ATTEN_SETTLE_TIME = 0.1
+# Attenuator step in dB, requested values are rounded to the nearest step by the board
+ATTEN_LSB = 0.25
+
+
+def set_and_verify_atten(board, value, settle=ATTEN_SETTLE_TIME, lsb=ATTEN_LSB):
+    """Sets a board's attenuation, waits for it to settle and returns the readback.
+
+    Raises ValueError if the readback is further than half a step from the requested value.
+    """
+    board.set_atten(value)
+    time.sleep(settle)
+    set_value = board.get_atten()
+    if abs(set_value - value) > lsb / 2:
+        raise ValueError('Attenuation readback ' + str(set_value) + ' does not match the requested ' + str(value))
+    return set_value
+
+
+class AttenuationSweep:
+    """Maps two-tone linearity against attenuation in one run.
+
+    steps is a list of {board name: attenuation} dicts, e.g.
+    [{'ftx': 0, 'frx': 10}, {'ftx': 5, 'frx': 10}]. boards maps each board name
+    to an object with set_atten/get_atten, and every board is driven on the
+    BusScheduler bus of the same name, so FTX and FRX settle in parallel. The
+    first step is set while the PNA channels are prepared, and every following
+    step is set as soon as the previous sweep is done, while its traces are
+    still being read out. If a step fails the sweep stops there, keeping the
+    steps measured so far, and the exception is kept in error.
+    """
+
+    def __init__(self, pna, buses, boards: dict, steps: list, settle=ATTEN_SETTLE_TIME):
+        self.pna = pna
+        self.buses = buses
+        self.boards = boards
+        self.steps = steps
+        self.settle = settle
+        # (steps, points) array of RUN_DTYPE, allocated after the first sweep, only the measured steps are kept
+        self.results = None
+        # {board name: attenuation read back} of each measured step
+        self.readbacks = []
+        self.timing = []
+        self.error = None
+
+    def _apply_step(self, step) -> list:
+        return [self.buses.submit(name, set_and_verify_atten, self.boards[name], value, self.settle)
+                for name, value in step.items()]
+
+    def run(self, input_power) -> np.ndarray:
+        """Runs every step and returns the results, one row of RUN_DTYPE traces per measured step."""
+        self.results = None
+        self.readbacks = []
+        self.timing = []
+        self.error = None
+        try:
+            self._run(input_power)
+        except Exception as ex:
+            self.error = ex
+        if self.results is not None:
+            self.results = self.results[:len(self.readbacks)]
+        return self.results
+
+    def _run(self, input_power) -> None:
+        pending = self._apply_step(self.steps[0])
+        self.pna.prepare_two_tone_test()
+        for i in range(len(self.steps)):
+            start = time.perf_counter()
+            readback = {name: future.result() for name, future in zip(self.steps[i], pending)}
+            settled = time.perf_counter()
+
+            def next_step(i=i):
+                nonlocal pending
+                pending = self._apply_step(self.steps[i + 1]) if i + 1 < len(self.steps) else []
+
+            self.pna.two_tone_test(input_power, after_sweep=next_step)
+            run = pack_run(self.pna.x_axis * 1000000000, self.pna.primary_low, self.pna.primary_high,
+                           self.pna.second_intermod, self.pna.third_intermod_low, self.pna.third_intermod_high,
+                           self.pna.OIP2, self.pna.OIP3, self.pna.gain, self.pna.IIp2, self.pna.IIp3)
+            if self.results is None:
+                self.results = np.empty((len(self.steps), len(run)), dtype=RUN_DTYPE)
+            self.results[i] = run
+            self.readbacks.append(readback)
+            self.timing.append({'atten_wait': settled - start, 'measure': time.perf_counter() - settled})
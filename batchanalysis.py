@@ -0,0 +1,149 @@
+# Re-analyses a directory of two-tone and noise CSV exports and writes one summary row per device
+
+import argparse
+import csv
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy
+
+from csvload import NotTwoToneError, read_two_tone
+from intercepts import compute_intercepts
+from noise import analyse_files
+
+NOISE_SUFFIX = '_noise.csv'
+GAIN_SUFFIX = '_gain.csv'
+
+# Header keys the two-tone input power is recorded under, by the GUI report and by MeasurementArchive.export_csv
+INPUT_POWER_KEYS = ('PNA calibration power', 'Input Power (dBm)')
+
+SUMMARY_FIELDS = ['dut', 'iip2_min', 'iip2_mean', 'iip3_min', 'iip3_mean', 'gain_mean', 'gain_flatness',
+                  'noise_temp_mean', 'noise_temp_min', 'noise_temp_max', 'nf_mean', 'nf_max', 'rbw', 'input_power', 'files']
+
+
+def find_files(paths, exclude=()):
+    """Expands directories and glob patterns into a sorted list of CSV files, leaving out the exclude paths."""
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            files.update(glob.glob(os.path.join(path, '**', '*.csv'), recursive=True))
+        else:
+            files.update(glob.glob(path, recursive=True))
+    excluded = {os.path.abspath(path) for path in exclude}
+    return sorted(f for f in files if os.path.abspath(f) not in excluded)
+
+
+def plan_jobs(files):
+    """Splits the files into two-tone jobs and (noise, gain) pairs, keyed by device name.
+
+    A noise export <dut>_noise.csv is paired with <dut>_gain.csv from the same
+    directory; every other CSV is treated as a two-tone export named after its file.
+    """
+    gain_files = {f[:-len(GAIN_SUFFIX)]: f for f in files if f.endswith(GAIN_SUFFIX)}
+    jobs = []
+    for f in files:
+        if f.endswith(GAIN_SUFFIX):
+            continue
+        if f.endswith(NOISE_SUFFIX):
+            stem = f[:-len(NOISE_SUFFIX)]
+            if stem not in gain_files:
+                print('No gain file for ' + f + ', skipping', file=sys.stderr)
+                continue
+            jobs.append((analyse_noise, os.path.basename(stem), (f, gain_files[stem])))
+        else:
+            jobs.append((analyse_two_tone, os.path.splitext(os.path.basename(f))[0], (f,)))
+    return jobs
+
+
+def input_power_from_metadata(metadata, default=None) -> float:
+    """Returns the two-tone input power in dBm recorded in a file header, or default if there is none."""
+    for key in INPUT_POWER_KEYS:
+        if key in metadata:
+            return float(metadata[key])
+    if default is None:
+        raise ValueError('No input power in the file and no --input-power given')
+    return default
+
+
+def analyse_two_tone(path_to_file, input_power) -> dict:
+    """Summarises one two-tone file, or returns None if it is not a two-tone export."""
+    try:
+        data = read_two_tone(path_to_file)
+    except NotTwoToneError:
+        return None
+    power = input_power_from_metadata(data['metadata'], input_power)
+    result = compute_intercepts(data['PL'], data['PH'], data['IM2'], data['IM3L'], data['IM3H'], power)
+    return {'iip2_min': result.iip2.min(),
+            'iip2_mean': result.iip2.mean(),
+            'iip3_min': result.iip3.min(),
+            'iip3_mean': result.iip3.mean(),
+            'gain_mean': result.gain.mean(),
+            # Peak to peak gain ripple across the band in dB
+            'gain_flatness': numpy.ptp(result.gain),
+            'input_power': power}
+
+
+def analyse_noise(noise_file, gain_file, input_power) -> dict:
+    result = analyse_files([(noise_file, gain_file)])[0]
+    return {'noise_temp_mean': result['noise_temp'].mean(),
+            'noise_temp_min': result['noise_temp'].min(),
+            'noise_temp_max': result['noise_temp'].max(),
+            'nf_mean': result['nf'].mean(),
+            'nf_max': result['nf'].max(),
+            'rbw': result['rbw']}
+
+
+def run_batch(paths, input_power=None, workers=None, exclude=()):
+    """Analyses every file under paths across a process pool and returns the summary rows.
+
+    The two-tone input power is read from each file, input_power is only used
+    for files that do not record it.
+    """
+    jobs = plan_jobs(find_files(paths, exclude))
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fn, *args, input_power): (dut, args) for fn, dut, args in jobs}
+        for future in as_completed(futures):
+            dut, args = futures[future]
+            try:
+                result = future.result()
+            except Exception as ex:
+                print('Failed to analyse ' + ', '.join(args) + ': ' + str(ex), file=sys.stderr)
+                continue
+            if result is None:
+                print(', '.join(args) + ' is not a two-tone export, skipping', file=sys.stderr)
+                continue
+            row = rows.setdefault(dut, {'dut': dut, 'files': []})
+            row.update(result)
+            row['files'].extend(os.path.basename(f) for f in args)
+    for row in rows.values():
+        row['files'] = ' '.join(sorted(row['files']))
+    return [rows[dut] for dut in sorted(rows)]
+
+
+def write_summary(rows, path_to_file) -> None:
+    with open(path_to_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch analysis of two-tone and noise CSV exports')
+    parser.add_argument('paths', nargs='+', help='directories or glob patterns of CSV files')
+    parser.add_argument('-o', '--output', default='summary.csv', help='summary table to write')
+    parser.add_argument('--input-power', type=float, default=None,
+                        help='two-tone input power in dBm for files that do not record it')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the CPU count')
+    args = parser.parse_args()
+
+    # A summary from an earlier run in the same directory is not an export
+    rows = run_batch(args.paths, args.input_power, args.workers, exclude=[args.output])
+    write_summary(rows, args.output)
+    print('Wrote ' + str(len(rows)) + ' devices to ' + args.output)
+
+
+if __name__ == '__main__':
+    main()
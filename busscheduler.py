@@ -0,0 +1,44 @@
+from concurrent.futures import Future
+
+from worker import InstrumentWorker
+
+
+class BusScheduler:
+    """Gives every I2C controller its own worker thread and request queue.
+
+    All traffic for a bus is submitted here under the bus name, so the jobs on
+    one bus run one at a time and never interleave mid-transaction, while jobs
+    on different buses (e.g. the FTX and FRX interfaces of the FTDI chip) run in
+    parallel. A job can be a whole set-then-read-back sequence.
+    """
+
+    def __init__(self):
+        self._workers = {}
+
+    def add_bus(self, name) -> None:
+        if name not in self._workers:
+            self._workers[name] = InstrumentWorker('i2c-' + name)
+
+    def remove_bus(self, name, timeout=None) -> None:
+        """Drops the queued jobs of the bus and waits for the running one to finish."""
+        worker = self._workers.pop(name, None)
+        if worker is not None:
+            worker.stop(timeout)
+
+    def has_bus(self, name) -> bool:
+        return name in self._workers
+
+    def submit(self, name, fn, *args, **kwargs) -> Future:
+        return self._workers[name].submit(fn, *args, **kwargs)
+
+    def call(self, name, fn, *args, timeout=None, **kwargs):
+        """Runs fn on the bus worker and waits for its result."""
+        worker = self._workers[name]
+        if worker.is_current():
+            # Already on the bus thread, queueing would deadlock
+            return fn(*args, **kwargs)
+        return worker.submit(fn, *args, **kwargs).result(timeout)
+
+    def stop(self, timeout=None) -> None:
+        for name in list(self._workers):
+            self.remove_bus(name, timeout)
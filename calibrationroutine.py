@@ -6,9 +6,10 @@ import sys
 import time
 from pyvisa.constants import VI_ATTR_TMO_VALUE
 import numpy as np
-import datetime
 import dearpygui.dearpygui as dpg
 from openpyxl.utils.dataframe import dataframe_to_rows
+from intercepts import compute_intercepts
+from archive import MeasurementArchive, pack_run
 
 
 def copy_channel(to_channel, name, offset, multiplier):
@@ -264,31 +265,14 @@ def two_tone_test(file_path, input_power, serial_number):
     third_intermod_high = session.query_ascii_values("CALC5:DATA? FDATA", container=np.array)
 
     # Do math on the signals
-
-    # OIP2 = PL + PH - IM2
-    OIP2 = primary_low + primary_high - second_intermod
-    # OIP3 = max((2*PL+PH-IM3L)/2, (PL+2*PH-IM3H)/2)
-    OIP3 = np.maximum((2*primary_low+primary_high-third_intermod_low)/2,
-                      (primary_low+2*primary_high-third_intermod_high)/2)
-    # gain = PL - inputPow
-    gain = primary_low - input_power
-    IIp2 = OIP2 - gain
-
-    # Read Date and Time from PC clock
-    date_time_string = time.strftime('%m%d%Y %H:%M:%S')
-    # Format Time
-    t = datetime.datetime.strptime(date_time_string, "%m%d%Y %H:%M:%S")
-    # TODO: revise the saving routine here
-
-    with open(file_path+serial_number, 'w') as f:
-        f.write('Data from Two-Tone Test\n')
-        f.write(str(t)+'\n')
-        f.write(serial_number+'\n')
-        f.write(input_power+'\n')
-        f.write('Frequency (Hz),PL Log Mag(dBm),PH Log Mag(dBm),IM2 Log Mag(dBm),IM3L Log Mag(dBm),IM3H Log Mag(dBm),'
-                'OIP2,OIP3,Gain,IIP2\n')
-        np.savetxt(f, zip(x_axis, primary_low, primary_high, second_intermod, third_intermod_low, third_intermod_high,
-                          OIP2, OIP3, gain, IIp2), delimiter=',', fmt='%f')
+    gain, OIP2, OIP3, IIp2, IIp3 = compute_intercepts(primary_low, primary_high, second_intermod,
+                                                      third_intermod_low, third_intermod_high, input_power)
+
+    # Every run on a DUT is appended to its archive, the date is recorded with it
+    archive = MeasurementArchive(file_path+serial_number)
+    archive.append(pack_run(x_axis, primary_low, primary_high, second_intermod, third_intermod_low,
+                            third_intermod_high, OIP2, OIP3, gain, IIp2, IIp3),
+                   {'Serial Number': serial_number, 'Input Power (dBm)': float(input_power)})
 
     # Plot and save the results
 
@@ -0,0 +1,55 @@
+import datetime
+import json
+import os
+
+
+class CalIndex:
+    """Host side index of the calibrated instrument states saved on the PNA.
+
+    Each entry records which .csa file on the PNA holds a finished calibration,
+    the instrument it was made on, the input power, the frequency plan and when
+    it was saved. Entries older than max_age_days are no longer offered. An
+    index file that can not be read is treated as empty, the calibrations it
+    listed are simply redone.
+    """
+
+    def __init__(self, path, max_age_days=7):
+        self.path = path
+        self.max_age = datetime.timedelta(days=max_age_days)
+        self._entries = []
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = []
+            self._entries = entries if isinstance(entries, list) else []
+
+    def _save(self) -> None:
+        # Write then rename, so a crash mid-write never leaves a truncated index
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(self.path + '.tmp', self.path)
+
+    def add(self, filename, idn, input_power, freq_plan) -> None:
+        self._entries.append({'file': filename,
+                              'idn': idn,
+                              'input_power': float(input_power),
+                              'freq_plan': freq_plan,
+                              'date': datetime.datetime.now().isoformat(timespec='seconds')})
+        self._save()
+
+    def find(self, idn, input_power, freq_plan):
+        """Returns the newest valid entry matching the instrument, power and plan, or None."""
+        oldest = datetime.datetime.now() - self.max_age
+        matches = [entry for entry in self._entries
+                   if entry['idn'] == idn and entry['input_power'] == float(input_power)
+                   and entry['freq_plan'] == freq_plan
+                   and datetime.datetime.fromisoformat(entry['date']) >= oldest]
+        if not matches:
+            return None
+        return max(matches, key=lambda entry: entry['date'])
+
+    def remove(self, filename) -> None:
+        self._entries = [entry for entry in self._entries if entry['file'] != filename]
+        self._save()
@@ -0,0 +1,96 @@
+# Loader for the CSV files exported by the PNA and the Siglent SA
+
+import numpy as np
+
+# Order of the channel blocks in a two-tone PNA export
+TWO_TONE_BLOCKS = ('PL', 'IM2', 'PH', 'IM3L', 'IM3H')
+# Leading columns of a two-tone report saved by the GUI or MeasurementArchive.export_csv, all traces in one block
+TWO_TONE_COLUMNS = ('freq', 'PL', 'PH', 'IM2', 'IM3L', 'IM3H')
+
+
+class NotTwoToneError(ValueError):
+    """Raised when a CSV file holds neither two-tone layout."""
+
+
+def _is_number(field) -> bool:
+    field = field.strip()
+    if not field or field[0] not in '0123456789+-.':
+        return False
+    try:
+        float(field)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_data_line(line) -> bool:
+    # A lone number is a header value, e.g. the power under 'PNA calibration power', not a one column block
+    fields = line.rstrip(', ').split(',', 2)
+    return len(fields) >= 2 and _is_number(fields[0])
+
+
+def read_blocks(path_to_file):
+    """Splits a CSV export into its numeric blocks and its header metadata.
+
+    The file is scanned once to find where each run of data rows starts and
+    ends, either at an END line or at the next header line, and every block is
+    then parsed in one go by NumPy. Returns (blocks, metadata), where blocks is
+    a list of 2D float arrays (rows, columns) and metadata maps each 'key,value'
+    header line to its value as a string. A number on a line of its own is
+    taken as the value of the key line before it.
+    """
+    with open(path_to_file) as f:
+        lines = f.read().splitlines()
+
+    blocks = []
+    metadata = {}
+    start = None
+    # Key line without a value, waiting for its value on the next line
+    pending_key = None
+    for line_no, line in enumerate(lines + ['END']):
+        line = line.strip()
+        if _is_data_line(line):
+            if start is None:
+                start = line_no
+            continue
+        if start is not None:
+            # Trailing commas would show up as empty columns
+            rows = [row.rstrip(', ') for row in lines[start:line_no]]
+            blocks.append(np.loadtxt(rows, delimiter=',', ndmin=2))
+            start = None
+        fields = line.lstrip('!').split(',', 1)
+        if len(fields) == 2 and fields[0].strip():
+            metadata.setdefault(fields[0].strip(), fields[1].strip().strip(','))
+            pending_key = None
+        elif pending_key is not None and _is_number(line):
+            metadata.setdefault(pending_key, line)
+            pending_key = None
+        else:
+            pending_key = fields[0].strip() or None
+    return blocks, metadata
+
+
+def read_two_tone(path_to_file) -> dict:
+    """Loads a two-tone file into a dict with 'freq' in Hz and one trace per channel.
+
+    Reads the PNA export, one (freq, value) block per channel, and the report
+    the GUI saves, one block with a column per trace and the frequency in GHz.
+    Raises NotTwoToneError for any other CSV.
+    """
+    blocks, metadata = read_blocks(path_to_file)
+    # A PNA export has exactly (freq, value) per channel, a report of 5 or more runs has as many wide blocks
+    if len(blocks) >= len(TWO_TONE_BLOCKS) and all(block.shape[1] == 2 for block in blocks):
+        data = {'freq': blocks[0][:, 0]}
+        for name, block in zip(TWO_TONE_BLOCKS, blocks):
+            data[name] = block[:, 1]
+    elif len(blocks) >= 1 and blocks[0].shape[1] >= len(TWO_TONE_COLUMNS):
+        # The first run of a report, later runs of an archive export are left out
+        data = {name: blocks[0][:, column] for column, name in enumerate(TWO_TONE_COLUMNS)}
+        if 'Frequency (GHz)' in metadata:
+            data['freq'] = data['freq'] * 1e9
+    else:
+        raise NotTwoToneError(path_to_file + ' has ' + str(len(blocks)) + ' data blocks, expected '
+                              + str(len(TWO_TONE_BLOCKS)) + ' or one with ' + str(len(TWO_TONE_COLUMNS))
+                              + ' columns')
+    data['metadata'] = metadata
+    return data
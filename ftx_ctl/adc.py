@@ -1,7 +1,8 @@
 # Methods for interacting with the TLA2528 ADC
 
-from pyftdi.i2c import I2cPort
+from pyftdi.i2c import I2cIOError, I2cPort
 from enum import Enum
+from ftx_ctl.utils import bit_set, wait_until
 
 # Opcodes
 OPCODE_READ_REG = 0b00010000
@@ -24,6 +25,26 @@ SEQUENCE_CFG = 0x10
 CHANNEL_SEL = 0x11
 AUTO_SEQ_CH_SEL = 0x12
 
+# Configuration registers mirrored by the driver, all of them are 0 after a reset
+SHADOWED_REGS = (DATA_CFG, OSR_CFG, OPMODE_CFG, PIN_CFG, GPIO_CFG, GPO_DRIVE_CFG, GPO_VALUE, SEQUENCE_CFG,
+                 CHANNEL_SEL, AUTO_SEQ_CH_SEL)
+
+# Register fields
+GENERAL_CFG_RST = 0b00000001
+GENERAL_CFG_CAL = 0b00000010
+DATA_CFG_APPEND_CHANNEL_ID = 0b00010000
+SEQ_MODE_MANUAL = 0b00000000
+SEQ_MODE_AUTO = 0b00000001
+SEQ_START = 0b00010000
+
+
+def calibrate_all(adcs: list, timeout: float = 0.5):
+    """Calibrates several ADCs, e.g. on the FTX and FRX, at the same time instead of one after the other."""
+    for adc in adcs:
+        adc.start_calibration()
+    for adc in adcs:
+        adc.wait_calibration(timeout)
+
 
 class PinMode(Enum):
     AnalogInput = 1
@@ -36,57 +57,183 @@ class TLA2528:
     def __init__(self, i2c: I2cPort):
         self.i2c = i2c
         self.oversampling = False
+        # Channels in the running auto-sequence, None in manual mode
+        self.sequence = None
+        # Write-through copy of the configuration registers, filled on reset or first access
+        self._shadow = {}
 
     def _write_reg(self, reg: int, payload: int):
+        if self._shadow.get(reg) == payload:
+            return
         self.i2c.write([OPCODE_WRITE_REG, reg, payload])
+        if reg in SHADOWED_REGS:
+            self._shadow[reg] = payload
 
     def _set_bits_reg(self, reg: int, bits: int):
-        self.i2c.write([OPCODE_SET_BIT, reg, bits])
+        if reg in self._shadow:
+            # Known value, so skip the write if nothing changes or send it as one full write
+            self._write_reg(reg, self._shadow[reg] | bits)
+        else:
+            self.i2c.write([OPCODE_SET_BIT, reg, bits])
 
     def _clear_bits_reg(self, reg: int, bits: int):
-        self.i2c.write([OPCODE_CLEAR_BIT, reg, bits])
+        if reg in self._shadow:
+            self._write_reg(reg, self._shadow[reg] & ~bits)
+        else:
+            self.i2c.write([OPCODE_CLEAR_BIT, reg, bits])
 
     def _read_reg(self, reg: int) -> int:
         return self.i2c.exchange([OPCODE_READ_REG, reg], 1)[0]
 
+    def _get_reg(self, reg: int) -> int:
+        # Configuration registers come from the shadow, anything else from the bus
+        if reg not in self._shadow:
+            value = self._read_reg(reg)
+            if reg not in SHADOWED_REGS:
+                return value
+            self._shadow[reg] = value
+        return self._shadow[reg]
+
     def _change_bit(self, reg: int, bit: int, val: bool):
         if val:
             self._set_bits_reg(reg, 1 << bit)
         else:
             self._clear_bits_reg(reg, 1 << bit)
 
-    def reset(self):
-        self._write_reg(GENERAL_CFG, 0b00000001)
-
-    def calibrate(self):
-        self._write_reg(GENERAL_CFG, 0b00000010)
-        while self._read_reg(GENERAL_CFG) & 0b00000010:
-            pass
+    def reset(self, timeout: float = 0.1):
+        self._write_reg(GENERAL_CFG, GENERAL_CFG_RST)
+        wait_until(lambda: not self._read_reg(GENERAL_CFG) & GENERAL_CFG_RST, timeout, 'TLA2528 reset')
+        self._shadow = dict.fromkeys(SHADOWED_REGS, 0)
+        self.oversampling = False
+        self.sequence = None
+
+    def resync(self):
+        """Reloads the shadow from the chip, e.g. after the board may have been power cycled."""
+        self._shadow = {reg: self._read_reg(reg) for reg in SHADOWED_REGS}
+        self.oversampling = self._shadow[OSR_CFG] != 0
+        if self._shadow[SEQUENCE_CFG] & SEQ_MODE_AUTO == 0:
+            self.sequence = None
+
+    def verify(self) -> dict[int, tuple[int, int]]:
+        """Compares the shadow against the chip and returns {reg: (shadow, actual)} for every mismatch."""
+        mismatches = {}
+        for reg, value in self._shadow.items():
+            actual = self._read_reg(reg)
+            if actual != value:
+                mismatches[reg] = (value, actual)
+        return mismatches
+
+    def start_calibration(self):
+        """Starts an offset calibration without waiting, see wait_calibration()."""
+        self._write_reg(GENERAL_CFG, GENERAL_CFG_CAL)
+
+    def is_calibrating(self) -> bool:
+        return bool(self._read_reg(GENERAL_CFG) & GENERAL_CFG_CAL)
+
+    def wait_calibration(self, timeout: float = 0.5):
+        wait_until(lambda: not self.is_calibrating(), timeout, 'TLA2528 calibration')
+
+    def calibrate(self, timeout: float = 0.5):
+        self.start_calibration()
+        self.wait_calibration(timeout)
 
     def set_osr(self, osr: int):
         self._write_reg(OSR_CFG, osr)
         self.oversampling = osr != 0
 
     def configure_pin(self, pin: int, mode: PinMode):
-        match mode:
-            case PinMode.AnalogInput:
-                self._change_bit(PIN_CFG, pin, False)
-            case PinMode.DigitalInput:
-                self._change_bit(PIN_CFG, pin, True)
-                self._change_bit(GPIO_CFG, pin, False)
-            case PinMode.PushPullOutput:
-                self._change_bit(PIN_CFG, pin, True)
-                self._change_bit(GPIO_CFG, pin, True)
-                self._change_bit(GPO_DRIVE_CFG, pin, True)
-            case PinMode.OpenDrainOutput:
-                self._change_bit(PIN_CFG, pin, True)
-                self._change_bit(GPIO_CFG, pin, True)
-                self._change_bit(GPO_DRIVE_CFG, pin, False)
-
-    # FIXME
+        self.configure_pins({pin: mode})
+
+    def configure_pins(self, modes: dict[int, PinMode]):
+        """Configures several pins at once, with at most one write per configuration register."""
+        pin_cfg = self._get_reg(PIN_CFG)
+        gpio_cfg = self._get_reg(GPIO_CFG)
+        drive_cfg = self._get_reg(GPO_DRIVE_CFG)
+        for pin, mode in modes.items():
+            match mode:
+                case PinMode.AnalogInput:
+                    pin_cfg = bit_set(pin_cfg, pin, False)
+                case PinMode.DigitalInput:
+                    pin_cfg = bit_set(pin_cfg, pin, True)
+                    gpio_cfg = bit_set(gpio_cfg, pin, False)
+                case PinMode.PushPullOutput:
+                    pin_cfg = bit_set(pin_cfg, pin, True)
+                    gpio_cfg = bit_set(gpio_cfg, pin, True)
+                    drive_cfg = bit_set(drive_cfg, pin, True)
+                case PinMode.OpenDrainOutput:
+                    pin_cfg = bit_set(pin_cfg, pin, True)
+                    gpio_cfg = bit_set(gpio_cfg, pin, True)
+                    drive_cfg = bit_set(drive_cfg, pin, False)
+        self._write_reg(PIN_CFG, pin_cfg)
+        self._write_reg(GPIO_CFG, gpio_cfg)
+        self._write_reg(GPO_DRIVE_CFG, drive_cfg)
+
+    def _stop_sequence(self):
+        self._write_reg(SEQUENCE_CFG, SEQ_MODE_MANUAL)
+        self.sequence = None
+
+    def _raw_to_float(self, raw: int) -> float:
+        if not self.oversampling:
+            return raw / 2**12
+        else:
+            return raw / 2**16
+
+    def configure_sequence(self, pins: list[int]):
+        """Starts auto-sequencing over the given analog pins.
+
+        Each following read frame converts the next channel in the sequence, with
+        the channel ID appended so read_sequence() can tell the results apart.
+        """
+        pins = sorted(set(pins))
+        mask = 0
+        for pin in pins:
+            mask |= 1 << pin
+        self._write_reg(SEQUENCE_CFG, SEQ_MODE_MANUAL)
+        self._write_reg(AUTO_SEQ_CH_SEL, mask)
+        self._write_reg(DATA_CFG, DATA_CFG_APPEND_CHANNEL_ID)
+        self._write_reg(OPMODE_CFG, 0b00000001)
+        # Mode has to be selected before the sequence is started
+        self._write_reg(SEQUENCE_CFG, SEQ_MODE_AUTO)
+        self._set_bits_reg(SEQUENCE_CFG, SEQ_START)
+        self.sequence = pins
+
+    def read_sequence(self, pins: list[int] = None) -> dict[int, float]:
+        """Reads every channel of the sequence in one I2C transaction, keyed by pin.
+
+        If pins is given and differs from the running sequence, the sequence is
+        reconfigured first.
+        """
+        if pins is not None and sorted(set(pins)) != self.sequence:
+            self.configure_sequence(pins)
+        if self.sequence is None:
+            raise ValueError('No auto-sequence configured')
+        # 12 bits plus the 4 bit ID, or 16 bits plus the ID and 4 pad bits when oversampling
+        frame = 3 if self.oversampling else 2
+        data = self.i2c.read(frame * len(self.sequence))
+        values = {}
+        channels = []
+        for i in range(0, len(data), frame):
+            if not self.oversampling:
+                raw = (data[i] << 4) | (data[i + 1] >> 4)
+                channel = data[i + 1] & 0x0F
+            else:
+                raw = (data[i] << 8) | data[i + 1]
+                channel = data[i + 2] >> 4
+            channels.append(channel)
+            values[channel] = self._raw_to_float(raw)
+        # Every channel of the sequence is converted once per burst, anything else is a corrupted frame
+        if sorted(channels) != self.sequence:
+            raise I2cIOError('TLA2528 sequence returned channels ' + str(channels) + ', expected '
+                             + str(self.sequence))
+        return values
+
     def analog_read(self, pin: int) -> float:
+        if self.sequence is not None:
+            self._stop_sequence()
         self._write_reg(CHANNEL_SEL, pin)
         self._write_reg(OPMODE_CFG, 0b00000001)
+        # In manual mode the read frame starts the conversion, and the ADC stretches SCL until it and any
+        # averaging are done, so the data is always the finished result
         # Will always be two bytes
         data = self.i2c.read(2)
         # If we're not oversampling, shift by 4
@@ -10,11 +10,34 @@ CONFIG = 0x3
 class TCA6408A:
     def __init__(self, i2c: I2cPort):
         self.i2c = i2c
+        # Last value written to each register, the driver is the only writer
+        self._shadow = {}
         # Set the control pins to output
-        self.i2c.write([CONFIG, 0x0])
+        self._write_reg(CONFIG, 0x0)
+
+    def _write_reg(self, reg: int, value: int):
+        if self._shadow.get(reg) == value:
+            return
+        self.i2c.write([reg, value])
+        self._shadow[reg] = value
 
     def write(self, word: int):
-        self.i2c.write([OUTPUT, word])
+        self._write_reg(OUTPUT, word)
 
     def read(self) -> int:
-        return self.i2c.read_from(OUTPUT, 1)[0]
+        if OUTPUT not in self._shadow:
+            self._shadow[OUTPUT] = self.i2c.read_from(OUTPUT, 1)[0]
+        return self._shadow[OUTPUT]
+
+    def resync(self):
+        """Reloads the shadow from the chip, e.g. after the board may have been power cycled."""
+        self._shadow = {reg: self.i2c.read_from(reg, 1)[0] for reg in (OUTPUT, CONFIG)}
+
+    def verify(self) -> dict[int, tuple[int, int]]:
+        """Compares the shadow against the chip and returns {reg: (shadow, actual)} for every mismatch."""
+        mismatches = {}
+        for reg, value in self._shadow.items():
+            actual = self.i2c.read_from(reg, 1)[0]
+            if actual != value:
+                mismatches[reg] = (value, actual)
+        return mismatches
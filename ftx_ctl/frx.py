@@ -13,6 +13,7 @@ ADDR_UUID = 0b1011000
 ADC_TEMP = 0
 ADC_PD_IMON = 1
 ADC_RF_MON = 2
+ADC_MONITORS = [ADC_TEMP, ADC_PD_IMON, ADC_RF_MON]
 
 # Board constants
 VREF = 5.0
@@ -21,14 +22,18 @@ IPD_SENSE_R = 62
 
 
 class FRX:
-    def _setup_adc(self):
+    def _setup_adc(self, wait_calibration: bool):
         # Setup the ADC/GPIO
         self.adc.reset()
-        self.adc.calibrate()
         self.adc.set_osr(3)
         # Pins 0-4 are analog inputs by default
+        self.adc.start_calibration()
+        if wait_calibration:
+            self.adc.wait_calibration()
 
-    def __init__(self, i2c: I2cController):
+    # With wait_calibration=False the ADC is still calibrating on return, so other boards can be
+    # set up meanwhile, call adc.wait_calibration() before the first read
+    def __init__(self, i2c: I2cController, wait_calibration: bool = True):
         self.i2c = i2c
 
         self.atten = TCA6408A(i2c.get_port(ADDR_ATTEN))
@@ -36,7 +41,7 @@ class FRX:
         self.uuid = i2c.get_port(ADDR_UUID)
 
         # Perform initial setup
-        self._setup_adc()
+        self._setup_adc(wait_calibration)
 
     def _read_current(self, pin: int, sense_r: float) -> float:
         return raw_to_current(self.adc.analog_read(pin), SENSE_GAIN, sense_r, VREF)
@@ -44,18 +49,24 @@ class FRX:
     def set_atten(self, word: int):
         self.atten.write(word)
 
-    # In C
-    def get_temp(self) -> float:
+    @staticmethod
+    def _raw_to_temp(raw: float) -> float:
         tc = 19.5  # mV/C
         v0 = 400  # mV
-        raw = self.adc.analog_read(ADC_TEMP)
         raw_mv = raw * 5000
         return (raw_mv - v0) / tc
 
+    @staticmethod
+    def _raw_to_rms_power(raw: float) -> float:
+        return 17.74 * (raw * 5) - 55
+
+    # In C
+    def get_temp(self) -> float:
+        return self._raw_to_temp(self.adc.analog_read(ADC_TEMP))
+
     # Approximate, will need calibration
     def get_rms_power(self) -> float:
-        raw = self.adc.analog_read(ADC_RF_MON)
-        return 17.74 * (raw * 5) - 55
+        return self._raw_to_rms_power(self.adc.analog_read(ADC_RF_MON))
 
     def get_uuid(self) -> bytes:
         return self.uuid.read_from(0b10000000, 16)
@@ -63,3 +74,10 @@ class FRX:
     # In mA
     def get_pd_current(self) -> float:
         return self._read_current(ADC_PD_IMON, IPD_SENSE_R) * 1e3
+
+    # Every analog monitor from a single auto-sequence burst, same units as the getters
+    def read_all_monitors(self) -> dict[str, float]:
+        raw = self.adc.read_sequence(ADC_MONITORS)
+        return {'temp': self._raw_to_temp(raw[ADC_TEMP]),
+                'pd_current': raw_to_current(raw[ADC_PD_IMON], SENSE_GAIN, IPD_SENSE_R, VREF) * 1e3,
+                'rms_power': self._raw_to_rms_power(raw[ADC_RF_MON])}
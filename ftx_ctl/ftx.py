@@ -1,4 +1,7 @@
 # Class for the entire FTX API
+import time
+
+import numpy as np
 from pyftdi.i2c import I2cController
 from ftx_ctl.adc import TLA2528, PinMode
 from ftx_ctl.atten import TCA6408A
@@ -19,6 +22,7 @@ ADC_LNA_IMON = 3
 ADC_LD_IMON = 4
 ADC_LNA_FAULT = 5
 ADC_LNA_EN = 6
+ADC_MONITORS = [ADC_TEMP, ADC_PD_IMON, ADC_RF_MON, ADC_LNA_IMON, ADC_LD_IMON]
 
 # Board constants
 VREF = 5.0
@@ -27,18 +31,28 @@ IPD_SENSE_R = 62
 ILD_SENSE_R = 1
 ILNA_SENSE_R = 0.5
 
+# Laser sweep settling, readback changes below these over SETTLE_INTERVAL count as settled
+SETTLE_LD_TOLERANCE = 0.05  # mA
+SETTLE_PD_TOLERANCE = 0.005  # mA
+SETTLE_INTERVAL = 0.01  # s
+SETTLE_TIMEOUT = 0.5  # s
+
 
 class FTX:
-    def _setup_adc(self):
+    def _setup_adc(self, wait_calibration: bool):
         # Setup the ADC/GPIO
         self.adc.reset()
-        self.adc.calibrate()
         self.adc.set_osr(3)
         # Pins 0-4 are analog inputs by default
-        self.adc.configure_pin(ADC_LNA_FAULT, PinMode.DigitalInput)
-        self.adc.configure_pin(ADC_LNA_EN, PinMode.PushPullOutput)
-
-    def __init__(self, i2c: I2cController):
+        self.adc.configure_pins({ADC_LNA_FAULT: PinMode.DigitalInput,
+                                 ADC_LNA_EN: PinMode.PushPullOutput})
+        self.adc.start_calibration()
+        if wait_calibration:
+            self.adc.wait_calibration()
+
+    # With wait_calibration=False the ADC is still calibrating on return, so other boards can be
+    # set up meanwhile, call adc.wait_calibration() before the first read
+    def __init__(self, i2c: I2cController, wait_calibration: bool = True):
         self.i2c = i2c
 
         self.digipot = CAT5171(i2c.get_port(ADDR_DIGIPOT))
@@ -47,7 +61,7 @@ class FTX:
         self.uuid = i2c.get_port(ADDR_UUID)
 
         # Perform initial setup
-        self._setup_adc()
+        self._setup_adc(wait_calibration)
 
     def _read_current(self, pin: int, sense_r: float) -> float:
         return raw_to_current(self.adc.analog_read(pin), SENSE_GAIN, sense_r, VREF)
@@ -58,14 +72,21 @@ class FTX:
     def set_ld_current(self, val: int):
         self.digipot.set(val)
 
-    # In C
-    def get_temp(self) -> float:
+    @staticmethod
+    def _raw_to_temp(raw: float) -> float:
         tc = 19.5  # mV/C
         v0 = 400  # mV
-        raw = self.adc.analog_read(ADC_TEMP)
         raw_mv = raw * 5000
         return (raw_mv - v0) / tc
 
+    @staticmethod
+    def _raw_to_rms_power(raw: float) -> float:
+        return 17.74 * (raw * 5) - 55
+
+    # In C
+    def get_temp(self) -> float:
+        return self._raw_to_temp(self.adc.analog_read(ADC_TEMP))
+
     # In mA
     def get_ld_current(self) -> float:
         return self._read_current(ADC_LD_IMON, ILD_SENSE_R) * 1e3
@@ -79,8 +100,7 @@ class FTX:
 
     # Approximate, will need calibration
     def get_rms_power(self) -> float:
-        raw = self.adc.analog_read(ADC_RF_MON)
-        return 17.74 * (raw * 5) - 55
+        return self._raw_to_rms_power(self.adc.analog_read(ADC_RF_MON))
 
     # Returns true if the LNA is in a fault state
     def get_lna_fault(self) -> bool:
@@ -92,3 +112,53 @@ class FTX:
     # In mA
     def get_pd_current(self) -> float:
         return self._read_current(ADC_PD_IMON, IPD_SENSE_R) * 1e3
+
+    def sweep_ld_current(self, codes=range(256), interval: float = SETTLE_INTERVAL,
+                         timeout: float = SETTLE_TIMEOUT) -> dict[str, np.ndarray]:
+        """Steps the laser digipot through codes and reads the monitors at every step.
+
+        After each wiper write the monitors are read every interval seconds
+        until LD and PD current change by no more than the SETTLE tolerances
+        from one reading to the next, or timeout seconds have passed. Readings
+        taken back to back would agree while the laser is still drifting.
+        Returns arrays for an L-I curve: 'code', 'ld_current' and 'pd_current'
+        in mA, 'rms_power' in dBm, 'reads' taken and 'settled'. The wiper is
+        left at the last code.
+        """
+        codes = np.asarray(codes, dtype=int)
+        ld_current = np.empty(len(codes))
+        pd_current = np.empty(len(codes))
+        rms_power = np.empty(len(codes))
+        reads = np.empty(len(codes), dtype=int)
+        settled = np.zeros(len(codes), dtype=bool)
+        for i, code in enumerate(codes):
+            self.set_ld_current(int(code))
+            deadline = time.monotonic() + timeout
+            previous = self.read_all_monitors()
+            n = 1
+            while True:
+                time.sleep(interval)
+                values = self.read_all_monitors()
+                n += 1
+                if (abs(values['ld_current'] - previous['ld_current']) <= SETTLE_LD_TOLERANCE
+                        and abs(values['pd_current'] - previous['pd_current']) <= SETTLE_PD_TOLERANCE):
+                    settled[i] = True
+                    break
+                if time.monotonic() >= deadline:
+                    break
+                previous = values
+            ld_current[i] = values['ld_current']
+            pd_current[i] = values['pd_current']
+            rms_power[i] = values['rms_power']
+            reads[i] = n
+        return {'code': codes, 'ld_current': ld_current, 'pd_current': pd_current, 'rms_power': rms_power,
+                'reads': reads, 'settled': settled}
+
+    # Every analog monitor from a single auto-sequence burst, same units as the getters
+    def read_all_monitors(self) -> dict[str, float]:
+        raw = self.adc.read_sequence(ADC_MONITORS)
+        return {'temp': self._raw_to_temp(raw[ADC_TEMP]),
+                'pd_current': raw_to_current(raw[ADC_PD_IMON], SENSE_GAIN, IPD_SENSE_R, VREF) * 1e3,
+                'rms_power': self._raw_to_rms_power(raw[ADC_RF_MON]),
+                'lna_current': raw_to_current(raw[ADC_LNA_IMON], SENSE_GAIN, ILNA_SENSE_R, VREF) * 1e3,
+                'ld_current': raw_to_current(raw[ADC_LD_IMON], SENSE_GAIN, ILD_SENSE_R, VREF) * 1e3}
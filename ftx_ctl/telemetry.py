@@ -0,0 +1,125 @@
+# Background sampling of the FTX/FRX monitor values into a ring buffer
+import threading
+import time
+
+import numpy as np
+
+
+def read_getters(getters: dict) -> callable:
+    """Turns {name: getter} into a read function for TelemetrySampler.
+
+    A getter that fails gives NaN for that sample instead of losing the others.
+    """
+    def read() -> dict:
+        values = {}
+        for name, getter in getters.items():
+            try:
+                values[name] = float(getter())
+            except Exception:
+                values[name] = np.nan
+        return values
+    return read
+
+
+class TelemetrySampler:
+    """Samples monitor channels on its own thread into a fixed size NumPy ring buffer.
+
+    read() returns a {channel: value} dict, e.g. FTX.read_all_monitors or the
+    function made by read_getters. Every sample is stored with its time.time()
+    stamp, and plots, statistics and exports are served from the buffer, so
+    callers never have to touch the bus. Pass the lock that guards the I2C
+    controller so samples never interleave with other transactions on it.
+    """
+
+    def __init__(self, read, channels: list[str], rate: float = 10.0, capacity: int = 36000, lock=None):
+        self.read = read
+        self.channels = list(channels)
+        self.rate = rate
+        self.lock = lock if lock is not None else threading.Lock()
+        self.errors = 0
+        self._times = np.full(capacity, np.nan)
+        self._data = np.full((capacity, len(self.channels)), np.nan)
+        self._count = 0
+        self._buffer_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def capacity(self) -> int:
+        return len(self._times)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sample_once(self):
+        with self.lock:
+            try:
+                values = self.read()
+            except Exception:
+                # Keep sampling through the odd I2C error, the gap shows up as NaN
+                values = {}
+                self.errors += 1
+        row = [values.get(channel, np.nan) for channel in self.channels]
+        with self._buffer_lock:
+            index = self._count % self.capacity
+            self._times[index] = time.time()
+            self._data[index] = row
+            self._count += 1
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            self.sample_once()
+            # Fixed schedule, skipping ahead if a sample ran longer than the period
+            next_time = max(next_time + 1 / self.rate, time.monotonic())
+            self._stop.wait(next_time - time.monotonic())
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def snapshot(self, last: int = None) -> tuple[np.ndarray, np.ndarray]:
+        """Returns copies of (times, data) in chronological order, data is (samples, channels)."""
+        with self._buffer_lock:
+            n = min(self._count, self.capacity)
+            if last is not None:
+                n = min(n, last)
+            order = (np.arange(self._count - n, self._count)) % self.capacity
+            return self._times[order], self._data[order]
+
+    def series(self, channel: str, last: int = None) -> tuple[np.ndarray, np.ndarray]:
+        times, data = self.snapshot(last)
+        return times, data[:, self.channels.index(channel)]
+
+    def latest(self) -> dict:
+        times, data = self.snapshot(1)
+        if len(times) == 0:
+            return dict.fromkeys(self.channels, np.nan)
+        return dict(zip(self.channels, data[0]))
+
+    def stats(self, last: int = None) -> dict:
+        """Returns {channel: {'min', 'max', 'mean'}}, ignoring failed samples."""
+        times, data = self.snapshot(last)
+        result = {}
+        for i, channel in enumerate(self.channels):
+            column = data[:, i]
+            column = column[~np.isnan(column)]
+            if len(column) == 0:
+                result[channel] = {'min': np.nan, 'max': np.nan, 'mean': np.nan}
+            else:
+                result[channel] = {'min': column.min(), 'max': column.max(), 'mean': column.mean()}
+        return result
+
+    def export_csv(self, path_to_file):
+        times, data = self.snapshot()
+        np.savetxt(path_to_file, np.column_stack([times, data]), delimiter=',', fmt='%.10g',
+                   header='time,' + ','.join(self.channels), comments='')
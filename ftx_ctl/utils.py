@@ -1,3 +1,20 @@
+import time
+
+
+def wait_until(done, timeout: float, what: str, initial_delay: float = 0.0005, max_delay: float = 0.01):
+    """Polls done() with exponential backoff until it returns True.
+
+    Raises TimeoutError naming what was being waited for once timeout seconds pass.
+    """
+    deadline = time.monotonic() + timeout
+    delay = initial_delay
+    while not done():
+        if time.monotonic() > deadline:
+            raise TimeoutError('Timed out after ' + str(timeout) + ' s waiting for ' + what)
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
 def bit_set(value: int, bit: int, val: bool) -> int:
     return (value & ~(1 << bit)) | (val << bit)
 
@@ -0,0 +1,255 @@
+# Callback dispatch and frame pacing for the manually driven DearPyGui render loop
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import dearpygui.dearpygui as dpg
+
+# Seconds of callback work allowed per frame before the rest waits for the next one
+FRAME_BUDGET = 0.008
+
+# Frame rate while there is input or work to show, and while there is not
+TARGET_FPS = 60
+IDLE_FPS = 5
+# Seconds without input or queued work before dropping to IDLE_FPS
+IDLE_AFTER = 1.0
+
+
+def _arity(fn) -> int:
+    # DearPyGui passes (sender, app_data, user_data), a callback takes as many of them as it declares
+    try:
+        parameters = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return 3
+    count = 0
+    for parameter in parameters:
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return 3
+        if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return min(count, 3)
+
+
+class CallbackDispatcher:
+    """Runs DearPyGui callbacks and jobs from other threads on the render thread.
+
+    Both kinds of work wait in deques and are run in order, until the frame
+    budget is spent, so a burst of callbacks is spread over a few frames
+    instead of stalling rendering. How many arguments each callback takes is
+    looked up once and cached. Run times are counted per handler, see report().
+    """
+
+    def __init__(self, budget=FRAME_BUDGET):
+        self.budget = budget
+        self._callbacks = deque()
+        # (future, fn, args, kwargs) handed over by other threads, see call_on_render_thread
+        self._jobs = deque()
+        self._arities = {}
+        # handler name -> [calls, total seconds, longest seconds]
+        self.stats = {}
+        # Set whenever another thread posts a job, so an idle render loop wakes up for it
+        self.posted = threading.Event()
+        # Set by close(), guarded by _lock so a job is never posted after the queue was drained
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def pending(self) -> int:
+        return len(self._callbacks) + len(self._jobs)
+
+    def collect(self) -> None:
+        """Moves the callbacks DearPyGui queued since the last frame into the dispatcher."""
+        jobs = dpg.get_callback_queue()  # retrieves and clears queue
+        if jobs:
+            self._callbacks.extend(jobs)
+
+    def post(self, fn, args=(), kwargs=None) -> Future:
+        """Queues fn to run on the render thread, safe to call from any thread."""
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.cancel()
+                return future
+            self._jobs.append((future, fn, args, kwargs or {}))
+        self.posted.set()
+        return future
+
+    def close(self) -> None:
+        """Cancels the queued jobs and any posted later, for when the render loop is shutting down.
+
+        A thread waiting on one of their results gets CancelledError instead of
+        blocking on a render thread that will never run the job.
+        """
+        with self._lock:
+            self._closed = True
+            while self._jobs:
+                self._jobs.popleft()[0].cancel()
+
+    def arity(self, fn) -> int:
+        arity = self._arities.get(fn)
+        if arity is None:
+            arity = self._arities[fn] = _arity(fn)
+        return arity
+
+    def _record(self, fn, seconds) -> None:
+        name = getattr(fn, '__qualname__', None) or repr(fn)
+        entry = self.stats.get(name)
+        if entry is None:
+            self.stats[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+
+    def _run_callback(self, job) -> None:
+        fn = job[0]
+        if fn is None:
+            return
+        start = time.perf_counter()
+        match self.arity(fn):
+            case 0:
+                fn()
+            case 1:
+                fn(job[1])
+            case 2:
+                fn(job[1], job[2])
+            case _:
+                fn(job[1], job[2], job[3])
+        self._record(fn, time.perf_counter() - start)
+
+    def _run_job(self, job) -> None:
+        future, fn, args, kwargs = job
+        if not future.set_running_or_notify_cancel():
+            return
+        start = time.perf_counter()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as ex:
+            future.set_exception(ex)
+        self._record(fn, time.perf_counter() - start)
+
+    def run(self) -> int:
+        """Runs queued work until the budget is spent, always at least one item. Returns the number left."""
+        deadline = time.perf_counter() + self.budget
+        # Pop one at a time, a callback may render frames itself (msgbox) and re-enter here
+        while self._callbacks or self._jobs:
+            if self._callbacks:
+                self._run_callback(self._callbacks.popleft())
+            else:
+                self._run_job(self._jobs.popleft())
+            if time.perf_counter() > deadline:
+                break
+        return self.pending()
+
+    def report(self, top=10) -> str:
+        """Lists the handlers that took the most render thread time."""
+        rows = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return '\n'.join(name + ': ' + str(calls) + ' calls, ' + "{:.1f}".format(total * 1e3) + ' ms total, '
+                         + "{:.2f}".format(total / calls * 1e3) + ' ms mean, ' + "{:.2f}".format(longest * 1e3)
+                         + ' ms max' for name, (calls, total, longest) in rows)
+
+    def reset_stats(self) -> None:
+        self.stats = {}
+
+
+class FrameScheduler:
+    """Paces the render loop and runs timers from a deadline queue.
+
+    Frames are rendered at target_fps while there is input or queued work, and
+    at idle_fps once nothing has happened for idle_after seconds, so an idle
+    window leaves the CPU to VISA and FTDI I/O. The wait between idle frames
+    ends early when another thread posts a job to the dispatcher or a timer
+    falls due. Timers are kept in a heap ordered by deadline.
+    """
+
+    def __init__(self, dispatcher, target_fps=TARGET_FPS, idle_fps=IDLE_FPS, idle_after=IDLE_AFTER):
+        self.dispatcher = dispatcher
+        self.target_fps = target_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        # (deadline, sequence, interval or None, fn), sequence keeps equal deadlines in order
+        self._timers = []
+        self._sequence = itertools.count()
+        self._last_frame = 0.0
+        self._last_activity = time.monotonic()
+
+    def call_later(self, delay, fn) -> None:
+        heapq.heappush(self._timers, (time.monotonic() + delay, next(self._sequence), None, fn))
+
+    def call_every(self, interval, fn) -> None:
+        heapq.heappush(self._timers, (time.monotonic() + interval, next(self._sequence), interval, fn))
+
+    def mark_active(self) -> None:
+        self._last_activity = time.monotonic()
+
+    def is_idle(self) -> bool:
+        return time.monotonic() - self._last_activity > self.idle_after
+
+    def run_due_timers(self) -> None:
+        now = time.monotonic()
+        while self._timers and self._timers[0][0] <= now:
+            deadline, _, interval, fn = heapq.heappop(self._timers)
+            if interval is not None:
+                # Keep to the schedule, but skip the deadlines missed while the loop was blocked
+                deadline = deadline + interval if deadline + interval > now else now + interval
+                heapq.heappush(self._timers, (deadline, next(self._sequence), interval, fn))
+            fn()
+
+    def wait_for_frame(self) -> None:
+        """Blocks until the next frame is due at the current rate, a timer is due or a job is posted."""
+        if self.dispatcher.posted.is_set() or self.dispatcher.pending():
+            self.mark_active()
+        deadline = self._last_frame + 1 / (self.idle_fps if self.is_idle() else self.target_fps)
+        if self._timers:
+            deadline = min(deadline, self._timers[0][0])
+        timeout = deadline - time.monotonic()
+        if timeout > 0 and self.dispatcher.posted.wait(timeout):
+            self.mark_active()
+        self.dispatcher.posted.clear()
+        self._last_frame = time.monotonic()
+
+
+dispatcher = CallbackDispatcher()
+scheduler = FrameScheduler(dispatcher)
+
+
+def _on_input():
+    # Queued like any callback, which is what keeps the loop at the full frame rate during input
+    pass
+
+
+def install_input_handlers() -> None:
+    """Registers global mouse and keyboard handlers so user input counts as activity for the scheduler."""
+    with dpg.handler_registry():
+        dpg.add_mouse_move_handler(callback=_on_input)
+        dpg.add_mouse_click_handler(callback=_on_input)
+        dpg.add_mouse_wheel_handler(callback=_on_input)
+        dpg.add_key_press_handler(callback=_on_input)
+
+
+def call_on_render_thread(fn, *args, **kwargs) -> Future:
+    """Runs fn on the render thread and returns a Future for its result.
+
+    DearPyGui items should only be touched from the render thread, so worker
+    threads hand their UI updates over through here. Called on the render
+    thread itself, fn runs straight away.
+    """
+    if threading.current_thread() is threading.main_thread():
+        future = Future()
+        dispatcher._run_job((future, fn, args, kwargs))
+        return future
+    return dispatcher.post(fn, args, kwargs)
+
+
+def handle_callbacks_and_render_one_frame():
+    scheduler.wait_for_frame()
+    scheduler.run_due_timers()
+    dispatcher.collect()
+    if dispatcher.pending():
+        scheduler.mark_active()
+    dispatcher.run()
+    dpg.render_dearpygui_frame()
@@ -0,0 +1,57 @@
+# Two-tone intercept point math shared by the GUI, the scripts and the batch tools
+
+from typing import NamedTuple
+import numpy as np
+
+
+class Intercepts(NamedTuple):
+    gain: np.ndarray
+    oip2: np.ndarray
+    oip3: np.ndarray
+    iip2: np.ndarray
+    iip3: np.ndarray
+
+
+def allocate_intercepts(shape) -> Intercepts:
+    """Preallocates output buffers for compute_intercepts, e.g. shape=(runs, points)."""
+    return Intercepts(*(np.empty(shape) for _ in Intercepts._fields))
+
+
+def compute_intercepts(pl, ph, im2, im3l, im3h, input_power, out=None) -> Intercepts:
+    """Computes gain, OIP2, OIP3, IIP2 and IIP3 from the five two-tone traces in dBm.
+
+    The traces can be single sweeps of shape (points,) or stacked runs of shape
+    (runs, points), which are all computed in one pass. input_power is a scalar
+    or one value per run. Results are written into out when it is given.
+    """
+    pl = np.asarray(pl, dtype=float)
+    ph = np.asarray(ph, dtype=float)
+    im2 = np.asarray(im2, dtype=float)
+    im3l = np.asarray(im3l, dtype=float)
+    im3h = np.asarray(im3h, dtype=float)
+    input_power = np.asarray(input_power, dtype=float)
+    if input_power.ndim == 1 and pl.ndim == 2:
+        # One power per run, broadcast along the frequency axis
+        input_power = input_power[:, np.newaxis]
+    if out is None:
+        out = allocate_intercepts(np.broadcast_shapes(pl.shape, ph.shape, im2.shape, im3l.shape, im3h.shape))
+
+    # OIP2 = PL + PH - IM2
+    np.add(pl, ph, out=out.oip2)
+    np.subtract(out.oip2, im2, out=out.oip2)
+
+    # OIP3 = max((2*PL+PH-IM3L)/2, (PL+2*PH-IM3H)/2), using iip3 as scratch for the second term
+    np.multiply(pl, 2, out=out.oip3)
+    np.add(out.oip3, ph, out=out.oip3)
+    np.subtract(out.oip3, im3l, out=out.oip3)
+    np.multiply(ph, 2, out=out.iip3)
+    np.add(out.iip3, pl, out=out.iip3)
+    np.subtract(out.iip3, im3h, out=out.iip3)
+    np.maximum(out.oip3, out.iip3, out=out.oip3)
+    np.divide(out.oip3, 2, out=out.oip3)
+
+    # gain = PL - inputPow
+    np.subtract(pl, input_power, out=out.gain)
+    np.subtract(out.oip2, out.gain, out=out.iip2)
+    np.subtract(out.oip3, out.gain, out=out.iip3)
+    return out
@@ -0,0 +1,176 @@
+# Noise temperature and noise figure from SA noise exports and PNA gain traces
+
+import re
+
+import numpy as np
+
+from csvload import read_blocks
+
+BOLTZMANN = 1.380649e-23  # J/K
+T0 = 290.0  # K, reference temperature of the noise figure
+
+# RBW assumed when an export does not record it, the setting the old noise scripts were written for
+DEFAULT_RBW = 1e6
+# One sigma amplitude uncertainty of the SA readings and of the PNA gain, in dB
+SA_UNCERTAINTY_DB = 0.5
+GAIN_UNCERTAINTY_DB = 0.1
+
+_UNITS = {'hz': 1.0, 'khz': 1e3, 'mhz': 1e6, 'ghz': 1e9}
+
+
+def rbw_from_metadata(metadata: dict, default=None) -> float:
+    """Returns the resolution bandwidth in Hz from the header of an export.
+
+    Accepts 'RBW', 'RBW(Hz)' or 'Resolution Bandwidth' keys, with or without a
+    unit on the value. Falls back to default, or raises ValueError without one.
+    """
+    for key, value in metadata.items():
+        name = key.lower().replace(' ', '')
+        if name.startswith('rbw') or name.startswith('resolutionbandwidth'):
+            match = re.fullmatch(r'([-+0-9.eE]+)\s*([kKmMgG]?[hH][zZ])?', value.strip())
+            if match is None:
+                continue
+            # The unit is on the value ('1 MHz') or in the key ('RBW(kHz)'), plain Hz otherwise
+            unit = match.group(2)
+            if unit is None:
+                in_key = re.search(r'\(([kmg]?hz)\)', name)
+                unit = in_key.group(1) if in_key else 'hz'
+            return float(match.group(1)) * _UNITS[unit.lower()]
+    if default is None:
+        raise ValueError('No RBW in the file metadata')
+    return default
+
+
+def interp_rows(x_new, x, y) -> np.ndarray:
+    """np.interp applied to every row of 2D arrays in one vectorized pass.
+
+    Row i of y, sampled at row i of x (increasing), is resampled at row i of
+    x_new. Points outside a row's range take its end values, like np.interp.
+    """
+    x_new = np.atleast_2d(np.asarray(x_new, dtype=float))
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    rows, points = x.shape
+    # Shift every row into its own range, so one searchsorted over the flattened rows finds all the segments
+    low = np.minimum(x[:, 0], x_new.min(axis=1))
+    span = (np.maximum(x[:, -1], x_new.max(axis=1)) - low).max() + 1
+    offsets = (np.arange(rows) * span - low)[:, np.newaxis]
+    index = np.searchsorted((x + offsets).ravel(), (x_new + offsets).ravel(), side='right').reshape(x_new.shape)
+    index = np.clip(index - np.arange(rows)[:, np.newaxis] * points, 1, points - 1)
+    x0 = np.take_along_axis(x, index - 1, axis=1)
+    x1 = np.take_along_axis(x, index, axis=1)
+    y0 = np.take_along_axis(y, index - 1, axis=1)
+    y1 = np.take_along_axis(y, index, axis=1)
+    t = np.clip((x_new - x0) / (x1 - x0), 0, 1)
+    return y0 + t * (y1 - y0)
+
+
+def noise_temperature(dark_dbm, trace_dbm, gain_db, rbw) -> np.ndarray:
+    """Input referred noise temperature in K, from SA readings in dBm and the link gain in dB.
+
+    The dark trace (laser off) is subtracted from the measured trace in linear
+    power, the difference is referred to the input through the gain and divided
+    by k * RBW. Arrays broadcast, so many DUTs can be passed as rows.
+    """
+    # dBm to Watts
+    excess = 10 ** (np.asarray(trace_dbm) / 10) / 1000 - 10 ** (np.asarray(dark_dbm) / 10) / 1000
+    return excess / 10 ** (np.asarray(gain_db) / 10) / (BOLTZMANN * np.asarray(rbw))
+
+
+def noise_figure(noise_temp) -> np.ndarray:
+    """Noise figure in dB for a noise temperature in K."""
+    return 10 * np.log10(1 + np.asarray(noise_temp) / T0)
+
+
+def analyse(noise_freq, dark_dbm, trace_dbm, gain_freq, gain_db, rbw, sa_uncertainty_db=SA_UNCERTAINTY_DB,
+            gain_uncertainty_db=GAIN_UNCERTAINTY_DB) -> dict:
+    """Computes noise temperature and figure with their one sigma uncertainty.
+
+    Every argument may be a single trace or a (duts, points) array with one
+    DUT per row, and rbw a scalar or one value per DUT. The gain is resampled
+    onto the noise frequencies first, so the two may come from different grids.
+    The uncertainty combines the SA amplitude error of both readings with the
+    gain error, propagated to first order. Returns a dict of (duts, points)
+    arrays: freq, gain, noise_temp, noise_temp_err, nf and nf_err.
+    """
+    noise_freq = np.atleast_2d(np.asarray(noise_freq, dtype=float))
+    dark = np.atleast_2d(np.asarray(dark_dbm, dtype=float))
+    trace = np.atleast_2d(np.asarray(trace_dbm, dtype=float))
+    gain = interp_rows(noise_freq, gain_freq, gain_db)
+    rbw = np.asarray(rbw, dtype=float).reshape(-1, 1)
+
+    noise_temp = noise_temperature(dark, trace, gain, rbw)
+
+    # Relative error of a linear power per dB of error
+    per_db = np.log(10) / 10
+    trace_w = 10 ** (trace / 10)
+    dark_w = 10 ** (dark / 10)
+    relative = per_db * np.sqrt((sa_uncertainty_db * trace_w) ** 2 + (sa_uncertainty_db * dark_w) ** 2) \
+        / np.abs(trace_w - dark_w)
+    noise_temp_err = np.abs(noise_temp) * np.sqrt(relative ** 2 + (per_db * gain_uncertainty_db) ** 2)
+
+    return {'freq': noise_freq, 'gain': gain, 'noise_temp': noise_temp, 'noise_temp_err': noise_temp_err,
+            'nf': noise_figure(noise_temp), 'nf_err': noise_temp_err / (T0 + noise_temp) / per_db}
+
+
+def load_noise(path_to_file, default_rbw=DEFAULT_RBW) -> dict:
+    """Loads an SA noise export: freq in Hz, dark (trace A) and trace (trace B) in dBm, and its RBW."""
+    blocks, metadata = read_blocks(path_to_file)
+    traces = blocks[0]
+    return {'freq': traces[:, 0], 'dark': traces[:, 1], 'trace': traces[:, 2],
+            'rbw': rbw_from_metadata(metadata, default_rbw), 'metadata': metadata}
+
+
+def load_gain(path_to_file) -> dict:
+    """Loads a PNA S21 export: freq in Hz and gain in dB."""
+    blocks, metadata = read_blocks(path_to_file)
+    s21 = blocks[0]
+    return {'freq': s21[:, 0], 'gain': s21[:, 1], 'metadata': metadata}
+
+
+def _stack(rows) -> np.ndarray:
+    # Gain traces of different lengths are padded to a common one for interp_rows, repeating the last
+    # value at frequencies a little beyond the last one (_stack_freq), so they interpolate as before
+    length = max(len(row) for row in rows)
+    return np.array([np.concatenate([row, np.full(length - len(row), row[-1])]) for row in rows])
+
+
+def _stack_freq(rows) -> np.ndarray:
+    length = max(len(row) for row in rows)
+    return np.array([np.concatenate([row, row[-1] + np.arange(1, length - len(row) + 1)]) for row in rows])
+
+
+def analyse_files(pairs, default_rbw=DEFAULT_RBW, **uncertainties) -> list[dict]:
+    """Analyses (noise file, gain file) pairs, batching DUTs whose noise traces have the same length.
+
+    Returns one dict per pair, in order, with the traces of analyse() as 1D
+    arrays plus the rbw used.
+    """
+    noises = [load_noise(noise_file, default_rbw) for noise_file, gain_file in pairs]
+    gains = [load_gain(gain_file) for noise_file, gain_file in pairs]
+    results = [None] * len(pairs)
+    lengths = sorted({len(noise['freq']) for noise in noises})
+    for length in lengths:
+        group = [i for i, noise in enumerate(noises) if len(noise['freq']) == length]
+        batch = analyse(np.array([noises[i]['freq'] for i in group]),
+                        np.array([noises[i]['dark'] for i in group]),
+                        np.array([noises[i]['trace'] for i in group]),
+                        _stack_freq([gains[i]['freq'] for i in group]),
+                        _stack([gains[i]['gain'] for i in group]),
+                        [noises[i]['rbw'] for i in group], **uncertainties)
+        for row, i in enumerate(group):
+            results[i] = {key: values[row] for key, values in batch.items()}
+            results[i]['rbw'] = noises[i]['rbw']
+    return results
+
+
+def analyse_measurement(measurement, gain_freq, gain_db, **uncertainties) -> dict:
+    """Runs analyse on a SiglentSA.measure_noise result against a gain trace, e.g. the PNA x_axis * 1e9 and gain.
+
+    Returns the traces of analyse() as 1D arrays plus the rbw used, like analyse_files.
+    """
+    result = analyse(measurement['freq'], measurement['dark'], measurement['trace'], gain_freq, gain_db,
+                     measurement['rbw'], **uncertainties)
+    result = {key: values[0] for key, values in result.items()}
+    result['rbw'] = measurement['rbw']
+    return result
@@ -0,0 +1,112 @@
+# Decimation and in-place updating of the DearPyGui trace plots
+from collections import deque
+
+import dearpygui.dearpygui as dpg
+import numpy as np
+
+# Decimation methods, see decimate
+LTTB = 'lttb'
+MINMAX = 'minmax'
+
+
+def lttb(x, y, n_out) -> tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets downsampling of a trace to n_out points.
+
+    Keeps the first and last points, and from each bucket in between the point
+    that forms the largest triangle with the point kept before it and the mean
+    of the next bucket, which preserves the visual shape of the trace.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def minmax(x, y, n_out) -> tuple[np.ndarray, np.ndarray]:
+    """Splits the trace into n_out // 2 bins and keeps the lowest and highest point of each.
+
+    Cheaper than lttb and never hides a spike, suited to noisy time series.
+    """
+    n = len(x)
+    bins = n_out // 2
+    if n <= n_out or bins < 1:
+        return x, y
+    edges = np.linspace(0, n, bins + 1).astype(int)
+    # Sort by value within each bin, so the first and last entry of a bin are its min and max
+    order = np.lexsort((y, np.repeat(np.arange(bins), np.diff(edges))))
+    keep = np.unique(np.concatenate([order[edges[:-1]], order[edges[1:] - 1]]))
+    return x[keep], y[keep]
+
+
+def decimate(x, y, max_points, method=LTTB) -> tuple[np.ndarray, np.ndarray]:
+    """Reduces a trace to at most max_points points, returning it unchanged if it is short enough."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= max_points:
+        return x, y
+    if method == MINMAX:
+        return minmax(x, y, max_points)
+    return lttb(x, y, max_points)
+
+
+class LivePlot:
+    """Shows the latest trace on a plot axis over a bounded history of earlier ones.
+
+    Every series is created once and then updated in place with set_value, and
+    every trace is decimated to max_points, about the plot width in pixels, so
+    drawing cost stays the same however dense the sweeps are. Only the newest
+    history entries are kept, the oldest series is reused for the next one.
+    Must be used on the render thread.
+    """
+
+    def __init__(self, y_axis, history=50, max_points=1000, method=LTTB):
+        self.y_axis = y_axis
+        self.max_points = max_points
+        self.method = method
+        # (x, y) of the earlier runs, oldest first
+        self.history = deque(maxlen=history)
+        self.latest = None
+        self._latest_series = None
+        self._history_series = []
+        self._pushed = 0
+
+    def push(self, x, y) -> None:
+        """Shows a new run, moving the one shown so far into the history."""
+        x, y = decimate(x, y, self.max_points, self.method)
+        if self._latest_series is None:
+            self._latest_series = dpg.add_line_series([], [], parent=self.y_axis)
+        if self.latest is not None and self.history.maxlen:
+            self._add_history(*self.latest)
+        self.latest = (x.copy(), y.copy())
+        dpg.set_value(self._latest_series, [list(x), list(y)])
+
+    def _add_history(self, x, y) -> None:
+        self.history.append((x, y))
+        slot = self._pushed % self.history.maxlen
+        self._pushed += 1
+        if slot == len(self._history_series):
+            # Drawn before the latest series, so the newest run stays on top
+            self._history_series.append(dpg.add_line_series([], [], parent=self.y_axis,
+                                                            before=self._latest_series))
+        dpg.set_value(self._history_series[slot], [list(x), list(y)])
+
+    def clear(self) -> None:
+        for series in self._history_series + [self._latest_series]:
+            if series is not None:
+                dpg.set_value(series, [[], []])
+        self.history.clear()
+        self.latest = None
+        self._pushed = 0
@@ -1,14 +1,233 @@
+import os
 import pyvisa as visa
 import time
-from pyvisa.constants import VI_ATTR_TMO_VALUE
+from pyvisa.constants import VI_ATTR_TMO_VALUE, StatusCode
 import dearpygui.dearpygui as dpg
-import inspect
+import threading
 import numpy as np
+from calindex import CalIndex
+from guiloop import call_on_render_thread, handle_callbacks_and_render_one_frame
+from intercepts import compute_intercepts
+from worker import Cancelled
 
-dpg_callback_queue = []
+# Trace transfer formats, see FORMat:DATA
+DATA_FORMAT_REAL64 = 'REAL,64'
+DATA_FORMAT_ASCII = 'ASCII,0'
+
+# Ways two_tone_test can trigger and read the five channels
+ACQUIRE_SINGLE_SWEEP = 'single sweep'
+ACQUIRE_SEQUENTIAL = 'sequential'
+
+# (channel, measurement name) of each two-tone trace
+TWO_TONE_MEASUREMENTS = ((1, 'PL'), (2, 'IM2'), (3, 'PH'), (4, 'IM3L'), (5, 'IM3H'))
+
+# Channels copied from channel 1: (channel, measurement name, receiver offset in Hz, receiver multiplier)
+TWO_TONE_CHANNELS = ((2, 'IM2', 0, 2), (3, 'PH', 500000, 1), (4, 'IM3L', -1500000, 1), (5, 'IM3H', 1500000, 1))
+
+# Sweep and frequency offset plan of the calibration, saved calibrations only match the same plan
+FREQ_PLAN = {'start': 300000000, 'stop': 4050000000, 'points': 401, 'if_bandwidth': 10,
+             'primary_start': 350000000, 'primary_stop': 2000000000,
+             'channels': [list(channel) for channel in TWO_TONE_CHANNELS]}
+
+# Folder on the PNA for saved state/cal set files, and the host side index of them, kept next to this
+# module so the GUI, calibrationroutine and scripts share it whatever their working directory
+CAL_STATE_DIR = 'C:\\Users\\Public\\Documents\\Network Analyzer\\'
+CAL_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pna_cal_index.json')
+
+# Standard event status register bits, see *ESR?
+ESR_OPC = 0b1
+ESR_ERRORS = 0b111100  # query, device dependent, execution and command errors
+
+# Upper bounds in seconds for the overlapped operations, so a hung PNA raises instead of blocking forever
+SWEEP_TIMEOUT = 120  # one channel, 401 points at the 10 Hz IF bandwidth
+SOURCE_CAL_TIMEOUT = 600  # iterated against the power meter, point by point
+RECEIVER_CAL_TIMEOUT = 120
+# VISA timeout for everything else, in ms
+DEFAULT_TIMEOUT = 4000
+
+# Longest compound program message ScpiBatch sends, kept well inside the PNA input buffer
+SCPI_BATCH_MAX_LENGTH = 2000
+
+
+class InstrumentError(Exception):
+    """The PNA flagged an error while running a command."""
+
+
+def read_error_queue(session) -> list[str]:
+    """Reads SYST:ERR? until the PNA reports no error and returns the errors in order."""
+    errors = []
+    # The queue is bounded, the limit only guards against a reply that never reads as empty
+    while len(errors) < 100:
+        error = session.query('SYSTem:ERRor?').strip()
+        if int(error.split(',')[0]) == 0:
+            break
+        errors.append(error)
+    return errors
+
+
+def _raise_on_errors(session, command, esr) -> None:
+    if esr & ESR_ERRORS:
+        errors = read_error_queue(session)
+        raise InstrumentError(command + ': ' + ('; '.join(errors) if errors else 'event status ' + str(esr)))
+
+
+def wait_for_opc(session, command, timeout, check_cancelled=None, poll_interval=0.005,
+                 max_poll_interval=0.25, sequential=False) -> None:
+    """Sends an overlapped command with *OPC and polls *ESR? until the instrument reports it done.
+
+    The poll interval grows with the time already waited, so a fast operation
+    returns right away, a long one costs few bus transactions and the
+    completion is never noticed more than about 10% late. Raises
+    InstrumentError if the command set an error bit, TimeoutError if it is not
+    done within timeout seconds, and whatever check_cancelled raises between polls.
+
+    A sequential command holds the parser until it is done, so a poll would
+    only time out. It is waited on with a single *OPC? instead, with the VISA
+    timeout raised to timeout for that read, and can not be cancelled.
+    """
+    if sequential:
+        session.write('*CLS;' + command)
+        previous = session.timeout
+        session.timeout = timeout * 1000
+        try:
+            session.query('*OPC?')
+        except visa.VisaIOError as ex:
+            if ex.error_code != StatusCode.error_timeout:
+                raise
+            # Drop the reply that would otherwise be read by the next query
+            session.clear()
+            raise TimeoutError(command + ' did not complete within ' + str(timeout) + ' s') from ex
+        finally:
+            session.timeout = previous
+        _raise_on_errors(session, command, int(session.query('*ESR?')))
+        return
+
+    # Start from a clean status register and error queue, so whatever is flagged belongs to this command
+    session.write('*CLS;' + command + ';*OPC')
+    start = time.monotonic()
+    deadline = start + timeout
+    # Set while an *ESR? reply is still owed. A device clear would drop the *OPC with it, and a new query
+    # would interrupt it (-410), so the next poll reads that reply instead
+    pending = False
+    while True:
+        try:
+            esr = int(session.read() if pending else session.query('*ESR?'))
+            pending = False
+        except visa.VisaIOError as ex:
+            if ex.error_code != StatusCode.error_timeout:
+                raise
+            pending = True
+            esr = 0
+        _raise_on_errors(session, command, esr)
+        if esr & ESR_OPC:
+            return
+        if time.monotonic() > deadline:
+            if pending:
+                # Giving up, so drop the owed reply rather than leave it for the next query
+                session.clear()
+            raise TimeoutError(command + ' did not complete within ' + str(timeout) + ' s')
+        if check_cancelled is not None:
+            check_cancelled()
+        time.sleep(min(max(poll_interval, (time.monotonic() - start) / 10), max_poll_interval))
+
+
+class ScpiBatch:
+    """Collects setup commands and sends them as a few compound program messages.
+
+    Commands are joined with semicolons up to max_length characters per
+    message. Each one gets a leading colon so it is parsed from the root of the
+    command tree instead of relative to the one before it. The error queue is
+    read once at the end, with the first SYST:ERR? in the last message. Used
+    as a context manager the batch is sent on exit.
+
+    Most instruments don't say which command an error came from, so after an
+    error the commands are sent again one at a time, each with its own
+    SYST:ERR?, and every error is reported with the command that raised it.
+    Pass idempotent=False for a batch that must not run twice, e.g. one that
+    defines measurements, its errors are then reported for the whole batch.
+    """
+
+    def __init__(self, session, max_length=SCPI_BATCH_MAX_LENGTH, idempotent=True):
+        self._session = session
+        self.max_length = max_length
+        self.idempotent = idempotent
+        self.commands = []
+        # Program messages sent by the last send()
+        self.message_count = 0
+
+    def write(self, command) -> None:
+        command = command.strip()
+        if command.endswith('?') or '? ' in command:
+            # The reply would be left in the output buffer for someone else to read
+            raise ValueError('Queries can not be batched: ' + command)
+        if not command.startswith((':', '*')):
+            command = ':' + command
+        self.commands.append(command)
+
+    def messages(self) -> list[str]:
+        """Returns the compound program messages the queued commands are sent as."""
+        messages = []
+        current = ''
+        for command in self.commands:
+            if current and len(current) + 1 + len(command) > self.max_length:
+                messages.append(current)
+                current = ''
+            current = current + ';' + command if current else command
+        if current:
+            messages.append(current)
+        return messages
+
+    def send(self) -> None:
+        """Sends the queued commands, then raises InstrumentError if any of them failed."""
+        messages = self.messages()
+        commands, self.commands = self.commands, []
+        for message in messages[:-1]:
+            self._session.write(message)
+        # The first error query rides on the last message, saving a round trip when all went well
+        error = self._session.query((messages[-1] + ';' if messages else '') + ':SYSTem:ERRor?').strip()
+        self.message_count = len(messages)
+        errors = [] if int(error.split(',')[0]) == 0 else [error] + read_error_queue(self._session)
+        if errors:
+            raise InstrumentError(self._attribute_errors(errors, commands))
+
+    def _attribute_errors(self, errors, commands) -> str:
+        named = [_named_command(error, commands) for error in errors]
+        if all(named):
+            return '; '.join(command + ': ' + error for command, error in zip(named, errors))
+        if self.idempotent:
+            failed = []
+            for command in commands:
+                error = self._session.query(command + ';:SYSTem:ERRor?').strip()
+                if int(error.split(',')[0]) != 0:
+                    failed.append(command + ': ' + '; '.join([error] + read_error_queue(self._session)))
+            if failed:
+                return '; '.join(failed)
+        # Not repeatable one at a time, or not attributable without re-sending
+        return '; '.join(errors) + ' (from a batch of ' + str(len(commands)) + ' commands)'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+
+def _named_command(error, commands):
+    # Some firmware, and the simulator, quote the failing command after a semicolon in the error text,
+    # e.g. -113,"Undefined header;:SENS:FOO 1". Returns that command, or None
+    text = error.rstrip('"').partition(';')[2].strip().lstrip(':').upper()
+    if text:
+        for command in commands:
+            if command.lstrip(':').upper().startswith(text) or text.startswith(command.lstrip(':').upper()):
+                return command
+    return None
 
 
 def msgbox(message, extra_button=False):
+    if threading.current_thread() is not threading.main_thread():
+        # Popups have to be built and rendered on the render thread, wait there for the answer
+        return call_on_render_thread(msgbox, message, extra_button).result()
 
     def on_msgbox_btn_click(sender, data, user_data):
         nonlocal resp
@@ -34,6 +253,8 @@ def msgbox(message, extra_button=False):
 
 
 def input_box():
+    if threading.current_thread() is not threading.main_thread():
+        return call_on_render_thread(input_box).result()
 
     def on_inputbox_btn_click(sender, data, user_data):
         nonlocal resp
@@ -69,26 +290,6 @@ def hide_wait():
     dpg.hide_item("wait_popup")
 
 
-def run_callbacks():
-    global dpg_callback_queue
-    while dpg_callback_queue:
-        job = dpg_callback_queue.pop(0)
-        if job[0] is None:
-            continue
-        sig = inspect.signature(job[0])
-        args = []
-        for i in range(len(sig.parameters)):
-            args.append(job[i + 1])
-        result = job[0](*args)
-
-
-def handle_callbacks_and_render_one_frame():
-    global dpg_callback_queue
-    dpg_callback_queue += dpg.get_callback_queue() or []  # retrieves and clears queue
-    run_callbacks()
-    dpg.render_dearpygui_frame()
-
-
 def _show_popup_window(message) -> None:
     """Displays a small popup window with a message to tell users to wait.
     """
@@ -115,10 +316,9 @@ def _hide_popup_window() -> None:
 
 class PNA:
 
-    def __init__(self):
+    def __init__(self, visa_address='GPIB0::16::INSTR', gui=True):
         self._session = None
         self._resourceManager = None
-        self._primaryNum = None
         self.primary_low = None
         self.primary_high = None
         self.second_intermod = None
@@ -126,7 +326,8 @@ class PNA:
         self.third_intermod_high = None
         # Change this variable to the address of your instrument
         # self.VISA_ADDRESS = 'USB0::0x0957::0x0118::MY48420936::0::INSTR'
-        self.VISA_ADDRESS = 'GPIB0::16::INSTR'
+        # Use TCPIP0::127.0.0.1::5025::SOCKET for the simulator, see simulator.py
+        self.VISA_ADDRESS = visa_address
         self.popup = None
         self.input_pow = None
         self.x_axis = None
@@ -135,9 +336,31 @@ class PNA:
         self.OIP2 = None
         self.IIp2 = None
         self.IIp3 = None
-
-        with dpg.window(modal=True, show=False, tag="modal_id", no_title_bar=True):
-            dpg.add_text("Please wait....")
+        # Binary block transfer is the default, ASCII is kept as a fallback
+        self.data_format = DATA_FORMAT_REAL64
+        # Seconds spent reading traces off the bus during the last two-tone test
+        self.readout_time = None
+        # Trigger all channels together and read them in bulk, or one channel at a time
+        self.acquisition_mode = ACQUIRE_SINGLE_SWEEP
+        # Seconds spent in each stage of the last acquisition
+        self.timing = None
+        # Identity of the connected instrument and a count of presets sent to it
+        self._idn = None
+        self._preset_count = 0
+        # FOM range numbers, channel layout and measurement numbers, see _get_channel_cache
+        self._channel_cache = None
+        # Calibrated setups saved on the PNA, see save_calibration
+        self.cal_index = CalIndex(CAL_INDEX_PATH)
+        # Set by the caller when running on a worker, long operations stop once it is set
+        self.cancel_event = None
+        # Called as trace_callback(name, x_axis, values) from the acquiring thread as each two-tone
+        # trace is read ('PL', 'IM2', 'PH', 'IM3L', 'IM3H'), then for 'gain', 'OIP2', 'OIP3', 'IIP2' and 'IIP3'
+        self.trace_callback = None
+
+        # Headless use (benchmarks, scripts) has no DearPyGui context to add windows to
+        if gui:
+            with dpg.window(modal=True, show=False, tag="modal_id", no_title_bar=True):
+                dpg.add_text("Please wait....")
 
     def connect_to_pna(self) -> int:
         try:
@@ -152,16 +375,123 @@ class PNA:
         # For Serial and TCP/IP socket connections enable the read Termination Character, or read's will timeout
         if self._session.resource_name.startswith('ASRL') or self._session.resource_name.endswith('SOCKET'):
             self._session.read_termination = '\n'
+        # Long operations are waited on with wait_for_opc, so no single read needs more than this
+        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, DEFAULT_TIMEOUT)
 
+        # The channel cache is keyed by *IDN?, so it carries over a reconnect to the same PNA and
+        # starts over on a different one. After a front panel preset call invalidate_channel_cache
+        self._idn = self._session.query('*IDN?')
         return 0
 
     def close_session(self):
         # Close the connection to the instrument
         self._session.close()
         self._resourceManager.close()
+        self._idn = None
 
     def get_idn(self):
-        return self._session.query('*IDN?')
+        self._idn = self._session.query('*IDN?')
+        return self._idn
+
+    def _check_cancelled(self) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled()
+
+    def check_errors(self, context=None) -> None:
+        """Reads the PNA error queue until it is empty and raises InstrumentError if it held anything."""
+        errors = read_error_queue(self._session)
+        if errors:
+            raise InstrumentError((context + ': ' if context else '') + '; '.join(errors))
+
+    def wait_for_opc(self, command, timeout, poll_interval=0.005, max_poll_interval=0.25, sequential=False) -> None:
+        """Runs an overlapped or sequential command and waits for it, see the wait_for_opc function."""
+        wait_for_opc(self._session, command, timeout, self._check_cancelled, poll_interval, max_poll_interval,
+                     sequential)
+
+    def preset(self) -> None:
+        # Delete all traces, measurements, and windows that might be open
+        self._session.write(':SYSTem:PRESet')
+        self._preset_count += 1
+
+    def invalidate_channel_cache(self) -> None:
+        self._channel_cache = None
+
+    def _get_channel_cache(self) -> dict:
+        """Returns the channel setup cache for the current instrument and preset state.
+
+        The cache is keyed by the *IDN? string and the preset count, so a preset
+        or a connection to a different instrument starts it over, while a
+        reconnect to the same one keeps it.
+        """
+        key = (self._idn, self._preset_count)
+        if self._channel_cache is None or self._channel_cache['key'] != key:
+            self._channel_cache = {'key': key, 'ranges': {}, 'channels_built': False, 'mnums': None}
+        return self._channel_cache
+
+    def range_number(self, name, channel=1) -> int:
+        """Returns the FOM range number of the named range on a channel, querying it only once."""
+        return self.range_numbers([(channel, name)])[(channel, name)]
+
+    def range_numbers(self, ranges) -> dict:
+        """Returns {(channel, name): FOM range number}, fetching the ones not cached yet in one compound query."""
+        cached = self._get_channel_cache()['ranges']
+        missing = [key for key in ranges if key not in cached]
+        if missing:
+            reply = self._session.query(';'.join(':SENSe' + str(channel) + ":FOM:RNUM? '" + name + "'"
+                                                 for channel, name in missing))
+            for key, number in zip(missing, reply.split(';')):
+                cached[key] = int(number)
+        return {key: cached[key] for key in ranges}
+
+    def batch(self, max_length=SCPI_BATCH_MAX_LENGTH, idempotent=True) -> ScpiBatch:
+        """Returns a ScpiBatch on this session, for sending setup commands in a few transactions."""
+        return ScpiBatch(self._session, max_length, idempotent)
+
+    def set_data_format(self, data_format, batch=None) -> None:
+        """Selects the trace transfer format, as part of batch if one is given."""
+        write = batch.write if batch is not None else self._session.write
+        write('FORM:DATA ' + data_format)
+        if data_format == DATA_FORMAT_REAL64:
+            # Little endian (SWAPped) blocks decode directly into numpy on the PC
+            write('FORM:BORD SWAP')
+
+    def query_values(self, query):
+        """Reads a trace or stimulus array in the current data format.
+
+        REAL,64 data comes back as an IEEE 488.2 definite-length block and is
+        decoded straight into a numpy array, ASCII data is parsed value by value.
+        """
+        start = time.perf_counter()
+        if self.data_format == DATA_FORMAT_REAL64:
+            values = self._session.query_binary_values(query, datatype='d', is_big_endian=False,
+                                                       container=np.array)
+        else:
+            values = self._session.query_ascii_values(query, container=np.array)
+        if self.readout_time is not None:
+            self.readout_time += time.perf_counter() - start
+        return values
+
+    def benchmark_readout(self, repeats=5) -> dict:
+        """Times reading the five two-tone traces and the frequency axis in each data format.
+
+        Uses whatever data is already on the instrument, nothing is triggered.
+        Returns the mean bus time per sweep in seconds, keyed by format.
+        """
+        original_format = self.data_format
+        results = {}
+        for data_format in (DATA_FORMAT_ASCII, DATA_FORMAT_REAL64):
+            self.data_format = data_format
+            self.set_data_format(data_format)
+            self.readout_time = 0
+            for _ in range(repeats):
+                self.query_values("CALC1:X?")
+                for channel in range(1, 6):
+                    self.query_values("CALC" + str(channel) + ":DATA? FDATA")
+            results[data_format] = self.readout_time / repeats
+        self.data_format = original_format
+        self.set_data_format(original_format)
+        self.readout_time = None
+        return results
 
     def source_power_cal(self):
         # Query the address of the power meter, so we can control it over GPIB
@@ -189,7 +519,6 @@ class PNA:
 
         self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, default_timeout)
 
-        time.sleep(1)
         # TODO: The CAL query enters a number into the output buffer when the sequence is
         # complete. If the result is 0 the sequence was successful. If the result is 1
         # the sequence failed. Return that number and let outer function handle it?
@@ -200,76 +529,59 @@ class PNA:
         # return 1
 
     def take_cal_sweep(self, port):
-        calibrated = False
-        while not calibrated:
-            self._session.write('*CLS')
-            time.sleep(0.1)
-            # Take cal sweep on specified port
-            self._session.write(
-                "SOURce:POWer" + str(port) + ":CORRection:COLLect:ACQuire PMETer,'ASENSOR',SYNChronous;*OPC")
-            # print('Starting cal sweep on port ' + str(port) + '....')
-            time.sleep(1)
-            self._session.clear()
-
-            # Ask the user if they want to save or repeat
-            resp = msgbox('WAIT FOR CAL SWEEP TO FINISH\nSave results?', extra_button=True)
-
-            if resp == 'Yes':
-                calibrated = True
-            else:
-                # # Adjust tol and num count
-                # tolerance = input('Enter new iteration tolerance value: ')
-                # session.write('SOURce:POWer:CORRection:COLLect:ITERation:NTOLerance ' + tolerance)
-                # number = input('Enter new interation count value: ')
-                # session.write('SOURce:POWer:CORRection:COLLect:ITERation:COUNt ' + number)
-                # # Restart cal sweep
-                #  TODO: add this capability back in
-                calibrated = True
+        # Take cal sweep on specified port, the PNA flags OPC once every point has converged
+        self.wait_for_opc("SOURce:POWer" + str(port) + ":CORRection:COLLect:ACQuire PMETer,'ASENSOR',SYNChronous",
+                          SOURCE_CAL_TIMEOUT, sequential=True)
+        # # Adjust tol and num count if the sweep fails to converge
+        # session.write('SOURce:POWer:CORRection:COLLect:ITERation:NTOLerance ' + tolerance)
+        # session.write('SOURce:POWer:CORRection:COLLect:ITERation:COUNt ' + number)
+        #  TODO: add this capability back in
 
         self._session.write('SOURce:POWer:CORRection:COLLect:SAVE')  # Applies the cal results to the channel
         return
 
     def calibration(self, input_power):
         self.input_pow = input_power
-        self._primaryNum = None
-        # Delete all traces, measurements, and windows that might be open
-        self._session.write(':SYSTem:PRESet')
+        self.preset()
 
-        # Set up the frequency range
-        self._session.write('SENSe:FREQuency:STARt 300000000')  # 300 MHz
-        self._session.write('SENSe:FREQuency:STOP 4050000000')  # 4.05 GHz
-        self._session.write('SENSe:SWEep:POINts 401')
+        with self.batch() as batch:
+            # Set up the frequency range
+            batch.write('SENSe:FREQuency:STARt ' + str(FREQ_PLAN['start']))  # 300 MHz
+            batch.write('SENSe:FREQuency:STOP ' + str(FREQ_PLAN['stop']))  # 4.05 GHz
+            batch.write('SENSe:SWEep:POINts ' + str(FREQ_PLAN['points']))
 
-        # Set the IF bandwidth
-        self._session.write('SENSe:BANDwidth:RESolution 10')  # 100 Hz
+            # Set the IF bandwidth
+            batch.write('SENSe:BANDwidth:RESolution ' + str(FREQ_PLAN['if_bandwidth']))  # 100 Hz
 
-        # Set calibration level
-        # By default the ports are coupled but we'll write to each anyway
-        self._session.write('SOURce:POWer1:LEVel:IMMediate:AMPLitude ' + self.input_pow)  # Port 1
-        self._session.write('SOURce:POWer3:LEVel:IMMediate:AMPLitude ' + self.input_pow)  # Port 3
+            # Set calibration level
+            # By default the ports are coupled but we'll write to each anyway
+            batch.write('SOURce:POWer1:LEVel:IMMediate:AMPLitude ' + str(self.input_pow))  # Port 1
+            batch.write('SOURce:POWer3:LEVel:IMMediate:AMPLitude ' + str(self.input_pow))  # Port 3
 
-        # Turn ports 2 and 4 OFF
-        self._session.write('SOURce:POWer2:MODE OFF')
-        self._session.write('SOURce:POWer4:MODE OFF')
+            # Turn ports 2 and 4 OFF
+            batch.write('SOURce:POWer2:MODE OFF')
+            batch.write('SOURce:POWer4:MODE OFF')
 
         # Source power cal
 
         # Verify with the user that the power sensor is properly plugged in for calibration
         resp = msgbox('Please connect the power sensor to the Power \nRef port of the power meter.'
                       + '\n' + 'Click OK to continue')
+        self._check_cancelled()
         if resp == 'OK':
-            dpg.configure_item("modal_id", show=True)
+            call_on_render_thread(dpg.configure_item, "modal_id", show=True)
             print("cool")
 
         self.source_power_cal()
 
-        dpg.configure_item("modal_id", show=False)
+        call_on_render_thread(dpg.configure_item, "modal_id", show=False)
 
         # Verify with the user that the power meter is plugged into the power combiner
         resp = msgbox('Sensor zeroing and calibration complete.'
                       + '\n' + 'Please connect the power sensor to the S port of the combiner.'
                       + '\n' + 'Click OK to continue')
 
+        self._check_cancelled()
         if resp == 'OK':
             print('We did it!')
 
@@ -277,13 +589,10 @@ class PNA:
         # session.write('SOURce:POWer:CORRection:COLLect:ITERation:NTOLerance 0.1')  # default: 0.1
         # session.write('SOURce:POWer:CORRection:COLLect:ITERation:COUNt 25')  # default: 25
 
-        # Adjust the timeout value for commands to the PNA (can take 6 seconds while cal is running)
-        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, -1)
         self._session.write('SOURce:POWer:CORRection:COLLect:DISPlay:STATe 1')  # default is ON
 
-        time.sleep(0.1)
         self.take_cal_sweep(1)
-        time.sleep(0.1)
+        self._check_cancelled()
         self.take_cal_sweep(3)
 
         # Done with power meter, tell the user to disconnect
@@ -298,24 +607,24 @@ class PNA:
         if resp == 'Yes':
             print('We did it!')
 
-        # Create a measurement and select it
-        self._session.write(":CALCulate:PARameter:DEFine:EXTended 'PL','B, 1'")  # Unratioed measurement
-        # Display measurement as trace 2
-        self._session.write(":DISPlay:WINDow:TRACe2:FEED 'PL'")
-        # Delete the S11 measurement on trace 1
-        self._session.write(":DISPlay:WINDow:TRACe1:DELete")
-        self._session.write(":CALCulate:PARameter:SELect 'PL'")
-
-        # trace_number = session.query(':CALCulate:PARameter:TNUMber?')
-        # Activate B receiver
-        # session.write(":CALCulate:PARameter:MODify B,1")
-        self._session.write(':SENSe:CORRection:COLLect:METHod RPOWer')
+        # Defines a measurement, so a failure is not retried command by command
+        with self.batch(idempotent=False) as batch:
+            # Create a measurement and select it
+            batch.write(":CALCulate:PARameter:DEFine:EXTended 'PL','B, 1'")  # Unratioed measurement
+            # Display measurement as trace 2
+            batch.write(":DISPlay:WINDow:TRACe2:FEED 'PL'")
+            # Delete the S11 measurement on trace 1
+            batch.write(":DISPlay:WINDow:TRACe1:DELete")
+            batch.write(":CALCulate:PARameter:SELect 'PL'")
+
+            # trace_number = session.query(':CALCulate:PARameter:TNUMber?')
+            # Activate B receiver
+            # session.write(":CALCulate:PARameter:MODify B,1")
+            batch.write(':SENSe:CORRection:COLLect:METHod RPOWer')
         # Sweep and wait for *OPC
-        self._session.query(':SENSe:CORRection:COLLect:ACQuire POWer;*OPC?')
+        self.wait_for_opc(':SENSe:CORRection:COLLect:ACQuire POWer', RECEIVER_CAL_TIMEOUT)
         # Apply
         self._session.write(':SENSe:CORRection:COLLect:SAVE')
-        # Reset the timeout value to the default
-        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, 4000)
 
         # Done with the power cal
         # print('Finished receiver power calibration.')
@@ -326,174 +635,264 @@ class PNA:
         if resp == 'Yes':
             print('We did it!')
 
-        # Find the range number for the primary range
-        self._primaryNum = self._session.query(":SENSe:FOM:RNUM? 'Primary'")[:-1]
-        # Use it to set primary freq range
-        self._session.write(
-            ':SENSe:FOM:RANGe' + str(int(self._primaryNum)) + ':FREQuency:STARt 350000000')  # 350 MHz
-        self._session.write(':SENSe:FOM:RANGe' + str(int(self._primaryNum)) + ':FREQuency:STOP 2000000000')  # 2 GHz
-
-        # Find the range number for the source and source2 range
-        source_num = self._session.query(":SENSe:FOM:RNUM? 'Source'")[:-1]
-        source2_num = self._session.query(":SENSe:FOM:RNUM? 'Source2'")[:-1]
-        receivers_num = self._session.query(":SENSe:FOM:RNUM? 'Receivers'")[:-1]
-
-        # Couple them to the primary range and set the offset
-        self._session.write(':SENSe:FOM:RANGe' + str(int(source_num)) + ':COUPled 1')
-        self._session.write(':SENSe:FOM:RANGe' + str(int(source2_num)) + ':COUPled 1')
-        self._session.write(':SENSe:FOM:RANGe' + str(int(receivers_num)) + ':COUPled 1')
-        self._session.write(':SENSe:FOM:RANGe' + str(int(source_num)) + ':FREQuency:OFFSet -500000')  # -500 kHz
-        self._session.write(':SENSe:FOM:RANGe' + str(int(source2_num)) + ':FREQuency:OFFSet 500000')  # 500 kHz
-        self._session.write(':SENSe:FOM:RANGe' + str(int(receivers_num)) + ':FREQuency:OFFSet -500000')  # -500 kHz
-
-        # Turn frequency offset ON
-        self._session.write(':SENSe:FOM:STATe 1')
-
-        # Turn on port 1 and port 3
-        self._session.write(':SOURce:POWer1:MODE ON')
-        self._session.write(':SOURce:POWer3:MODE ON')
-
-        time.sleep(0.1)
-
-        self._session.write("DISPlay:WINDow:TRACe2:Y:SCALe:RLEVel -50")
-
-        # Copy channel 1 to channel 2
-        self.copy_channel(2, 'IM2', 0, 2)
-        # Copy channel 1 to channel 3
-        self.copy_channel(3, 'PH', 500000, 1)
-        # Copy channel 1 to channel 4
-        self.copy_channel(4, 'IM3L', -1500000, 1)
-        # Copy channel 1 to channel 5
-        self.copy_channel(5, 'IM3H', 1500000, 1)
-
-    def copy_channel(self, to_channel, name, offset, multiplier):
-        # Copy channel 1 to new channel
-        self._session.write(':SYSTem:MACRo:COPY:CHANnel:TO ' + str(to_channel))
-        # Create an unratioed measurement and select it
-        self._session.write(":CALCulate" + str(to_channel) + ":PARameter:DEFine:EXTended '" + name + "','B, 1'")
-        # Display measurement as trace
-        self._session.write(":DISPlay:WINDow:TRACe" + str(to_channel + 1) + ":FEED '" + name + "'")
-        # adjust offset
-        self._session.write("DISPlay:WINDow:TRACe" + str(to_channel + 1) + ":Y:SCALe:RLEVel -50")
-        # Delete the S11 measurement on trace 1
-        self._session.write(":DISPlay:WINDow:TRACe1:DELete")
-        self._session.write(":CALCulate" + str(to_channel) + ":PARameter:SELect '" + name + "'")
+        self._check_cancelled()
+        self._setup_two_tone_channels()
 
-        # Adjust freq offset params
-        rec_num = self._session.query(":SENSe" + str(to_channel) + ":FOM:RNUM? 'Receivers'")[:-1]
-        self._session.write(
-            ':SENSe' + str(to_channel) + ':FOM:RANGe' + str(int(rec_num)) + ':FREQuency:OFFSet ' + str(offset))
-        self._session.write(
-            ':SENSe' + str(to_channel) + ':FOM:RANGe' + str(int(rec_num)) + ':FREQuency:MULTiplier ' + str(multiplier))
+        # Keep the finished setup so later sessions can reload it instead of recalibrating
+        self.save_calibration()
 
-        time.sleep(0.1)
+    def save_calibration(self) -> str:
+        """Saves the calibrated setup to a .csa state/cal set file on the PNA and indexes it."""
+        filename = (CAL_STATE_DIR + 'twotone_' + ('%g' % float(self.input_pow)).replace('-', 'm') + 'dBm_'
+                    + time.strftime('%Y%m%d_%H%M%S') + '.csa')
+        self.wait_for_opc("MMEMory:STORe '" + filename + "'", 30)
+        self.cal_index.add(filename, self._idn, self.input_pow, FREQ_PLAN)
+        return filename
 
-    def two_tone_test(self, input_power):
-        # Start two-tone measurement
-        if self.input_pow is None:
-            print("uh-oh, the machine wasn't calibrated before running the tests")
-            self.input_pow = input_power
+    def recall_calibration(self, input_power) -> bool:
+        """Loads a saved calibration matching this PNA, input power and frequency plan.
+
+        Returns False if there is no valid match, in which case a full calibration is needed.
+        """
+        entry = self.cal_index.find(self._idn, input_power, FREQ_PLAN)
+        if entry is None:
+            return False
 
-            # Find the range number for the primary range
-            self._primaryNum = self._session.query(":SENSe:FOM:RNUM? 'Primary'")[:-1]
-            # Use it to set primary freq range
-            self._session.write(':SENSe:FOM:RANGe' + str(int(self._primaryNum)) + ':FREQuency:STARt 350000000')  # 350 MHz
-            self._session.write(':SENSe:FOM:RANGe' + str(int(self._primaryNum)) + ':FREQuency:STOP 2000000000')  # 2 GHz
-
-            # Find the range number for the source and source2 range
-            source_num = self._session.query(":SENSe:FOM:RNUM? 'Source'")[:-1]
-            source2_num = self._session.query(":SENSe:FOM:RNUM? 'Source2'")[:-1]
-            receivers_num = self._session.query(":SENSe:FOM:RNUM? 'Receivers'")[:-1]
-
-            # Couple them to the primary range and set the offset
-            self._session.write(':SENSe:FOM:RANGe' + str(int(source_num)) + ':COUPled 1')
-            self._session.write(':SENSe:FOM:RANGe' + str(int(source2_num)) + ':COUPled 1')
-            self._session.write(':SENSe:FOM:RANGe' + str(int(receivers_num)) + ':COUPled 1')
-            self._session.write(':SENSe:FOM:RANGe' + str(int(source_num)) + ':FREQuency:OFFSet -500000')  # -500 kHz
-            self._session.write(':SENSe:FOM:RANGe' + str(int(source2_num)) + ':FREQuency:OFFSet 500000')  # 500 kHz
-            self._session.write(':SENSe:FOM:RANGe' + str(int(receivers_num)) + ':FREQuency:OFFSet -500000')  # -500 kHz
+        try:
+            self.wait_for_opc("MMEMory:LOAD '" + entry['file'] + "'", 30)
+        except InstrumentError:
+            # The file was deleted or can't be read, don't offer it again
+            self.cal_index.remove(entry['file'])
+            return False
+
+        # Loading a state replaces every channel like a preset does, but brings the two-tone layout back with it
+        self._preset_count += 1
+        self._get_channel_cache()['channels_built'] = True
+        self.input_pow = input_power
+        return True
+
+    def _setup_two_tone_channels(self):
+        """Sets up the frequency offset ranges and copies channel 1 into channels 2-5.
+
+        Only done once per preset, later tests reuse the cached layout. The
+        commands go out as two batches, around the one query for the range
+        numbers of the copied channels.
+        """
+        cache = self._get_channel_cache()
+        if cache['channels_built']:
+            return
+
+        numbers = self.range_numbers([(1, 'Primary'), (1, 'Source'), (1, 'Source2'), (1, 'Receivers')])
+        primary_num = str(numbers[(1, 'Primary')])
+        source_num = str(numbers[(1, 'Source')])
+        source2_num = str(numbers[(1, 'Source2')])
+        receivers_num = str(numbers[(1, 'Receivers')])
+
+        # Copies channels and defines measurements, so a failure is not retried command by command
+        with self.batch(idempotent=False) as batch:
+            # Use the primary range number to set primary freq range
+            batch.write(':SENSe:FOM:RANGe' + primary_num + ':FREQuency:STARt '
+                        + str(FREQ_PLAN['primary_start']))  # 350 MHz
+            batch.write(':SENSe:FOM:RANGe' + primary_num + ':FREQuency:STOP '
+                        + str(FREQ_PLAN['primary_stop']))  # 2 GHz
+
+            # Couple the source, source2 and receiver ranges to the primary range and set the offset
+            batch.write(':SENSe:FOM:RANGe' + source_num + ':COUPled 1')
+            batch.write(':SENSe:FOM:RANGe' + source2_num + ':COUPled 1')
+            batch.write(':SENSe:FOM:RANGe' + receivers_num + ':COUPled 1')
+            batch.write(':SENSe:FOM:RANGe' + source_num + ':FREQuency:OFFSet -500000')  # -500 kHz
+            batch.write(':SENSe:FOM:RANGe' + source2_num + ':FREQuency:OFFSet 500000')  # 500 kHz
+            batch.write(':SENSe:FOM:RANGe' + receivers_num + ':FREQuency:OFFSet -500000')  # -500 kHz
 
             # Turn frequency offset ON
-            self._session.write(':SENSe:FOM:STATe 1')
+            batch.write(':SENSe:FOM:STATe 1')
 
             # Turn on port 1 and port 3
-            self._session.write(':SOURce:POWer1:MODE ON')
-            self._session.write(':SOURce:POWer3:MODE ON')
+            batch.write(':SOURce:POWer1:MODE ON')
+            batch.write(':SOURce:POWer3:MODE ON')
 
-            time.sleep(0.1)
+            batch.write("DISPlay:WINDow:TRACe2:Y:SCALe:RLEVel -50")
 
-            self._session.write("DISPlay:WINDow:TRACe2:Y:SCALe:RLEVel -50")
+            # Copy channel 1 to channels 2-5
+            for to_channel, name, offset, multiplier in TWO_TONE_CHANNELS:
+                self.copy_channel(batch, to_channel, name)
 
-            # Copy channel 1 to channel 2
-            self.copy_channel(2, 'IM2', 0, 2)
-            # Copy channel 1 to channel 3
-            self.copy_channel(3, 'PH', 500000, 1)
-            # Copy channel 1 to channel 4
-            self.copy_channel(4, 'IM3L', -1500000, 1)
-            # Copy channel 1 to channel 5
-            self.copy_channel(5, 'IM3H', 1500000, 1)
+        # The copies have their own FOM ranges, look up all their receiver ranges at once
+        numbers = self.range_numbers([(to_channel, 'Receivers') for to_channel, _, _, _ in TWO_TONE_CHANNELS])
+        with self.batch() as batch:
+            for to_channel, name, offset, multiplier in TWO_TONE_CHANNELS:
+                self.set_receiver_offset(batch, to_channel, numbers[(to_channel, 'Receivers')], offset, multiplier)
+        # Wait once for the PNA to apply the whole setup instead of pausing after every step
+        self._session.query('*OPC?')
 
-        # Save data
+        cache['channels_built'] = True
+
+    def copy_channel(self, batch, to_channel, name):
+        # Copy channel 1 to new channel
+        batch.write(':SYSTem:MACRo:COPY:CHANnel:TO ' + str(to_channel))
+        # Create an unratioed measurement and select it
+        batch.write(":CALCulate" + str(to_channel) + ":PARameter:DEFine:EXTended '" + name + "','B, 1'")
+        # Display measurement as trace
+        batch.write(":DISPlay:WINDow:TRACe" + str(to_channel + 1) + ":FEED '" + name + "'")
+        # adjust offset
+        batch.write("DISPlay:WINDow:TRACe" + str(to_channel + 1) + ":Y:SCALe:RLEVel -50")
+        # Delete the S11 measurement on trace 1
+        batch.write(":DISPlay:WINDow:TRACe1:DELete")
+        batch.write(":CALCulate" + str(to_channel) + ":PARameter:SELect '" + name + "'")
 
-        # # 'Turn continuous sweep off
-        self._session.write("INITiate:CONTinuous OFF")
+    @staticmethod
+    def set_receiver_offset(batch, channel, receivers_num, offset, multiplier):
+        # Adjust freq offset params
+        batch.write(':SENSe' + str(channel) + ':FOM:RANGe' + str(receivers_num) + ':FREQuency:OFFSet ' + str(offset))
+        batch.write(
+            ':SENSe' + str(channel) + ':FOM:RANGe' + str(receivers_num) + ':FREQuency:MULTiplier ' + str(multiplier))
 
+    def _emit_trace(self, name, values) -> None:
+        if self.trace_callback is not None:
+            self.trace_callback(name, self.x_axis, values)
+
+    def _acquire_sequential(self, after_sweep=None):
+        """Triggers and reads the two-tone channels one at a time."""
+        start = time.perf_counter()
         # To trigger ONLY a specified channel:
-        # Set ALL channels to Sens<ch>:Sweep:Mode HOLD
-        self._session.write(":SENSe1:SWEep:MODE HOLD")
-        self._session.write(":SENSe2:SWEep:MODE HOLD")
-        self._session.write(":SENSe3:SWEep:MODE HOLD")
-        self._session.write(":SENSe4:SWEep:MODE HOLD")
-        self._session.write(":SENSe5:SWEep:MODE HOLD")
         # Send TRIG:SCOP CURRent
         self._session.write(":TRIGger:SEQuence:SCOPe CURRent")
         # Send Init<ch>:Imm where <ch> is the channel to be triggered
-        self._session.write("INITiate1:IMMediate;*wai")
+        self.wait_for_opc("INITiate1:IMMediate", SWEEP_TIMEOUT)
 
         # # Must select the measurement before we can read the data
         self._session.write("CALCulate1:PARameter:SELect 'PL'")
 
-        self._session.write("FORM:DATA ASCII,0")  # Easy to implement but slow
-
         # # Ask for the data from the sweep, pick one of the locations to read
-        # Reset timeout value since this takes longer
-        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, -1)
-        self.primary_low = self._session.query_ascii_values("CALC1:DATA? FDATA", container=np.array)
+        self.primary_low = self.query_values("CALC1:DATA? FDATA")
 
         # Get frequency values
-        self.x_axis = (self._session.query_ascii_values("CALC1:X?", container=np.array))/1000000000
+        self.x_axis = self.query_values("CALC1:X?") / 1000000000
+        self._emit_trace('PL', self.primary_low)
 
-        self._session.write("INITiate3:IMMediate;*wai")
+        self.wait_for_opc("INITiate3:IMMediate", SWEEP_TIMEOUT)
         self._session.write("CALCulate3:PARameter:SELect 'PH'")
-        self.primary_high = self._session.query_ascii_values("CALC3:DATA? FDATA", container=np.array)
+        self.primary_high = self.query_values("CALC3:DATA? FDATA")
+        self._emit_trace('PH', self.primary_high)
 
-        self._session.write("INITiate2:IMMediate;*wai")
+        self.wait_for_opc("INITiate2:IMMediate", SWEEP_TIMEOUT)
         self._session.write("CALCulate2:PARameter:SELect 'IM2'")
-        self.second_intermod = self._session.query_ascii_values("CALC2:DATA? FDATA", container=np.array)
+        self.second_intermod = self.query_values("CALC2:DATA? FDATA")
+        self._emit_trace('IM2', self.second_intermod)
 
-        self._session.write("INITiate4:IMMediate;*wai")
+        self.wait_for_opc("INITiate4:IMMediate", SWEEP_TIMEOUT)
         self._session.write("CALCulate4:PARameter:SELect 'IM3L'")
-        self.third_intermod_low = self._session.query_ascii_values("CALC4:DATA? FDATA", container=np.array)
+        self.third_intermod_low = self.query_values("CALC4:DATA? FDATA")
+        self._emit_trace('IM3L', self.third_intermod_low)
 
-        self._session.write("INITiate5:IMMediate;*wai")
+        self.wait_for_opc("INITiate5:IMMediate", SWEEP_TIMEOUT)
+        if after_sweep is not None:
+            # Every channel is swept and on hold, only the last trace is left to read
+            after_sweep()
         self._session.write("CALCulate5:PARameter:SELect 'IM3H'")
-        self.third_intermod_high = self._session.query_ascii_values("CALC5:DATA? FDATA", container=np.array)
+        self.third_intermod_high = self.query_values("CALC5:DATA? FDATA")
+        self._emit_trace('IM3H', self.third_intermod_high)
+
+        # Sweeps and reads are interleaved here, so only the totals can be separated
+        total = time.perf_counter() - start
+        self.timing = {'sweep': total - self.readout_time, 'readout': self.readout_time, 'total': total}
+
+    def _acquire_single_sweep(self, after_sweep=None):
+        """Sweeps all five two-tone channels off one trigger, then reads every trace.
+
+        The traces are fetched per measurement number with CALC:MEAS<n>, so no
+        SELect round trip is needed in between.
+        """
+        start = time.perf_counter()
+        mnums = self._get_measurement_numbers()
+        lookup = time.perf_counter()
+
+        # One trigger sweeps every channel in turn
+        self._session.write(":TRIGger:SEQuence:SCOPe ALL")
+        # Wait once until every channel has finished
+        self.wait_for_opc(":INITiate:IMMediate", SWEEP_TIMEOUT * len(TWO_TONE_MEASUREMENTS))
+        swept = time.perf_counter()
+        if after_sweep is not None:
+            # The traces are held now, so the caller can change the DUT while they are read out
+            after_sweep()
+
+        self.x_axis = self.query_values("CALC:MEAS" + mnums['PL'] + ":X?") / 1000000000
+        self.primary_low = self.query_values("CALC:MEAS" + mnums['PL'] + ":DATA:FDATA?")
+        self.second_intermod = self.query_values("CALC:MEAS" + mnums['IM2'] + ":DATA:FDATA?")
+        self.primary_high = self.query_values("CALC:MEAS" + mnums['PH'] + ":DATA:FDATA?")
+        self.third_intermod_low = self.query_values("CALC:MEAS" + mnums['IM3L'] + ":DATA:FDATA?")
+        self.third_intermod_high = self.query_values("CALC:MEAS" + mnums['IM3H'] + ":DATA:FDATA?")
+        done = time.perf_counter()
+        for name, values in (('PL', self.primary_low), ('IM2', self.second_intermod), ('PH', self.primary_high),
+                             ('IM3L', self.third_intermod_low), ('IM3H', self.third_intermod_high)):
+            self._emit_trace(name, values)
+
+        self.timing = {'lookup': lookup - start, 'sweep': swept - lookup,
+                       'readout': done - swept, 'total': done - start}
+
+    def _get_measurement_numbers(self) -> dict:
+        """Returns the measurement number of each two-tone trace, keyed by name.
+
+        Looked up once after the channels are built, then reused.
+        """
+        cache = self._get_channel_cache()
+        if cache['mnums'] is None:
+            mnums = {}
+            for channel, name in TWO_TONE_MEASUREMENTS:
+                self._session.write("CALCulate" + str(channel) + ":PARameter:SELect '" + name + "'")
+                mnums[name] = str(int(self._session.query("CALCulate" + str(channel) + ":PARameter:MNUMber?")))
+            cache['mnums'] = mnums
+        return cache['mnums']
+
+    def prepare_two_tone_test(self):
+        """Builds the two-tone channels and puts them on hold, ready for two_tone_test."""
+        self._setup_two_tone_channels()
 
-        # Reset the timeout
-        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, 4000)
+        # Save data
 
-        # Do math on the signals
+        with self.batch() as batch:
+            # # 'Turn continuous sweep off
+            batch.write("INITiate:CONTinuous OFF")
+
+            # Set ALL channels to Sens<ch>:Sweep:Mode HOLD so only our triggers start a sweep
+            batch.write(":SENSe1:SWEep:MODE HOLD")
+            batch.write(":SENSe2:SWEep:MODE HOLD")
+            batch.write(":SENSe3:SWEep:MODE HOLD")
+            batch.write(":SENSe4:SWEep:MODE HOLD")
+            batch.write(":SENSe5:SWEep:MODE HOLD")
+
+            self.set_data_format(self.data_format, batch)
+
+    def two_tone_test(self, input_power, after_sweep=None):
+        """Runs one two-tone acquisition and computes the intercepts.
 
-        # OIP2 = PL + PH - IM2
-        self.OIP2 = self.primary_low + self.primary_high - self.second_intermod
-        # OIP3 = max((2*PL+PH-IM3L)/2, (PL+2*PH-IM3H)/2)
-        self.OIP3 = np.maximum((2 * self.primary_low + self.primary_high - self.third_intermod_low) / 2,
-                               (self.primary_low + 2 * self.primary_high - self.third_intermod_high) / 2)
-        # gain = PL - inputPow
-        self.gain = self.primary_low - input_power
-        self.IIp2 = self.OIP2 - self.gain
-        self.IIp3 = self.OIP3 - self.gain
-
-        # Turn continuous sweep back on
-        self._session.write("INITiate:CONTinuous ON")
+        after_sweep, if given, is called once the sweeps are done but before all
+        the traces have been read, so DUT changes for the next run can overlap
+        the readout. The sequential mode reads each trace after its own sweep,
+        so there it runs before the last trace is read.
+        """
+        # Start two-tone measurement
+        if self.input_pow is None:
+            print("uh-oh, the machine wasn't calibrated before running the tests")
+            self.input_pow = input_power
+
+        self.prepare_two_tone_test()
+        self.readout_time = 0
+
+        try:
+            if self.acquisition_mode == ACQUIRE_SINGLE_SWEEP:
+                self._acquire_single_sweep(after_sweep)
+            else:
+                self._acquire_sequential(after_sweep)
+        finally:
+            # Turn continuous sweep back on, also when the acquisition failed, so the PNA is not left on hold
+            self._session.write("INITiate:CONTinuous ON")
+
+        # Do math on the signals
+        self.gain, self.OIP2, self.OIP3, self.IIp2, self.IIp3 = compute_intercepts(
+            self.primary_low, self.primary_high, self.second_intermod, self.third_intermod_low,
+            self.third_intermod_high, input_power)
+        for name, values in (('gain', self.gain), ('OIP2', self.OIP2), ('OIP3', self.OIP3), ('IIP2', self.IIp2),
+                             ('IIP3', self.IIp3)):
+            self._emit_trace(name, values)
 
@@ -0,0 +1,137 @@
+import datetime
+import json
+import os
+import time
+
+import pyvisa as visa
+
+from archive import MeasurementArchive, pack_run
+from pna import InstrumentError
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ProductionQueue:
+    """Measures a lot of DUTs on one PNA calibration and saves each one as it goes.
+
+    Progress is checkpointed to a JSON file after every device, so after a
+    crash, a VISA timeout or an instrument error, run() picks up at the first
+    device that is not done yet. A device whose measurement keeps failing is
+    marked failed after max_attempts and the lot carries on, failed devices
+    are retried on the next run. Each DUT is appended to the archive <out_dir>/<serial>.npy.
+    Progress messages go to log(message), print by default.
+    """
+
+    def __init__(self, pna, input_power, checkpoint_path, out_dir='.', max_attempts=2, log=print):
+        self.pna = pna
+        self.log = log
+        self.input_power = input_power
+        self.checkpoint_path = checkpoint_path
+        self.out_dir = out_dir
+        self.max_attempts = max_attempts
+        self.devices = {}
+        # Devices finished in this session and the time it took, for the throughput report
+        self.session_done = 0
+        self.session_start = None
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            # A lot is measured at one power, resuming it at another would mix two calibrations
+            if float(checkpoint['input_power']) != float(input_power):
+                raise ValueError('Checkpoint ' + checkpoint_path + ' was measured at ' + str(checkpoint['input_power'])
+                                 + ' dBm, not ' + str(input_power) + ' dBm')
+            self.devices = checkpoint['devices']
+
+    def _save_checkpoint(self) -> None:
+        # Write then rename, so a crash mid-write never leaves a truncated checkpoint
+        with open(self.checkpoint_path + '.tmp', 'w') as f:
+            json.dump({'input_power': float(self.input_power), 'devices': self.devices}, f, indent=2)
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+
+    def is_done(self, serial) -> bool:
+        return self.devices.get(serial, {}).get('status') == DONE
+
+    def _ensure_calibrated(self) -> None:
+        # One calibration is shared by the whole lot, a calibration at any other power is not reused
+        if self.pna.input_pow is not None and float(self.pna.input_pow) == float(self.input_power):
+            return
+        if not self.pna.recall_calibration(self.input_power):
+            self.pna.calibration(self.input_power)
+
+    def _measure_once(self, serial, metadata) -> str:
+        self.pna.two_tone_test(float(self.input_power))
+        run = pack_run(self.pna.x_axis * 1000000000, self.pna.primary_low, self.pna.primary_high,
+                       self.pna.second_intermod, self.pna.third_intermod_low, self.pna.third_intermod_high,
+                       self.pna.OIP2, self.pna.OIP3, self.pna.gain, self.pna.IIp2, self.pna.IIp3)
+        archive = MeasurementArchive(os.path.join(self.out_dir, serial))
+        entry = {'Serial Number': serial, 'Input Power (dBm)': float(self.input_power)}
+        entry.update(metadata or {})
+        archive.append(run, entry)
+        return archive.data_path
+
+    def measure(self, serial, metadata=None) -> bool:
+        """Measures and saves one DUT, reconnecting to the PNA between failed attempts."""
+        start = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                path = self._measure_once(serial, metadata)
+            except (visa.Error, InstrumentError, TimeoutError, ConnectionError) as ex:
+                error = ex
+                self.log('Attempt ' + str(attempt) + ' on ' + serial + ' failed: ' + str(ex))
+                try:
+                    self.pna.close_session()
+                except visa.Error:
+                    pass
+                if self.pna.connect_to_pna() != 0:
+                    raise ConnectionError('Could not reconnect to the PNA at ' + self.pna.VISA_ADDRESS) from ex
+                continue
+            self.devices[serial] = {'status': DONE, 'archive': path, 'attempts': attempt,
+                                    'seconds': time.perf_counter() - start,
+                                    'date': datetime.datetime.now().isoformat(timespec='seconds')}
+            self.session_done += 1
+            self._save_checkpoint()
+            return True
+        self.devices[serial] = {'status': FAILED, 'error': str(error), 'attempts': self.max_attempts,
+                                'date': datetime.datetime.now().isoformat(timespec='seconds')}
+        self._save_checkpoint()
+        return False
+
+    def run(self, serials=None, read_serial=None, prompt=None, metadata=None, check_cancelled=None) -> dict:
+        """Works through the lot and returns report().
+
+        Either pass the serials to measure, or read_serial() to take each one
+        from the DUT itself, e.g. the FTX/FRX EEPROM. prompt(serial) is called
+        before each device (serial is None when it will be read) and returning
+        False ends the run. metadata() supplies extra archive metadata per DUT
+        and check_cancelled() may raise to stop between devices.
+        """
+        if serials is None and read_serial is None:
+            raise ValueError('Pass either serials or read_serial')
+        self._ensure_calibrated()
+        self.session_start = time.perf_counter()
+        self.session_done = 0
+        pending = None if serials is None else [serial for serial in serials if not self.is_done(serial)]
+        while pending is None or pending:
+            if check_cancelled is not None:
+                check_cancelled()
+            serial = None if pending is None else pending[0]
+            if prompt is not None and not prompt(serial):
+                break
+            if pending is None:
+                serial = read_serial()
+                if self.is_done(serial):
+                    self.log(serial + ' was already measured, skipping.')
+                    continue
+            else:
+                pending.pop(0)
+            self.measure(serial, metadata() if metadata is not None else None)
+        return self.report()
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.session_start if self.session_start is not None else 0
+        done = [serial for serial, device in self.devices.items() if device['status'] == DONE]
+        failed = [serial for serial, device in self.devices.items() if device['status'] == FAILED]
+        return {'done': len(done), 'failed': failed, 'session_done': self.session_done, 'elapsed': elapsed,
+                'duts_per_hour': self.session_done / elapsed * 3600 if elapsed > 0 else 0.0}
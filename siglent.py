@@ -0,0 +1,145 @@
+import pyvisa as visa
+import numpy as np
+from pyvisa.constants import VI_ATTR_TMO_VALUE
+
+from pna import DEFAULT_TIMEOUT, InstrumentError, ScpiBatch, read_error_queue, wait_for_opc
+from worker import Cancelled
+
+# Trace transfer formats, see FORMat:TRACe:DATA
+DATA_FORMAT_REAL = 'REAL'
+DATA_FORMAT_ASCII = 'ASCii'
+
+# Traces used by the noise measurement, dark current (laser off) on A and the signal on B
+DARK_TRACE = 1
+SIGNAL_TRACE = 2
+
+# Averages per trace, the count the noise exports were taken with
+DEFAULT_AVERAGES = 16
+
+# Upper bound in seconds for one averaged trace, so a hung SA raises instead of blocking forever
+AVERAGE_TIMEOUT = 300
+
+
+class SiglentSA:
+    """Driver for the Siglent SSA3000X spectrum analyzer used for the noise measurements.
+
+    Traces are averaged on the instrument and fetched as binary blocks, and
+    measure_noise returns them in the layout of noise.load_noise, so a noise
+    run no longer goes through a CSV export. Use TCPIP0::127.0.0.1::5025::SOCKET
+    with `python simulator.py serve --instrument sa` to run without the SA.
+    """
+
+    def __init__(self, visa_address='TCPIP0::192.168.1.100::INSTR'):
+        self._session = None
+        self._resourceManager = None
+        self.VISA_ADDRESS = visa_address
+        # Binary block transfer is the default, ASCII is kept as a fallback
+        self.data_format = DATA_FORMAT_REAL
+        self._idn = None
+        # Set by the caller when running on a worker, long operations stop once it is set
+        self.cancel_event = None
+
+    def connect(self) -> int:
+        try:
+            self._resourceManager = visa.ResourceManager()
+            self._session = self._resourceManager.open_resource(self.VISA_ADDRESS)
+        except visa.Error:
+            return 1
+
+        # For Serial and TCP/IP socket connections enable the read Termination Character, or read's will timeout
+        if self._session.resource_name.startswith('ASRL') or self._session.resource_name.endswith('SOCKET'):
+            self._session.read_termination = '\n'
+        # Averaging is waited on with wait_for_opc, so no single read needs more than this
+        self._session.set_visa_attribute(VI_ATTR_TMO_VALUE, DEFAULT_TIMEOUT)
+        self._idn = self._session.query('*IDN?')
+        self.set_data_format(self.data_format)
+        return 0
+
+    def close_session(self):
+        self._session.close()
+        self._resourceManager.close()
+        self._idn = None
+
+    def get_idn(self):
+        self._idn = self._session.query('*IDN?')
+        return self._idn
+
+    def _check_cancelled(self) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Cancelled()
+
+    def check_errors(self, context=None) -> None:
+        """Reads the SA error queue until it is empty and raises InstrumentError if it held anything."""
+        errors = read_error_queue(self._session)
+        if errors:
+            raise InstrumentError((context + ': ' if context else '') + '; '.join(errors))
+
+    def batch(self) -> ScpiBatch:
+        return ScpiBatch(self._session)
+
+    def set_data_format(self, data_format) -> None:
+        # REAL is 32 bit little endian floats on the SSA3000X, there is no byte order setting
+        self._session.write(':FORMat:TRACe:DATA ' + data_format)
+        self.data_format = data_format
+
+    def configure(self, start, stop, rbw=None, vbw=None) -> None:
+        """Sets the span in Hz and optionally the resolution and video bandwidths, checking for errors once."""
+        with self.batch() as batch:
+            batch.write('SENSe:FREQuency:STARt ' + str(start))
+            batch.write('SENSe:FREQuency:STOP ' + str(stop))
+            if rbw is not None:
+                batch.write('SENSe:BANDwidth:RESolution ' + str(rbw))
+            if vbw is not None:
+                batch.write('SENSe:BANDwidth:VIDeo ' + str(vbw))
+
+    def get_rbw(self) -> float:
+        return float(self._session.query(':SENSe:BANDwidth:RESolution?'))
+
+    def frequencies(self) -> np.ndarray:
+        """Frequency in Hz of every trace point, from the span and the point count."""
+        start = float(self._session.query(':SENSe:FREQuency:STARt?'))
+        stop = float(self._session.query(':SENSe:FREQuency:STOP?'))
+        points = int(float(self._session.query(':SENSe:SWEep:POINts?')))
+        return np.linspace(start, stop, points)
+
+    def fetch_trace(self, trace) -> np.ndarray:
+        query = ':TRACe:DATA? ' + str(trace)
+        if self.data_format == DATA_FORMAT_REAL:
+            return self._session.query_binary_values(query, datatype='f', is_big_endian=False, container=np.array)
+        return self._session.query_ascii_values(query, container=np.array)
+
+    def measure_trace(self, trace, averages=DEFAULT_AVERAGES, timeout=AVERAGE_TIMEOUT) -> np.ndarray:
+        """Averages averages sweeps into trace on the SA and returns it in dBm.
+
+        The trace is left in view mode afterwards, so it holds while another
+        trace is measured.
+        """
+        with self.batch() as batch:
+            batch.write('INITiate:CONTinuous OFF')
+            batch.write('TRACe' + str(trace) + ':MODE AVERage')
+            batch.write('AVERage:TRACe' + str(trace) + ':COUNt ' + str(averages))
+            batch.write('AVERage:TRACe' + str(trace) + ':CLEar')
+        # A single sweep runs until the average count is reached
+        wait_for_opc(self._session, ':INITiate:IMMediate', timeout, self._check_cancelled)
+        values = self.fetch_trace(trace)
+        self._session.write(':TRACe' + str(trace) + ':MODE VIEW')
+        return values
+
+    def measure_noise(self, averages=DEFAULT_AVERAGES, between=None, timeout=AVERAGE_TIMEOUT) -> dict:
+        """Measures the dark trace, calls between() and measures the signal trace.
+
+        between is where the laser is turned on, or the operator asked to do
+        it. Returns freq in Hz, dark and trace in dBm, the rbw and metadata,
+        the same dict as noise.load_noise.
+        """
+        freq = self.frequencies()
+        rbw = self.get_rbw()
+        dark = self.measure_trace(DARK_TRACE, averages, timeout)
+        if between is not None:
+            between()
+        self._check_cancelled()
+        trace = self.measure_trace(SIGNAL_TRACE, averages, timeout)
+        metadata = {'Instrument': self._idn.strip() if self._idn else '', 'RBW(Hz)': str(rbw),
+                    'Averages': str(averages)}
+        return {'freq': freq, 'dark': dark, 'trace': trace, 'rbw': rbw, 'metadata': metadata}
+
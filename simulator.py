@@ -0,0 +1,675 @@
+# -*- coding: utf-8 -*-
+""" Offline stand-ins for the PNA and the Siglent SA, served as a raw SCPI socket
+
+Start one with `python simulator.py serve` (add `--instrument sa` for the SA)
+and point PNA.VISA_ADDRESS or SiglentSA.VISA_ADDRESS at
+TCPIP0::127.0.0.1::5025::SOCKET, or run `python simulator.py benchmark` to time
+the acquisition pipeline against it without a bench.
+"""
+
+import argparse
+import re
+import socketserver
+import sys
+import threading
+import time
+import numpy as np
+
+SIM_ADDRESS = 'TCPIP0::127.0.0.1::%d::SOCKET'
+DEFAULT_PORT = 5025
+
+# FOM range numbers reported by the simulated PNA
+FOM_RANGES = {'Primary': 1, 'Source': 2, 'Receivers': 3, 'Source2': 4}
+
+
+def split_message(message):
+    """Splits a program message on the semicolons that are not inside quotes."""
+    parts = []
+    current = ''
+    quote = None
+    for char in message:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '\'"':
+            quote = char
+        elif char == ';':
+            parts.append(current.strip())
+            current = ''
+            continue
+        current += char
+    parts.append(current.strip())
+    return [part for part in parts if part]
+
+
+def short_form(mnemonic):
+    """Reduces a SCPI mnemonic to its short form, keeping any numeric suffix.
+
+    Follows the usual SCPI rule: the first four letters, or three if the fourth is a vowel.
+    """
+    match = re.fullmatch(r'([A-Z_]+)(\d*)(\??)', mnemonic.upper())
+    if match is None:
+        return mnemonic.upper()
+    word, suffix, query = match.groups()
+    if len(word) > 4:
+        word = word[:3] if word[3] in 'AEIOU' else word[:4]
+    return word + suffix + query
+
+
+def unquote(arg):
+    return arg.strip().strip('\'"')
+
+
+def _text(value):
+    return (str(value) + '\n').encode()
+
+
+class SimulatedInstrument:
+    """Message parsing and IEEE 488.2 status handling shared by the simulated instruments.
+
+    Subclasses implement _execute for their own commands and preset for *RST.
+    latency is added to every program message to mimic bus turnaround and
+    byte_time to every response byte. Operations that keep the instrument busy
+    push _busy_until forward, which *OPC, *OPC? and *WAI wait on.
+    """
+
+    def __init__(self, idn, latency=0.0, byte_time=0.0, seed=None):
+        self.idn = idn
+        self.latency = latency
+        self.byte_time = byte_time
+        self._rng = np.random.default_rng(seed)
+        self._errors = []
+        self._ese = 0
+        self._sre = 0
+        self._esr = 0
+        self._opc_armed = False
+        self._busy_until = 0.0
+
+    def preset(self):
+        pass
+
+    def _error(self, code, message):
+        self._errors.append('%d,"%s"' % (code, message))
+        # Flag the matching *ESR? bit: -1xx command, -2xx execution, -3xx device, -4xx query error
+        self._esr |= {1: 0b100000, 2: 0b10000, 3: 0b1000, 4: 0b100}.get(-code // 100, 0b1000)
+
+    def _wait_until_done(self):
+        remaining = self._busy_until - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _update_esr(self):
+        if self._opc_armed and time.monotonic() >= self._busy_until:
+            self._esr |= 1
+            self._opc_armed = False
+
+    def _busy(self, seconds):
+        self._busy_until = max(self._busy_until, time.monotonic()) + seconds
+
+    def handle(self, message):
+        """Executes one program message and returns the response bytes, or None."""
+        if self.latency:
+            time.sleep(self.latency)
+        responses = []
+        path = ''
+        for command in split_message(message):
+            header, _, args = command.partition(' ')
+            if header.startswith('*'):
+                canonical = header.upper()
+            else:
+                if not header.startswith(':') and path:
+                    # Relative header in a compound message, continues from the previous one
+                    header = path + ':' + header
+                nodes = [short_form(node) for node in header.strip(':').split(':')]
+                canonical = ':'.join(nodes)
+                path = ':'.join(nodes[:-1])
+            try:
+                if canonical.startswith('*'):
+                    response = self._execute_common(canonical, args.strip(), command)
+                else:
+                    response = self._execute(canonical, args.strip(), command)
+            except (ValueError, IndexError, KeyError):
+                self._error(-104, 'Data type error;' + command)
+                response = None
+            if response is not None:
+                responses.append(response)
+        if not responses:
+            return None
+        if len(responses) == 1:
+            reply = responses[0]
+        else:
+            reply = b';'.join(response.rstrip(b'\n') for response in responses) + b'\n'
+        if self.byte_time:
+            time.sleep(self.byte_time * len(reply))
+        return reply
+
+    def _execute_common(self, header, args, command):
+        # IEEE 488.2 common commands
+        if header == '*IDN?':
+            return _text(self.idn)
+        if header == '*RST':
+            self.preset()
+            return None
+        if header == '*CLS':
+            self._errors = []
+            self._esr = 0
+            self._opc_armed = False
+            return None
+        if header == '*OPC?':
+            self._wait_until_done()
+            return _text(1)
+        if header == '*OPC':
+            self._opc_armed = True
+            return None
+        if header == '*WAI':
+            self._wait_until_done()
+            return None
+        if header == '*ESE':
+            self._ese = int(args)
+            return None
+        if header == '*ESE?':
+            return _text(self._ese)
+        if header == '*SRE':
+            self._sre = int(args)
+            return None
+        if header == '*SRE?':
+            return _text(self._sre)
+        if header == '*ESR?':
+            self._update_esr()
+            esr, self._esr = self._esr, 0
+            return _text(esr)
+        if header == '*STB?':
+            self._update_esr()
+            stb = (0b100 if self._errors else 0) | (0b100000 if self._esr & self._ese else 0)
+            if stb & self._sre:
+                stb |= 0b1000000
+            return _text(stb)
+        self._error(-113, 'Undefined header;' + command)
+        return None
+
+    def _execute(self, header, args, command):
+        raise NotImplementedError
+
+
+class SimulatedPNA(SimulatedInstrument):
+    """Implements the SCPI subset this project sends to the PNA.
+
+    Two-tone traces are synthesised from a fixed gain and intercept model with
+    a little noise. latency is added to every program message to mimic bus
+    turnaround, byte_time to every response byte, and sweep_time to every
+    channel sweep. With calibrated set, channel 1 starts out holding the PL
+    measurement, as PNA.calibration leaves it before copying the channels.
+    """
+
+    def __init__(self, points=401, latency=0.0, byte_time=0.0, sweep_time=0.0, seed=None, calibrated=False):
+        super().__init__('Keysight Technologies,N5247B,SIM00000,A.00.00', latency, byte_time, seed)
+        self.points = points
+        self.sweep_time = sweep_time
+        self._gpib_handle = None
+        self.saved_states = {}
+        self.preset()
+        if calibrated:
+            self.channels = {1: {'PL': 1}}
+            self.selected = {1: 'PL'}
+
+    def preset(self):
+        self.start = 300e6
+        self.stop = 4.05e9
+        self.power = -50.0
+        self.data_format = 'ASCII'
+        self.big_endian = True
+        self.trigger_scope = 'ALL'
+        # channel -> {name: mnum}, plus the measurement selected on each channel
+        self.channels = {1: {'CH1_S11_1': 1}}
+        self.selected = {1: 'CH1_S11_1'}
+        self.next_mnum = 2
+        self.traces = {}
+
+    # Helpers
+
+    def _sweep(self, channels):
+        self._busy(self.sweep_time * len(channels))
+        for channel in channels:
+            for name, mnum in self.channels.get(channel, {}).items():
+                self.traces[mnum] = self._synthesize(name)
+
+    def _frequencies(self):
+        return np.linspace(self.start, self.stop, self.points)
+
+    def _synthesize(self, name):
+        freq = self._frequencies()
+        gain = -5 - 2 * freq / 1e9
+        pl = self.power + gain
+        ph = self.power + gain - 0.2
+        oip2 = 40 - 3 * freq / 1e9
+        oip3 = 25 - 2 * freq / 1e9
+        model = {'PL': pl,
+                 'PH': ph,
+                 'IM2': pl + ph - oip2,
+                 'IM3L': 2 * pl + ph - 2 * oip3,
+                 'IM3H': pl + 2 * ph - 2 * oip3}
+        trace = model.get(name, np.full(self.points, -100.0))
+        return trace + self._rng.normal(0, 0.05, self.points)
+
+    def _trace(self, mnum):
+        if mnum not in self.traces:
+            for channel in self.channels.values():
+                for name, number in channel.items():
+                    if number == mnum:
+                        self.traces[mnum] = self._synthesize(name)
+        return self.traces.get(mnum)
+
+    def _mnum(self, channel, name):
+        return self.channels.get(channel, {}).get(name)
+
+    def _format_values(self, values):
+        if self.data_format == 'REAL':
+            data = np.asarray(values, dtype='>f8' if self.big_endian else '<f8').tobytes()
+            length = str(len(data))
+            return b'#' + str(len(length)).encode() + length.encode() + data + b'\n'
+        return (','.join('%.12g' % value for value in values) + '\n').encode()
+
+    # Command handling
+
+    def _execute(self, header, args, command):
+        match = None
+
+        def m(pattern):
+            nonlocal match
+            match = re.fullmatch(pattern, header)
+            return match is not None
+
+        # System
+        if m(r'SYST:PRES'):
+            self.preset()
+            return None
+        if m(r'SYST:ERR\??'):
+            return _text(self._errors.pop(0) if self._errors else '+0,"No error"')
+        if m(r'SYST:COMM:GPIB:PMET:ADDR\?'):
+            return _text(13)
+        if m(r'SYST:COMM:GPIB:RDEV:OPEN'):
+            self._gpib_handle = 1
+            return None
+        if m(r'SYST:COMM:GPIB:RDEV:OPEN\?'):
+            return _text(self._gpib_handle)
+        if m(r'SYST:COMM:GPIB:RDEV:WRIT'):
+            return None
+        if m(r'SYST:COMM:GPIB:RDEV:READ\?'):
+            # The power meter answers its CAL? and *OPC? queries with success
+            return _text(0)
+        if m(r'SYST:COMM:GPIB:RDEV:CLOS'):
+            self._gpib_handle = None
+            return None
+        if m(r'SYST:MACR:COPY:CHAN(?::TO)?'):
+            self.channels[int(args)] = {}
+            return None
+
+        # Data transfer
+        if m(r'FORM(?::DATA)?'):
+            self.data_format = 'REAL' if args.upper().startswith('REAL') else 'ASCII'
+            return None
+        if m(r'FORM:BORD'):
+            self.big_endian = not args.upper().startswith('SWAP')
+            return None
+
+        # Stimulus and frequency offset
+        if m(r'SENS\d*:FREQ:STAR'):
+            self.start = float(args)
+            return None
+        if m(r'SENS\d*:FREQ:STOP'):
+            self.stop = float(args)
+            return None
+        if m(r'SENS\d*:SWE:POIN'):
+            self.points = int(float(args))
+            return None
+        if m(r'SENS\d*:FOM:RNUM\?'):
+            return _text(FOM_RANGES[unquote(args)])
+        if m(r'SENS\d*:FOM:RANG1:FREQ:STAR'):
+            self.start = float(args)
+            return None
+        if m(r'SENS\d*:FOM:RANG1:FREQ:STOP'):
+            self.stop = float(args)
+            return None
+        if m(r'SOUR1:POW(?::LEV)?(?::IMM)?(?::AMPL)?'):
+            self.power = float(args)
+            return None
+
+        # Triggering
+        if m(r'TRIG(?::SEQ)?:SCOP'):
+            self.trigger_scope = args.upper()[:3]
+            return None
+        if m(r'INIT(\d*)(?::IMM)?'):
+            channel = match.group(1)
+            if self.trigger_scope == 'ALL' and not channel:
+                self._sweep(sorted(self.channels))
+            else:
+                self._sweep([int(channel or 1)])
+            return None
+        if m(r'SOUR\d*:POW\d*:CORR:COLL:ACQ|SENS\d*:CORR:COLL:ACQ'):
+            self._busy(self.sweep_time)
+            return None
+
+        # Measurements
+        if m(r'CALC(\d*):PAR:DEF:EXT'):
+            name = unquote(args.split(',')[0])
+            self.channels.setdefault(int(match.group(1) or 1), {})[name] = self.next_mnum
+            self.next_mnum += 1
+            return None
+        if m(r'CALC(\d*):PAR:SEL'):
+            channel = int(match.group(1) or 1)
+            name = unquote(args)
+            if self._mnum(channel, name) is None:
+                self._error(-114, 'Header suffix out of range;' + command)
+            else:
+                self.selected[channel] = name
+            return None
+        if m(r'CALC(\d*):PAR:MNUM\?'):
+            channel = int(match.group(1) or 1)
+            return _text(self._mnum(channel, self.selected.get(channel)))
+        if m(r'CALC(\d*):DATA\?'):
+            channel = int(match.group(1) or 1)
+            return self._format_values(self._trace(self._mnum(channel, self.selected.get(channel))))
+        if m(r'CALC\d*:X(?::VAL)?\?'):
+            return self._format_values(self._frequencies())
+        if m(r'CALC:MEAS(\d+):DATA:FDAT\?'):
+            trace = self._trace(int(match.group(1)))
+            if trace is None:
+                self._error(-114, 'Header suffix out of range;' + command)
+                return None
+            return self._format_values(trace)
+        if m(r'CALC:MEAS\d+:X(?::VAL)?\?'):
+            return self._format_values(self._frequencies())
+
+        # Saved states
+        if m(r'MMEM:STOR(?::STAT)?'):
+            self.saved_states[unquote(args)] = (dict(self.channels), self.start, self.stop, self.power)
+            return None
+        if m(r'MMEM:LOAD(?::STAT)?'):
+            state = self.saved_states.get(unquote(args))
+            if state is None:
+                self._error(-256, 'File name not found;' + command)
+                return None
+            channels, self.start, self.stop, self.power = state
+            self.channels = {channel: dict(names) for channel, names in channels.items()}
+            self.selected = {channel: next(iter(names), None) for channel, names in self.channels.items()}
+            self.traces = {}
+            return None
+
+        if header.endswith('?'):
+            # A real instrument would leave the read to time out
+            self._error(-113, 'Undefined header;' + command)
+            return None
+        # Any other setting is accepted and has no effect on the simulated traces
+        return None
+
+
+class SimulatedSiglentSA(SimulatedInstrument):
+    """Implements the SCPI subset SiglentSA sends to the SSA3000X spectrum analyzer.
+
+    Trace 1 is the analyzer noise floor, trace 2 adds the output noise of a
+    DUT with noise_temp kelvin at its input and the gain of the simulated PNA,
+    so noise.analyse_measurement against that gain gets noise_temp back. The
+    scatter of a trace shrinks with the square root of its average count, and
+    each average takes sweep_time.
+    """
+
+    def __init__(self, points=751, latency=0.0, byte_time=0.0, sweep_time=0.0, seed=None, noise_temp=1e6):
+        super().__init__('Siglent Technologies,SSA3032X,SIM00000,3.2.2.5.1R1', latency, byte_time, seed)
+        self.points = points
+        self.sweep_time = sweep_time
+        self.noise_temp = noise_temp
+        self.preset()
+
+    def preset(self):
+        self.start = 300e6
+        self.stop = 4.05e9
+        self.rbw = 1e6
+        self.vbw = 1e6
+        self.data_format = 'ASCII'
+        self.continuous = True
+        # trace -> mode and average count, and the values held by each trace
+        self.modes = {1: 'WRIT', 2: 'BLAN', 3: 'BLAN', 4: 'BLAN'}
+        self.counts = {1: 16, 2: 16, 3: 16, 4: 16}
+        self.traces = {}
+
+    # Helpers
+
+    def _frequencies(self):
+        return np.linspace(self.start, self.stop, self.points)
+
+    def gain(self, freq):
+        # The simulated PNA's gain model
+        return -5 - 2 * freq / 1e9
+
+    def _synthesize(self, trace, count):
+        freq = self._frequencies()
+        # -161 dBm/Hz displayed average noise level with a little ripple
+        floor_dbm = -161 + 10 * np.log10(self.rbw) + 0.5 * np.sin(freq / 2e8)
+        power_w = 10 ** (floor_dbm / 10) / 1000
+        if trace == 2:
+            power_w = power_w + 1.380649e-23 * self.noise_temp * self.rbw * 10 ** (self.gain(freq) / 10)
+        return 10 * np.log10(power_w * 1000) + self._rng.normal(0, 0.5 / np.sqrt(count), self.points)
+
+    def _sweep(self):
+        # A single sweep runs until every averaging trace has its count
+        averaged = [trace for trace, mode in self.modes.items() if mode == 'AVER']
+        self._busy(self.sweep_time * max([self.counts[trace] for trace in averaged] + [1]))
+        for trace, mode in self.modes.items():
+            if mode in ('AVER', 'WRIT'):
+                self.traces[trace] = self._synthesize(trace, self.counts[trace] if mode == 'AVER' else 1)
+
+    def _format_values(self, values):
+        if self.data_format == 'REAL':
+            data = np.asarray(values, dtype='<f4').tobytes()
+            length = str(len(data))
+            return b'#' + str(len(length)).encode() + length.encode() + data + b'\n'
+        return (','.join('%.6g' % value for value in values) + '\n').encode()
+
+    # Command handling
+
+    def _execute(self, header, args, command):
+        match = None
+
+        def m(pattern):
+            nonlocal match
+            match = re.fullmatch(pattern, header)
+            return match is not None
+
+        if m(r'SYST:PRES'):
+            self.preset()
+            return None
+        if m(r'SYST:ERR\??'):
+            return _text(self._errors.pop(0) if self._errors else '0,"No error"')
+
+        # Frequency and bandwidth, the SENSe node is optional
+        if m(r'(SENS:)?FREQ:STAR'):
+            self.start = float(args)
+            return None
+        if m(r'(SENS:)?FREQ:STAR\?'):
+            return _text('%.12g' % self.start)
+        if m(r'(SENS:)?FREQ:STOP'):
+            self.stop = float(args)
+            return None
+        if m(r'(SENS:)?FREQ:STOP\?'):
+            return _text('%.12g' % self.stop)
+        if m(r'(SENS:)?SWE:POIN\?'):
+            return _text(self.points)
+        if m(r'(SENS:)?BAND(:RES)?'):
+            self.rbw = float(args)
+            return None
+        if m(r'(SENS:)?BAND(:RES)?\?'):
+            return _text('%.12g' % self.rbw)
+        if m(r'(SENS:)?BAND:VID'):
+            self.vbw = float(args)
+            return None
+
+        # Traces
+        if m(r'FORM(:TRAC)?(:DATA)?'):
+            self.data_format = 'REAL' if args.upper().startswith('REAL') else 'ASCII'
+            return None
+        if m(r'TRAC(\d):MODE'):
+            mode = short_form(args.strip())
+            if mode not in ('WRIT', 'MAXH', 'MINH', 'VIEW', 'BLAN', 'AVER'):
+                self._error(-224, 'Illegal parameter value;' + command)
+                return None
+            self.modes[int(match.group(1))] = mode
+            return None
+        if m(r'AVER:TRAC(\d):COUN'):
+            self.counts[int(match.group(1))] = int(args)
+            return None
+        if m(r'AVER:TRAC(\d):CLE'):
+            self.traces.pop(int(match.group(1)), None)
+            return None
+        if m(r'TRAC(:DATA)?\?'):
+            trace = int(args)
+            if self.modes.get(trace, 'BLAN') == 'BLAN':
+                self._error(-221, 'Settings conflict;' + command)
+                return None
+            if trace not in self.traces:
+                self.traces[trace] = self._synthesize(trace, 1)
+            return self._format_values(self.traces[trace])
+
+        # Triggering
+        if m(r'INIT:CONT'):
+            self.continuous = args.upper() in ('ON', '1')
+            return None
+        if m(r'INIT(:IMM)?'):
+            self._sweep()
+            return None
+
+        if header.endswith('?'):
+            # A real instrument would leave the read to time out
+            self._error(-113, 'Undefined header;' + command)
+            return None
+        return None
+
+
+class _SCPIHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            message = line.decode(errors='replace').strip()
+            if not message:
+                continue
+            with self.server.lock:
+                reply = self.server.instrument.handle(message)
+            if reply is not None:
+                self.wfile.write(reply)
+
+
+class SimulatorServer(socketserver.ThreadingTCPServer):
+    """Serves a simulated instrument as a raw SCPI socket, one program message per line."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, instrument, port=DEFAULT_PORT, host='127.0.0.1'):
+        super().__init__((host, port), _SCPIHandler)
+        self.instrument = instrument
+        self.lock = threading.Lock()
+
+    @property
+    def address(self):
+        return SIM_ADDRESS % self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def benchmark(address, runs=5, input_power=-50.0) -> dict:
+    """Times two_tone_test against the instrument at address for each acquisition mode and data format.
+
+    Returns the mean seconds per DUT keyed by (mode, format).
+    """
+    from pna import PNA, ACQUIRE_SINGLE_SWEEP, ACQUIRE_SEQUENTIAL, DATA_FORMAT_REAL64, DATA_FORMAT_ASCII
+
+    pna = PNA(address, gui=False)
+    if pna.connect_to_pna() != 0:
+        raise ConnectionError('Could not connect to ' + address)
+    pna.input_pow = input_power
+    results = {}
+    try:
+        for mode in (ACQUIRE_SEQUENTIAL, ACQUIRE_SINGLE_SWEEP):
+            for data_format in (DATA_FORMAT_ASCII, DATA_FORMAT_REAL64):
+                pna.acquisition_mode = mode
+                pna.data_format = data_format
+                # The first run builds the channels, keep it out of the numbers
+                pna.two_tone_test(input_power)
+                start = time.perf_counter()
+                for _ in range(runs):
+                    pna.two_tone_test(input_power)
+                results[(mode, data_format)] = (time.perf_counter() - start) / runs
+    finally:
+        pna.close_session()
+    return results
+
+
+def benchmark_sa(address, runs=5, averages=16) -> dict:
+    """Times SiglentSA.measure_noise against the instrument at address for each data format.
+
+    Returns the mean seconds per measurement keyed by format.
+    """
+    from siglent import SiglentSA, DATA_FORMAT_REAL, DATA_FORMAT_ASCII
+
+    sa = SiglentSA(address)
+    if sa.connect() != 0:
+        raise ConnectionError('Could not connect to ' + address)
+    results = {}
+    try:
+        for data_format in (DATA_FORMAT_ASCII, DATA_FORMAT_REAL):
+            sa.set_data_format(data_format)
+            start = time.perf_counter()
+            for _ in range(runs):
+                sa.measure_noise(averages)
+            results[data_format] = (time.perf_counter() - start) / runs
+    finally:
+        sa.close_session()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Simulated PNA and SA for offline testing')
+    parser.add_argument('command', choices=['serve', 'benchmark'])
+    parser.add_argument('--instrument', choices=['pna', 'sa'], default='pna')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', type=float, default=0.001, help='seconds per program message')
+    parser.add_argument('--byte-time', type=float, default=1e-6, help='seconds per response byte')
+    parser.add_argument('--sweep-time', type=float, default=0.05, help='seconds per channel sweep, or per SA average')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None,
+                        help='fail if the default acquisition takes longer than this many seconds per DUT')
+    options = parser.parse_args()
+
+    if options.instrument == 'sa':
+        instrument = SimulatedSiglentSA(latency=options.latency, byte_time=options.byte_time,
+                                        sweep_time=options.sweep_time)
+    else:
+        instrument = SimulatedPNA(latency=options.latency, byte_time=options.byte_time,
+                                  sweep_time=options.sweep_time, calibrated=True)
+    if options.command == 'serve':
+        server = SimulatorServer(instrument, options.port)
+        print('Simulated ' + options.instrument.upper() + ' listening on ' + server.address)
+        server.serve_forever()
+        return 0
+
+    server = SimulatorServer(instrument, options.port).start()
+    if options.instrument == 'sa':
+        results = benchmark_sa(server.address, options.runs)
+        server.shutdown()
+        for data_format, seconds in results.items():
+            print('%-8s %8.1f ms per noise measurement' % (data_format, seconds * 1e3))
+        return 0
+    results = benchmark(server.address, options.runs)
+    server.shutdown()
+    for (mode, data_format), seconds in results.items():
+        print('%-12s %-8s %8.1f ms per DUT' % (mode, data_format, seconds * 1e3))
+    if options.budget is not None:
+        from pna import ACQUIRE_SINGLE_SWEEP, DATA_FORMAT_REAL64
+        if results[(ACQUIRE_SINGLE_SWEEP, DATA_FORMAT_REAL64)] > options.budget:
+            print('Acquisition is slower than the %.3f s budget' % options.budget)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# Register-level stand-in for a TLA2528 on an I2C port, for testing the drivers without the FTDI adapter
+from ftx_ctl.adc import (AUTO_SEQ_CH_SEL, CHANNEL_SEL, DATA_CFG, DATA_CFG_APPEND_CHANNEL_ID, GENERAL_CFG,
+                         GENERAL_CFG_CAL, GENERAL_CFG_RST, OPCODE_CLEAR_BIT, OPCODE_READ_REG, OPCODE_SET_BIT,
+                         OPCODE_WRITE_REG, OSR_CFG, SEQ_MODE_AUTO, SEQ_START, SEQUENCE_CFG)
+
+
+class FakeTLA2528:
+    """Answers the I2C transactions the TLA2528 driver sends, like a pyftdi I2cPort.
+
+    inputs maps a pin to its level as a fraction of full scale. Reset and
+    calibration stay busy for busy_polls register reads, None keeps them busy.
+    Every transaction is appended to log as (name, op, ...), the log may be
+    shared by several fakes to check their order.
+    """
+
+    def __init__(self, inputs=None, busy_polls=0, name='adc', log=None):
+        self.inputs = dict(inputs or {})
+        self.busy_polls = busy_polls
+        self.name = name
+        self.log = [] if log is None else log
+        self.regs = dict.fromkeys(range(0x13), 0)
+        self._busy_left = 0
+        # Next position in the auto-sequence
+        self._position = 0
+
+    def write(self, data):
+        opcode, reg, value = data
+        self.log.append((self.name, 'write', opcode, reg, value))
+        if opcode == OPCODE_WRITE_REG:
+            self.regs[reg] = value
+        elif opcode == OPCODE_SET_BIT:
+            self.regs[reg] |= value
+        elif opcode == OPCODE_CLEAR_BIT:
+            self.regs[reg] &= ~value
+        if reg == GENERAL_CFG and value & (GENERAL_CFG_RST | GENERAL_CFG_CAL):
+            self._busy_left = self.busy_polls
+        if reg == GENERAL_CFG and value & GENERAL_CFG_RST and self.busy_polls == 0:
+            self._reset()
+        if reg in (SEQUENCE_CFG, AUTO_SEQ_CH_SEL):
+            self._position = 0
+
+    def exchange(self, data, length):
+        opcode, reg = data
+        assert opcode == OPCODE_READ_REG and length == 1
+        self.log.append((self.name, 'read_reg', reg))
+        if reg == GENERAL_CFG and self.regs[GENERAL_CFG] & (GENERAL_CFG_RST | GENERAL_CFG_CAL):
+            if self.busy_polls is not None:
+                if self._busy_left > 0:
+                    self._busy_left -= 1
+                elif self.regs[GENERAL_CFG] & GENERAL_CFG_RST:
+                    self._reset()
+                else:
+                    self.regs[GENERAL_CFG] &= ~GENERAL_CFG_CAL
+        return bytes([self.regs[reg]])
+
+    def read(self, length):
+        self.log.append((self.name, 'read', length))
+        if self.regs[SEQUENCE_CFG] & SEQ_MODE_AUTO and self.regs[SEQUENCE_CFG] & SEQ_START:
+            channels = [pin for pin in range(8) if self.regs[AUTO_SEQ_CH_SEL] >> pin & 1]
+        else:
+            channels = None
+        data = b''
+        while len(data) < length:
+            if channels is None:
+                channel = self.regs[CHANNEL_SEL]
+            else:
+                channel = channels[self._position % len(channels)]
+                self._position += 1
+            data += self.frame(channel)
+        return data[:length]
+
+    def frame(self, channel):
+        """The bytes clocked out for one conversion of channel."""
+        level = self.inputs.get(channel, 0.0)
+        channel_id = self.regs[DATA_CFG] & DATA_CFG_APPEND_CHANNEL_ID
+        if self.regs[OSR_CFG]:
+            raw = min(int(level * 2**16), 2**16 - 1)
+            return bytes([raw >> 8, raw & 0xFF] + ([channel << 4] if channel_id else []))
+        raw = min(int(level * 2**12), 2**12 - 1)
+        return bytes([raw >> 4, (raw & 0x0F) << 4 | (channel if channel_id else 0)])
+
+    def _reset(self):
+        self.regs = dict.fromkeys(range(0x13), 0)
+        self._position = 0
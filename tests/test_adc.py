@@ -0,0 +1,118 @@
+# TLA2528 driver against the register model in fakei2c
+import pytest
+from pyftdi.i2c import I2cIOError
+
+from fakei2c import FakeTLA2528
+from ftx_ctl.adc import GENERAL_CFG, GPO_VALUE, OPCODE_WRITE_REG, OSR_CFG, PinMode, TLA2528, calibrate_all
+
+
+def test_analog_read_is_a_single_read_frame():
+    port = FakeTLA2528({3: 0.5})
+    adc = TLA2528(port)
+    adc.reset()
+    port.log.clear()
+    assert adc.analog_read(3) == pytest.approx(0.5, abs=2**-12)
+    # The read frame starts the conversion, nothing polls a status register around it
+    assert [entry[1] for entry in port.log] == ['write', 'write', 'read']
+
+
+def test_oversampled_read_has_16_bits():
+    port = FakeTLA2528({1: 0.123456})
+    adc = TLA2528(port)
+    adc.reset()
+    adc.set_osr(7)
+    assert adc.analog_read(1) == pytest.approx(0.123456, abs=2**-16)
+
+
+def test_calibrate_all_overlaps_the_adcs():
+    log = []
+    ports = [FakeTLA2528(busy_polls=3, name='ftx', log=log), FakeTLA2528(busy_polls=3, name='frx', log=log)]
+    calibrate_all([TLA2528(port) for port in ports])
+    # Both calibrations are started before either is polled
+    assert [(name, op) for name, op, *_ in log[:3]] == [('ftx', 'write'), ('frx', 'write'), ('ftx', 'read_reg')]
+    assert all(not port.regs[GENERAL_CFG] for port in ports)
+
+
+def test_stuck_calibration_times_out():
+    adc = TLA2528(FakeTLA2528(busy_polls=None))
+    with pytest.raises(TimeoutError, match='calibration'):
+        adc.calibrate(timeout=0.01)
+
+
+def test_stuck_reset_times_out():
+    adc = TLA2528(FakeTLA2528(busy_polls=None))
+    with pytest.raises(TimeoutError, match='reset'):
+        adc.reset(timeout=0.01)
+
+
+@pytest.mark.parametrize('osr', [0, 3])
+def test_read_sequence_decodes_every_channel_from_one_read(osr):
+    levels = {0: 0.1, 1: 0.25, 2: 0.5, 4: 0.75}
+    port = FakeTLA2528(levels)
+    adc = TLA2528(port)
+    adc.reset()
+    adc.set_osr(osr)
+    values = adc.read_sequence(list(levels))
+    assert values == pytest.approx(levels, abs=2**-12)
+    reads = [entry for entry in port.log if entry[1] == 'read']
+    assert reads == [('adc', 'read', (3 if osr else 2) * len(levels))]
+    # The sequence keeps running, the next burst needs no register writes
+    port.log.clear()
+    assert adc.read_sequence(list(levels)) == pytest.approx(levels, abs=2**-12)
+    assert [entry[1] for entry in port.log] == ['read']
+
+
+def test_read_sequence_rejects_a_burst_with_the_wrong_channels():
+    port = FakeTLA2528({0: 0.1, 1: 0.2})
+    adc = TLA2528(port)
+    adc.reset()
+    adc.configure_sequence([0, 1])
+    # A slipped frame repeats channel 0 instead of returning channel 1
+    port.read = lambda length: port.frame(0) * 2
+    with pytest.raises(I2cIOError):
+        adc.read_sequence()
+
+
+def test_analog_read_stops_the_sequence():
+    port = FakeTLA2528({0: 0.1, 3: 0.6})
+    adc = TLA2528(port)
+    adc.reset()
+    adc.configure_sequence([0, 3])
+    assert adc.analog_read(3) == pytest.approx(0.6, abs=2**-12)
+    assert adc.sequence is None
+    with pytest.raises(ValueError):
+        adc.read_sequence()
+
+
+def test_configuration_writes_are_skipped_when_the_shadow_matches():
+    port = FakeTLA2528()
+    adc = TLA2528(port)
+    adc.reset()
+    port.log.clear()
+    modes = {5: PinMode.DigitalInput, 6: PinMode.PushPullOutput}
+    adc.configure_pins(modes)
+    first = len(port.log)
+    # Known after the reset, so nothing is read back and the same setup costs no transactions
+    assert all(entry[1] == 'write' for entry in port.log)
+    adc.configure_pins(modes)
+    assert len(port.log) == first
+    # A set-bit on a shadowed register goes out as one full write of the new value
+    adc.digital_write(6, True)
+    assert port.log[-1] == ('adc', 'write', OPCODE_WRITE_REG, GPO_VALUE, 0b1000000)
+    assert adc.verify() == {}
+
+
+def test_resync_picks_up_changes_made_behind_the_driver():
+    port = FakeTLA2528()
+    adc = TLA2528(port)
+    adc.reset()
+    adc.set_osr(3)
+    # The board was power cycled, every register is back at 0
+    port.regs = dict.fromkeys(port.regs, 0)
+    assert adc.verify() == {OSR_CFG: (3, 0)}
+    adc.resync()
+    assert adc.oversampling is False
+    assert adc.verify() == {}
+    port.log.clear()
+    adc.set_osr(3)
+    assert len(port.log) == 1
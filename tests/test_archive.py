@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+
+from archive import RUN_DTYPE, TRACE_FIELDS, MeasurementArchive, pack_run
+from csvload import read_two_tone
+
+
+def _run(points=5, offset=0.0):
+    traces = [np.arange(points) * 1e8 + 3e8] + [np.full(points, offset + i) for i in range(10)]
+    return pack_run(*traces)
+
+
+def test_append_and_load(tmp_path):
+    archive = MeasurementArchive(str(tmp_path / 'A1'))
+    assert len(archive) == 0
+    for i in range(3):
+        assert archive.append(_run(offset=i), {'Input Power (dBm)': -50.0, 'run': i}) == i
+    data = archive.load()
+    assert data.shape == (3, 5)
+    assert data.dtype == RUN_DTYPE
+    np.testing.assert_allclose(data['pl'][:, 0], [0, 1, 2])
+    assert [entry['run'] for entry in archive.metadata()] == [0, 1, 2]
+    # A plain np.load sees the same array
+    assert np.load(archive.data_path).shape == (3, 5)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['A1.json', 'A1.npy']
+
+
+def test_append_rejects_other_lengths(tmp_path):
+    archive = MeasurementArchive(str(tmp_path / 'A1'))
+    archive.append(_run(5))
+    with pytest.raises(ValueError):
+        archive.append(_run(6))
+
+
+def test_file_without_spare_header_room(tmp_path):
+    path = tmp_path / 'A1.npy'
+    np.save(path, np.stack([_run(), _run(offset=1)]))
+    archive = MeasurementArchive(str(path))
+    assert archive.append(_run(offset=2)) == 2
+    np.testing.assert_allclose(archive.load()['pl'][:, 0], [0, 1, 2])
+
+
+def test_interrupted_append_keeps_earlier_runs(tmp_path):
+    archive = MeasurementArchive(str(tmp_path / 'A1'))
+    archive.append(_run())
+    # A row written without its header update, as a crash between the two leaves it
+    with open(archive.data_path, 'ab') as f:
+        f.write(_run(offset=9).tobytes()[:17])
+    assert archive.load(mmap=False).shape == (1, 5)
+    assert archive.append(_run(offset=1)) == 1
+    np.testing.assert_allclose(archive.load()['pl'][:, 0], [0, 1])
+
+
+def test_export_csv_reads_back(tmp_path):
+    archive = MeasurementArchive(str(tmp_path / 'A1'))
+    archive.append(_run(), {'Input Power (dBm)': -50.0, 'FTX': {'Temp': 30.0}})
+    archive.export_csv(str(tmp_path / 'A1.csv'))
+    data = read_two_tone(str(tmp_path / 'A1.csv'))
+    run = archive.load()[0]
+    np.testing.assert_allclose(data['freq'], run['freq'])
+    np.testing.assert_allclose(data['IM3H'], run['im3h'])
+    assert data['metadata']['Input Power (dBm)'] == '-50.0'
+    assert data['metadata']['FTX Temp'] == '30.0'
+    assert TRACE_FIELDS[0] == 'freq'
+    with open(archive.meta_path) as f:
+        assert len(json.load(f)) == 1
+
+
+def test_export_csv_of_many_runs_reads_the_first(tmp_path):
+    archive = MeasurementArchive(str(tmp_path / 'A1'))
+    for i in range(6):
+        archive.append(_run(offset=10 * i))
+    archive.export_csv(str(tmp_path / 'A1.csv'))
+    data = read_two_tone(str(tmp_path / 'A1.csv'))
+    run = archive.load()[0]
+    for name, field in (('PL', 'pl'), ('PH', 'ph'), ('IM2', 'im2'), ('IM3L', 'im3l'), ('IM3H', 'im3h')):
+        np.testing.assert_allclose(data[name], run[field])
@@ -0,0 +1,52 @@
+# TCA6408A register shadow against a fake I2C port
+from ftx_ctl.atten import CONFIG, OUTPUT, TCA6408A
+
+
+class FakeTCA6408A:
+    """Holds the expander registers and counts the bus transactions."""
+
+    def __init__(self):
+        self.regs = {OUTPUT: 0xFF, CONFIG: 0xFF}
+        self.transactions = 0
+
+    def write(self, data):
+        self.transactions += 1
+        reg, value = data
+        self.regs[reg] = value
+
+    def read_from(self, reg, length):
+        self.transactions += 1
+        return bytes([self.regs[reg]])
+
+
+def test_repeated_writes_and_reads_come_from_the_shadow():
+    port = FakeTCA6408A()
+    atten = TCA6408A(port)
+    assert port.regs[CONFIG] == 0
+    atten.write(0x2A)
+    count = port.transactions
+    atten.write(0x2A)
+    assert atten.read() == 0x2A
+    assert port.transactions == count
+
+
+def test_first_read_fetches_the_output_register_once():
+    port = FakeTCA6408A()
+    atten = TCA6408A(port)
+    count = port.transactions
+    assert atten.read() == 0xFF
+    assert atten.read() == 0xFF
+    assert port.transactions == count + 1
+
+
+def test_verify_and_resync_after_a_power_cycle():
+    port = FakeTCA6408A()
+    atten = TCA6408A(port)
+    atten.write(0x10)
+    port.regs = {OUTPUT: 0xFF, CONFIG: 0xFF}
+    assert atten.verify() == {OUTPUT: (0x10, 0xFF), CONFIG: (0, 0xFF)}
+    atten.resync()
+    assert atten.verify() == {}
+    # The shadow now holds the reset values, so setting the attenuation again is sent
+    atten.write(0x10)
+    assert port.regs[OUTPUT] == 0x10
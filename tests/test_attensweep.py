@@ -0,0 +1,87 @@
+# Attenuation sweep against the simulated PNA and fake FTX/FRX attenuators
+import threading
+
+import pytest
+
+from attensweep import ATTEN_LSB, AttenuationSweep, set_and_verify_atten
+from busscheduler import BusScheduler
+from calindex import CalIndex
+from pna import PNA
+from simulator import SimulatedPNA, SimulatorServer
+
+INPUT_POWER = -50.0
+
+
+class FakeBoard:
+    """Rounds the attenuation to whole steps like the board, stuck_at makes it ignore writes above a value."""
+
+    def __init__(self, name, log, stuck_at=None):
+        self.name = name
+        self.log = log
+        self.stuck_at = stuck_at
+        self.atten = 0.0
+
+    def set_atten(self, value):
+        self.log.append((self.name, value, threading.current_thread().name))
+        if self.stuck_at is None or value <= self.stuck_at:
+            self.atten = round(value / ATTEN_LSB) * ATTEN_LSB
+
+    def get_atten(self):
+        return self.atten
+
+
+@pytest.fixture
+def pna(tmp_path):
+    server = SimulatorServer(SimulatedPNA(seed=1, calibrated=True), port=0).start()
+    pna = PNA(server.address, gui=False)
+    pna.cal_index = CalIndex(str(tmp_path / 'index.json'))
+    assert pna.connect_to_pna() == 0
+    pna.input_pow = INPUT_POWER
+    yield pna
+    pna.close_session()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def buses():
+    buses = BusScheduler()
+    buses.add_bus('ftx')
+    buses.add_bus('frx')
+    yield buses
+    buses.stop(1)
+
+
+def test_readback_within_half_a_step_is_accepted():
+    board = FakeBoard('ftx', [])
+    assert set_and_verify_atten(board, 5.1, settle=0) == 5.0
+    board.stuck_at = 0
+    with pytest.raises(ValueError):
+        set_and_verify_atten(board, 10, settle=0)
+
+
+def test_sweep_measures_every_step(pna, buses):
+    log = []
+    boards = {'ftx': FakeBoard('ftx', log), 'frx': FakeBoard('frx', log)}
+    steps = [{'ftx': 0, 'frx': 10}, {'ftx': 5, 'frx': 10}, {'ftx': 10.1, 'frx': 0}]
+    sweep = AttenuationSweep(pna, buses, boards, steps, settle=0)
+    results = sweep.run(INPUT_POWER)
+
+    assert sweep.error is None
+    assert results.shape[0] == 3
+    assert sweep.readbacks == [{'ftx': 0, 'frx': 10}, {'ftx': 5, 'frx': 10}, {'ftx': 10, 'frx': 0}]
+    # Every board is set on its own bus thread
+    assert {(name, thread) for name, _, thread in log} == {('ftx', 'i2c-ftx'), ('frx', 'i2c-frx')}
+    assert [value for name, value, _ in log if name == 'ftx'] == [0, 5, 10.1]
+
+
+def test_failed_step_keeps_the_steps_measured_before_it(pna, buses):
+    log = []
+    boards = {'ftx': FakeBoard('ftx', log, stuck_at=5), 'frx': FakeBoard('frx', log)}
+    steps = [{'ftx': 0}, {'ftx': 5}, {'ftx': 10}, {'ftx': 15}]
+    sweep = AttenuationSweep(pna, buses, boards, steps, settle=0)
+    results = sweep.run(INPUT_POWER)
+
+    assert isinstance(sweep.error, ValueError)
+    assert sweep.readbacks == [{'ftx': 0}, {'ftx': 5}]
+    assert results.shape[0] == 2
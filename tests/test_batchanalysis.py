@@ -0,0 +1,60 @@
+import csv
+
+import pytest
+
+from batchanalysis import find_files, input_power_from_metadata, run_batch, write_summary
+from intercepts import compute_intercepts
+
+HEADER = ('Frequency (GHz),PL Log Mag(dBm),PH Log Mag(dBm),IM2 Log Mag(dBm),IM3L Log Mag(dBm),'
+          'IM3H Log Mag(dBm),OIP2,OIP3,Gain,IIP2,IIP3\n')
+ROWS = '0.3,-55,-55.2,-100,-120,-121,40,25,-5,45,30\n0.4,-56,-56.2,-101,-121,-122,40,25,-6,46,31\n'
+
+
+def _report(path, power=None):
+    text = 'Two-Tone Test Report\nDate,01/02/2026\n'
+    if power is not None:
+        text += 'PNA calibration power\n' + str(power) + '\n'
+    path.write_text(text + HEADER + ROWS)
+
+
+def test_input_power_comes_from_the_file_before_the_fallback():
+    assert input_power_from_metadata({'PNA calibration power': '-50.0'}, -40.0) == -50.0
+    assert input_power_from_metadata({'Input Power (dBm)': '-45'}) == -45.0
+    assert input_power_from_metadata({}, -40.0) == -40.0
+    with pytest.raises(ValueError):
+        input_power_from_metadata({})
+
+
+def test_find_files_recurses_and_excludes(tmp_path):
+    (tmp_path / 'lot').mkdir()
+    for name in ('a.csv', 'lot/b.csv', 'notes.txt', 'summary.csv'):
+        (tmp_path / name).write_text('')
+    files = find_files([str(tmp_path)], exclude=[str(tmp_path / 'summary.csv')])
+    assert files == [str(tmp_path / 'a.csv'), str(tmp_path / 'lot' / 'b.csv')]
+
+
+def test_run_batch_summarises_each_device(tmp_path):
+    _report(tmp_path / 'dut1.csv', power=-50.0)
+    _report(tmp_path / 'dut2.csv')
+    # Neither a two-tone export nor a noise file, it is skipped
+    (tmp_path / 'other.csv').write_text('time,ld_current\n0,25\n1,25\n')
+    rows = run_batch([str(tmp_path)], input_power=-40.0, workers=1)
+
+    assert [row['dut'] for row in rows] == ['dut1', 'dut2']
+    assert [row['input_power'] for row in rows] == [-50.0, -40.0]
+    expected = compute_intercepts([-55, -56], [-55.2, -56.2], [-100, -101], [-120, -121], [-121, -122], -50.0)
+    assert rows[0]['iip3_min'] == pytest.approx(expected.iip3.min())
+    assert rows[0]['files'] == 'dut1.csv'
+
+    summary = tmp_path / 'out' / 'summary.csv'
+    summary.parent.mkdir()
+    write_summary(rows, str(summary))
+    with open(summary) as f:
+        assert [row['dut'] for row in csv.DictReader(f)] == ['dut1', 'dut2']
+
+
+def test_files_without_a_power_fail_without_a_fallback(tmp_path):
+    _report(tmp_path / 'dut1.csv', power=-50.0)
+    _report(tmp_path / 'dut2.csv')
+    rows = run_batch([str(tmp_path)], workers=1)
+    assert [row['dut'] for row in rows] == ['dut1']
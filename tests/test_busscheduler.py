@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from busscheduler import BusScheduler
+
+
+@pytest.fixture
+def buses():
+    buses = BusScheduler()
+    buses.add_bus('ftx')
+    buses.add_bus('frx')
+    yield buses
+    buses.stop(1)
+
+
+def test_jobs_on_one_bus_never_overlap(buses):
+    active = []
+    overlaps = []
+
+    def transaction(i):
+        active.append(i)
+        if len(active) > 1:
+            overlaps.append(list(active))
+        threading.Event().wait(0.001)
+        active.remove(i)
+        return i
+
+    futures = [buses.submit('ftx', transaction, i) for i in range(20)]
+    assert [future.result(1) for future in futures] == list(range(20))
+    assert overlaps == []
+
+
+def test_different_buses_run_in_parallel(buses):
+    # Each job waits for the other, which only finishes if they run at the same time
+    ftx_started = threading.Event()
+    frx_started = threading.Event()
+
+    def on_ftx():
+        ftx_started.set()
+        return frx_started.wait(1)
+
+    def on_frx():
+        frx_started.set()
+        return ftx_started.wait(1)
+
+    ftx = buses.submit('ftx', on_ftx)
+    frx = buses.submit('frx', on_frx)
+    assert ftx.result(2) and frx.result(2)
+
+
+def test_call_from_the_bus_thread_runs_inline(buses):
+    def set_and_read_back(value):
+        # A nested call on the same bus would deadlock if it were queued
+        return buses.call('ftx', lambda: value * 2)
+
+    assert buses.call('ftx', set_and_read_back, 21, timeout=1) == 42
+
+
+def test_removed_bus_drops_its_jobs(buses):
+    started = threading.Event()
+    release = threading.Event()
+    running = buses.submit('ftx', lambda: started.set() or release.wait(1))
+    assert started.wait(1)
+    queued = buses.submit('ftx', lambda: 'never')
+    buses.remove_bus('ftx', timeout=0)
+    release.set()
+    assert queued.cancelled()
+    assert running.result(1)
+    assert not buses.has_bus('ftx')
+    with pytest.raises(KeyError):
+        buses.submit('ftx', lambda: None)
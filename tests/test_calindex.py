@@ -0,0 +1,41 @@
+import datetime
+import json
+
+from calindex import CalIndex
+
+PLAN = {'start': 300000000, 'stop': 4050000000, 'points': 401}
+
+
+def test_find_matches_instrument_power_and_plan(tmp_path):
+    path = str(tmp_path / 'index.json')
+    index = CalIndex(path)
+    index.add('a.csa', 'PNA1', '-50', PLAN)
+    index.add('b.csa', 'PNA1', -40.0, PLAN)
+    # A new instance reads what the first one saved
+    index = CalIndex(path)
+    assert index.find('PNA1', -50.0, PLAN)['file'] == 'a.csa'
+    assert index.find('PNA1', '-40', PLAN)['file'] == 'b.csa'
+    assert index.find('PNA2', -50.0, PLAN) is None
+    assert index.find('PNA1', -50.0, dict(PLAN, points=201)) is None
+    index.remove('a.csa')
+    assert CalIndex(path).find('PNA1', -50.0, PLAN) is None
+
+
+def test_newest_unexpired_entry_wins(tmp_path):
+    path = tmp_path / 'index.json'
+    now = datetime.datetime.now()
+    entries = [{'file': name, 'idn': 'PNA1', 'input_power': -50.0, 'freq_plan': PLAN,
+                'date': (now - datetime.timedelta(days=days)).isoformat(timespec='seconds')}
+               for name, days in (('old.csa', 10), ('new.csa', 1), ('older.csa', 2))]
+    path.write_text(json.dumps(entries))
+    assert CalIndex(str(path)).find('PNA1', -50.0, PLAN)['file'] == 'new.csa'
+    assert CalIndex(str(path), max_age_days=0.5).find('PNA1', -50.0, PLAN) is None
+
+
+def test_unreadable_index_is_empty(tmp_path):
+    path = tmp_path / 'index.json'
+    path.write_text('{not json')
+    index = CalIndex(str(path))
+    assert index.find('PNA1', -50.0, PLAN) is None
+    index.add('a.csa', 'PNA1', -50.0, PLAN)
+    assert CalIndex(str(path)).find('PNA1', -50.0, PLAN)['file'] == 'a.csa'
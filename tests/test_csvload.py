@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from csvload import NotTwoToneError, read_blocks, read_two_tone
+
+
+def _write(tmp_path, text):
+    path = tmp_path / 'export.csv'
+    path.write_text(text)
+    return str(path)
+
+
+def test_pna_export_blocks_and_metadata(tmp_path):
+    text = '!CSV A.01.01\n!Date: today\nRBW,1 MHz\n'
+    for channel in range(5):
+        text += 'BEGIN CH' + str(channel + 1) + '_DATA\nFreq(Hz),Log Mag(dB)\n'
+        text += '3e8,' + str(-50 - channel) + ',\n4e8,' + str(-51 - channel) + ',\nEND\n'
+    path = _write(tmp_path, text)
+    blocks, metadata = read_blocks(path)
+    assert len(blocks) == 5
+    assert all(block.shape == (2, 2) for block in blocks)
+    assert metadata['RBW'] == '1 MHz'
+    data = read_two_tone(path)
+    np.testing.assert_allclose(data['freq'], [3e8, 4e8])
+    np.testing.assert_allclose(data['PL'], [-50, -51])
+    np.testing.assert_allclose(data['IM3H'], [-54, -55])
+
+
+def test_gui_report_with_lone_power_line(tmp_path):
+    path = _write(tmp_path, 'Two-Tone Test Report\nDate,01/02/2026\nNo FTX connected\n'
+                            'PNA calibration power\n-50.0\n'
+                            'Frequency (GHz),PL Log Mag(dBm),PH Log Mag(dBm),IM2 Log Mag(dBm),IM3L Log Mag(dBm),'
+                            'IM3H Log Mag(dBm),OIP2,OIP3,Gain,IIP2,IIP3\n'
+                            '0.3,-55,-55.2,-100,-120,-121,40,25,-5,45,30\n'
+                            '0.4,-56,-56.2,-101,-121,-122,40,25,-6,46,31\n')
+    blocks, metadata = read_blocks(path)
+    assert [block.shape for block in blocks] == [(2, 11)]
+    assert metadata['PNA calibration power'] == '-50.0'
+    assert 'No FTX connected' not in metadata
+    data = read_two_tone(path)
+    np.testing.assert_allclose(data['freq'], [3e8, 4e8])
+    np.testing.assert_allclose(data['PH'], [-55.2, -56.2])
+    np.testing.assert_allclose(data['IM3H'], [-121, -122])
+
+
+def test_other_csv_is_not_two_tone(tmp_path):
+    path = _write(tmp_path, 'dut,iip3_min\nA1,30\n')
+    with pytest.raises(NotTwoToneError):
+        read_two_tone(path)
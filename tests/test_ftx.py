@@ -0,0 +1,82 @@
+# FTX laser sweep settling against a laser whose monitors drift after every wiper write
+import math
+
+import pytest
+
+import ftx_ctl.ftx
+from ftx_ctl.ftx import FTX, SETTLE_LD_TOLERANCE
+
+# mA of laser current per digipot code and the time constant the monitors settle with
+MA_PER_CODE = 0.25
+TAU = 0.05
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class DriftingLaser:
+    """Monitor readings that approach the current set by the wiper exponentially."""
+
+    def __init__(self, clock, tau=TAU):
+        self.clock = clock
+        self.tau = tau
+        self.start_level = 0.0
+        self.target = 0.0
+        self.set_time = 0.0
+
+    def level(self):
+        if self.tau is None:
+            # Never settles, keeps ramping
+            return self.target * (self.clock.now - self.set_time) * 100
+        decay = math.exp(-(self.clock.now - self.set_time) / self.tau)
+        return self.target + (self.start_level - self.target) * decay
+
+    def set(self, code):
+        self.start_level = self.level()
+        self.target = code * MA_PER_CODE
+        self.set_time = self.clock.now
+
+    def read_all_monitors(self):
+        level = self.level()
+        return {'temp': 25.0, 'pd_current': level * 0.01, 'rms_power': -20.0, 'lna_current': 50.0,
+                'ld_current': level}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ftx_ctl.ftx, 'time', clock)
+    return clock
+
+
+def make_ftx(laser):
+    # No I2C bus, the sweep only needs the wiper and the monitors
+    ftx = FTX.__new__(FTX)
+    ftx.set_ld_current = laser.set
+    ftx.read_all_monitors = laser.read_all_monitors
+    return ftx
+
+
+def test_sweep_waits_for_the_laser_to_settle(clock):
+    laser = DriftingLaser(clock)
+    result = make_ftx(laser).sweep_ld_current([0, 200, 100])
+    assert result['settled'].all()
+    # Back to back readings agree straight away, the settled readings are at the set current
+    for code, current in zip(result['code'], result['ld_current']):
+        assert abs(current - code * MA_PER_CODE) < 10 * SETTLE_LD_TOLERANCE
+    assert (result['reads'][1:] > 2).all()
+
+
+def test_sweep_gives_up_after_the_timeout(clock):
+    laser = DriftingLaser(clock, tau=None)
+    result = make_ftx(laser).sweep_ld_current([100], timeout=0.2)
+    assert not result['settled'][0]
+    assert 0.2 <= clock.now < 0.3
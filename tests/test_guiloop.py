@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+import guiloop
+from guiloop import CallbackDispatcher, FrameScheduler
+
+
+def _queue(dispatcher, fn, sender='button', app_data=None, user_data=None):
+    # The (callback, sender, app_data, user_data) entries dpg.get_callback_queue() returns
+    dispatcher._callbacks.append((fn, sender, app_data, user_data))
+
+
+def test_callbacks_get_as_many_arguments_as_they_take():
+    dispatcher = CallbackDispatcher()
+    calls = []
+
+    class Handler:
+        def on_click(self, sender, app_data):
+            calls.append(('method', sender, app_data))
+
+    _queue(dispatcher, lambda: calls.append(('none',)))
+    _queue(dispatcher, lambda sender: calls.append(('one', sender)))
+    _queue(dispatcher, Handler().on_click, app_data=3)
+    _queue(dispatcher, lambda *args: calls.append(('all',) + args), user_data='u')
+    _queue(dispatcher, None)
+    assert dispatcher.run() == 0
+    assert calls == [('none',), ('one', 'button'), ('method', 'button', 3), ('all', 'button', None, 'u')]
+
+
+def test_jobs_posted_from_another_thread_run_on_the_next_frame():
+    dispatcher = CallbackDispatcher()
+    futures = []
+    thread = threading.Thread(target=lambda: futures.extend([dispatcher.post(sum, ([1, 2],)),
+                                                              dispatcher.post(int, ('x',))]))
+    thread.start()
+    thread.join()
+    assert dispatcher.posted.is_set()
+    assert dispatcher.pending() == 2
+    dispatcher.run()
+    assert futures[0].result(0) == 3
+    with pytest.raises(ValueError):
+        futures[1].result(0)
+
+
+def test_run_stops_at_the_budget_but_always_makes_progress():
+    dispatcher = CallbackDispatcher(budget=0)
+    for _ in range(3):
+        _queue(dispatcher, lambda: None)
+    assert dispatcher.run() == 2
+    assert dispatcher.run() == 1
+    assert dispatcher.run() == 0
+
+
+def test_handler_times_are_reported():
+    dispatcher = CallbackDispatcher()
+
+    def on_save():
+        pass
+
+    for _ in range(4):
+        _queue(dispatcher, on_save)
+    dispatcher.run()
+    calls, total, longest = dispatcher.stats[on_save.__qualname__]
+    assert calls == 4 and longest <= total
+    assert dispatcher.report().startswith(on_save.__qualname__ + ': 4 calls')
+    dispatcher.reset_stats()
+    assert dispatcher.report() == ''
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+
+def test_timers_run_in_deadline_order_once_due(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(guiloop, 'time', clock)
+    scheduler = FrameScheduler(CallbackDispatcher())
+    calls = []
+    scheduler.call_later(0.2, lambda: calls.append('b'))
+    scheduler.call_later(0.1, lambda: calls.append('a'))
+    scheduler.call_later(0.2, lambda: calls.append('c'))
+    scheduler.run_due_timers()
+    assert calls == []
+    clock.now += 0.2
+    scheduler.run_due_timers()
+    assert calls == ['a', 'b', 'c']
+    assert scheduler._timers == []
+
+
+def test_repeating_timer_skips_the_deadlines_it_missed(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(guiloop, 'time', clock)
+    scheduler = FrameScheduler(CallbackDispatcher())
+    calls = []
+    scheduler.call_every(0.1, lambda: calls.append(clock.now))
+    # The loop was blocked for three intervals, the timer runs once and not three times
+    clock.now += 0.35
+    scheduler.run_due_timers()
+    assert len(calls) == 1
+    clock.now += 0.05
+    scheduler.run_due_timers()
+    assert len(calls) == 1
+    clock.now += 0.05
+    scheduler.run_due_timers()
+    assert len(calls) == 2
+
+
+def test_idle_wait_ends_early_for_a_posted_job():
+    dispatcher = CallbackDispatcher()
+    scheduler = FrameScheduler(dispatcher, idle_fps=1, idle_after=0)
+    scheduler.wait_for_frame()
+    assert scheduler.is_idle()
+    timer = threading.Timer(0.05, dispatcher.post, (lambda: None,))
+    timer.start()
+    start = time.monotonic()
+    scheduler.wait_for_frame()
+    timer.join()
+    assert time.monotonic() - start < 0.5
+    # The job counts as activity, which sets the next frames back to the full rate
+    assert scheduler._last_activity >= start
+
+
+def test_idle_wait_ends_early_for_a_due_timer():
+    scheduler = FrameScheduler(CallbackDispatcher(), idle_fps=1, idle_after=0)
+    scheduler.wait_for_frame()
+    scheduler.call_later(0.05, lambda: None)
+    start = time.monotonic()
+    scheduler.wait_for_frame()
+    assert 0.04 <= time.monotonic() - start < 0.5
@@ -0,0 +1,30 @@
+import numpy as np
+
+from intercepts import allocate_intercepts, compute_intercepts
+
+
+def test_single_sweep():
+    pl = np.array([-55.0, -56.0])
+    ph = pl - 0.2
+    im2 = np.array([-100.0, -101.0])
+    im3l = np.array([-120.0, -121.0])
+    im3h = np.array([-122.0, -121.5])
+    result = compute_intercepts(pl, ph, im2, im3l, im3h, -50.0)
+    np.testing.assert_allclose(result.gain, pl + 50)
+    np.testing.assert_allclose(result.oip2, pl + ph - im2)
+    np.testing.assert_allclose(result.oip3, np.maximum((2 * pl + ph - im3l) / 2, (pl + 2 * ph - im3h) / 2))
+    np.testing.assert_allclose(result.iip2, result.oip2 - result.gain)
+    np.testing.assert_allclose(result.iip3, result.oip3 - result.gain)
+
+
+def test_stacked_runs_with_one_power_per_run():
+    rng = np.random.default_rng(0)
+    pl, ph, im2, im3l, im3h = (rng.uniform(-120, -50, (3, 4)) for _ in range(5))
+    powers = np.array([-50.0, -40.0, -30.0])
+    out = allocate_intercepts((3, 4))
+    result = compute_intercepts(pl, ph, im2, im3l, im3h, powers, out=out)
+    assert result is out
+    for run in range(3):
+        single = compute_intercepts(pl[run], ph[run], im2[run], im3l[run], im3h[run], powers[run])
+        for field in result._fields:
+            np.testing.assert_allclose(getattr(result, field)[run], getattr(single, field))
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from noise import (BOLTZMANN, T0, analyse, analyse_files, interp_rows, noise_figure, noise_temperature,
+                   rbw_from_metadata)
+
+
+def test_interp_rows_matches_np_interp():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0, 10, (3, 20)), axis=1)
+    y = rng.normal(size=(3, 20))
+    x_new = np.sort(rng.uniform(-1, 11, (3, 50)), axis=1)
+    result = interp_rows(x_new, x, y)
+    for row in range(3):
+        np.testing.assert_allclose(result[row], np.interp(x_new[row], x[row], y[row]))
+
+
+def test_interp_rows_single_trace():
+    np.testing.assert_allclose(interp_rows([0.5, 1.5], [0, 1, 2], [0, 10, 30]), [[5, 20]])
+
+
+@pytest.mark.parametrize('metadata, expected', [({'RBW': '1 MHz'}, 1e6), ({'RBW(kHz)': '300'}, 3e5),
+                                                ({'Resolution Bandwidth': '100000'}, 1e5)])
+def test_rbw_from_metadata(metadata, expected):
+    assert rbw_from_metadata(metadata) == expected
+
+
+def test_rbw_missing():
+    assert rbw_from_metadata({}, 2e6) == 2e6
+    with pytest.raises(ValueError):
+        rbw_from_metadata({'Date': 'today'})
+
+
+def _measurement(noise_temp, gain_db, rbw=1e6):
+    dark_w = np.full(len(gain_db), 1e-13)
+    trace_w = dark_w + BOLTZMANN * noise_temp * rbw * 10 ** (np.asarray(gain_db) / 10)
+    return 10 * np.log10(dark_w * 1000), 10 * np.log10(trace_w * 1000)
+
+
+def test_noise_temperature_round_trip():
+    gain = np.array([-5.0, -10.0])
+    dark, trace = _measurement(1e5, gain)
+    np.testing.assert_allclose(noise_temperature(dark, trace, gain, 1e6), 1e5)
+    np.testing.assert_allclose(noise_figure(T0), 10 * np.log10(2))
+
+
+def test_analyse_regrids_the_gain():
+    noise_freq = np.linspace(1e9, 2e9, 11)
+    gain_freq = np.linspace(0.5e9, 2.5e9, 401)
+    gain_db = -5 - 2 * gain_freq / 1e9
+    dark, trace = _measurement(1e5, -5 - 2 * noise_freq / 1e9)
+    result = analyse(noise_freq, dark, trace, gain_freq, gain_db, 1e6)
+    assert result['noise_temp'].shape == (1, 11)
+    np.testing.assert_allclose(result['noise_temp'], 1e5, rtol=1e-6)
+    np.testing.assert_allclose(result['nf'], noise_figure(1e5), rtol=1e-6)
+    assert np.all(result['noise_temp_err'] > 0) and np.all(result['nf_err'] > 0)
+
+
+def test_analyse_files(tmp_path):
+    freq = np.linspace(1e9, 2e9, 5)
+    dark, trace = _measurement(2e5, np.full(5, -10.0))
+    noise_file = tmp_path / 'A1_noise.csv'
+    noise_file.write_text('RBW,1 MHz\nFrequency,Trace A,Trace B\n'
+                          + ''.join('%.12g,%.12g,%.12g\n' % row for row in zip(freq, dark, trace)))
+    gain_file = tmp_path / 'A1_gain.csv'
+    gain_file.write_text('Freq(Hz),S21(dB)\n' + ''.join('%.12g,-10\n' % f for f in np.linspace(0.5e9, 2.5e9, 7)))
+    [result] = analyse_files([(str(noise_file), str(gain_file))])
+    assert result['rbw'] == 1e6
+    np.testing.assert_allclose(result['noise_temp'], 2e5, rtol=1e-6)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from plotting import MINMAX, decimate, lttb, minmax
+
+
+def test_short_traces_are_unchanged():
+    x = np.arange(10.0)
+    y = x ** 2
+    for method in ('lttb', MINMAX):
+        dx, dy = decimate(x, y, 10, method)
+        np.testing.assert_array_equal(dx, x)
+        np.testing.assert_array_equal(dy, y)
+
+
+def test_lttb_keeps_the_ends_and_a_spike():
+    x = np.arange(1000.0)
+    y = np.sin(x / 50)
+    y[500] = 10
+    dx, dy = lttb(x, y, 100)
+    assert len(dx) == 100
+    assert dx[0] == 0 and dx[-1] == 999
+    assert np.all(np.diff(dx) > 0)
+    assert 10 in dy
+    # Every kept point is a point of the trace
+    np.testing.assert_array_equal(dy, y[dx.astype(int)])
+
+
+def test_minmax_keeps_every_bins_extremes():
+    rng = np.random.default_rng(0)
+    x = np.arange(1000.0)
+    y = rng.normal(size=1000)
+    dx, dy = minmax(x, y, 100)
+    assert len(dx) <= 100
+    assert np.all(np.diff(dx) > 0)
+    assert y.max() in dy and y.min() in dy
+    for edges in np.split(np.arange(1000), 50):
+        assert y[edges].max() in dy and y[edges].min() in dy
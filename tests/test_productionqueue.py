@@ -0,0 +1,72 @@
+# Runs a lot through ProductionQueue against the simulated PNA
+import json
+
+import pytest
+
+from archive import MeasurementArchive
+from calindex import CalIndex
+from pna import PNA
+from productionqueue import DONE, ProductionQueue
+from simulator import SimulatedPNA, SimulatorServer
+
+INPUT_POWER = -50.0
+
+
+@pytest.fixture
+def pna(tmp_path):
+    server = SimulatorServer(SimulatedPNA(seed=1, calibrated=True), port=0).start()
+    pna = PNA(server.address, gui=False)
+    pna.cal_index = CalIndex(str(tmp_path / 'index.json'))
+    assert pna.connect_to_pna() == 0
+    # Already calibrated at the lot's power, so the queue goes straight to measuring
+    pna.input_pow = INPUT_POWER
+    yield pna
+    pna.close_session()
+    server.shutdown()
+    server.server_close()
+
+
+def test_resume_skips_devices_already_done(pna, tmp_path):
+    checkpoint = str(tmp_path / 'lot.json')
+    queue = ProductionQueue(pna, INPUT_POWER, checkpoint, str(tmp_path), log=lambda message: None)
+    queue.run(['SN1'])
+    assert queue.is_done('SN1')
+
+    # A new queue on the same checkpoint only measures what is left
+    queue = ProductionQueue(pna, INPUT_POWER, checkpoint, str(tmp_path), log=lambda message: None)
+    report = queue.run(['SN1', 'SN2'])
+    assert report['done'] == 2
+    assert report['session_done'] == 1
+    assert len(MeasurementArchive(str(tmp_path / 'SN1')).load()) == 1
+    with open(checkpoint) as f:
+        devices = json.load(f)['devices']
+    assert devices['SN2']['status'] == DONE
+
+
+def test_resume_at_another_power_is_refused(pna, tmp_path):
+    checkpoint = str(tmp_path / 'lot.json')
+    ProductionQueue(pna, INPUT_POWER, checkpoint, str(tmp_path), log=lambda message: None).run(['SN1'])
+    with pytest.raises(ValueError):
+        ProductionQueue(pna, INPUT_POWER + 10, checkpoint, str(tmp_path))
+
+
+def test_retry_reconnects_without_rebuilding_the_channels(pna, tmp_path, monkeypatch):
+    queue = ProductionQueue(pna, INPUT_POWER, str(tmp_path / 'lot.json'), str(tmp_path), log=lambda message: None)
+    queue.run(['SN1'])
+
+    copies = []
+    original_copy = pna.copy_channel
+    monkeypatch.setattr(pna, 'copy_channel', lambda *args: copies.append(args) or original_copy(*args))
+    original_test = pna.two_tone_test
+    failures = [TimeoutError('simulated VISA timeout')]
+
+    def flaky_two_tone_test(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return original_test(*args, **kwargs)
+
+    monkeypatch.setattr(pna, 'two_tone_test', flaky_two_tone_test)
+    assert queue.measure('SN2')
+    assert queue.devices['SN2']['attempts'] == 2
+    # The reconnect was to the same PNA with no preset, so the two-tone channels were reused
+    assert copies == []
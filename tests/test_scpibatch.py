@@ -0,0 +1,89 @@
+import pytest
+
+from pna import InstrumentError, ScpiBatch
+
+
+class FakeSession:
+    """Records writes and answers SYST:ERR? from a canned error queue.
+
+    Commands in rejects queue an error without naming the command, like a real PNA.
+    """
+
+    def __init__(self, errors=(), rejects=()):
+        self.written = []
+        self.errors = list(errors)
+        self.rejects = set(rejects)
+
+    def write(self, message):
+        self.written.append(message)
+        self.errors.extend('-113,"Undefined header"' for command in message.split(';') if command in self.rejects)
+
+    def query(self, message):
+        self.write(message)
+        return self.errors.pop(0) if self.errors else '+0,"No error"'
+
+
+def test_commands_are_joined_up_to_the_length_limit():
+    batch = ScpiBatch(FakeSession(), max_length=30)
+    for command in ('SENS:FREQ:STAR 1', 'SENS:FREQ:STOP 2', '*WAI', ':SENS:SWE:POIN 3'):
+        batch.write(command)
+    messages = batch.messages()
+    assert messages == [':SENS:FREQ:STAR 1', ':SENS:FREQ:STOP 2;*WAI', ':SENS:SWE:POIN 3']
+    assert all(len(message) <= 30 for message in messages)
+
+
+def test_queries_are_rejected():
+    batch = ScpiBatch(FakeSession())
+    with pytest.raises(ValueError):
+        batch.write('SENS:FREQ:STAR?')
+    with pytest.raises(ValueError):
+        batch.write('CALC:PAR:CAT? 1')
+
+
+def test_send_reads_the_error_queue_with_the_last_message():
+    session = FakeSession()
+    with ScpiBatch(session, max_length=20) as batch:
+        batch.write('SENS:FREQ:STAR 1')
+        batch.write('SENS:FREQ:STOP 2')
+    assert session.written == [':SENS:FREQ:STAR 1', ':SENS:FREQ:STOP 2;:SYSTem:ERRor?']
+    assert batch.message_count == 2
+    assert batch.commands == []
+
+
+def test_errors_name_the_failing_command():
+    session = FakeSession(['-113,"Undefined header;:SENS:FOO 1"', '+0,"No error"'])
+    batch = ScpiBatch(session)
+    batch.write('SENS:FREQ:STAR 1')
+    batch.write('SENS:FOO 1')
+    with pytest.raises(InstrumentError, match=r'^:SENS:FOO 1: -113'):
+        batch.send()
+
+
+def test_unnamed_errors_are_found_by_resending_one_at_a_time():
+    session = FakeSession(rejects=[':SENS:FOO 1'])
+    batch = ScpiBatch(session)
+    for command in ('SENS:FREQ:STAR 1', 'SENS:FOO 1', 'SENS:FREQ:STOP 2'):
+        batch.write(command)
+    with pytest.raises(InstrumentError, match=r'^:SENS:FOO 1: -113,"Undefined header"$'):
+        batch.send()
+    resent = [message for message in session.written[1:] if message != 'SYSTem:ERRor?']
+    assert resent == [':SENS:FREQ:STAR 1;:SYSTem:ERRor?', ':SENS:FOO 1;:SYSTem:ERRor?', ':SENS:FREQ:STOP 2;:SYSTem:ERRor?']
+
+
+def test_a_batch_that_must_not_run_twice_is_not_resent():
+    session = FakeSession(rejects=[':SENS:FOO 1'])
+    batch = ScpiBatch(session, idempotent=False)
+    batch.write('SENS:FREQ:STAR 1')
+    batch.write('SENS:FOO 1')
+    with pytest.raises(InstrumentError, match=r'from a batch of 2 commands'):
+        batch.send()
+    assert len(session.written) == 2
+
+
+def test_nothing_is_sent_when_the_block_raises():
+    session = FakeSession()
+    with pytest.raises(RuntimeError):
+        with ScpiBatch(session) as batch:
+            batch.write('SENS:FREQ:STAR 1')
+            raise RuntimeError()
+    assert session.written == []
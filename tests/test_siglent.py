@@ -0,0 +1,28 @@
+# Runs a noise measurement against the simulated Siglent SA
+import numpy as np
+
+from noise import analyse_measurement
+from siglent import SiglentSA
+from simulator import SimulatedSiglentSA, SimulatorServer
+
+
+def test_siglent_noise_measurement():
+    instrument = SimulatedSiglentSA(seed=1, noise_temp=1e6)
+    server = SimulatorServer(instrument, port=0).start()
+    sa = SiglentSA(server.address)
+    assert sa.connect() == 0
+    try:
+        sa.configure(300e6, 4.05e9, rbw=1e6)
+        between = []
+        measurement = sa.measure_noise(16, between=lambda: between.append(True))
+    finally:
+        sa.close_session()
+        server.shutdown()
+        server.server_close()
+    assert between == [True]
+    assert measurement['rbw'] == 1e6
+    assert measurement['dark'].shape == measurement['trace'].shape == measurement['freq'].shape
+    gain_freq = np.linspace(300e6, 4.05e9, 401)
+    result = analyse_measurement(measurement, gain_freq, instrument.gain(gain_freq))
+    # 16 averages leave about 0.1 dB of scatter per point
+    assert abs(np.median(result['noise_temp']) / 1e6 - 1) < 0.05
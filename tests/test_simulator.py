@@ -0,0 +1,83 @@
+# Runs the acquisition pipeline against the simulated PNA, timing it against ACQUISITION_BUDGET
+import time
+
+import numpy as np
+import pytest
+
+from pna import ACQUIRE_SEQUENTIAL, ACQUIRE_SINGLE_SWEEP, DATA_FORMAT_ASCII, DATA_FORMAT_REAL64, FREQ_PLAN, PNA
+from simulator import SimulatedPNA, SimulatorServer
+
+INPUT_POWER = -50.0
+# Seconds per DUT allowed for a two-tone test, with the bus and sweep times of `simulator.py benchmark`
+ACQUISITION_BUDGET = 1.0
+# The simulated traces carry 0.05 dB of noise, the intercepts combine up to three of them
+TOLERANCE_DB = 0.5
+
+
+@pytest.fixture(scope='module')
+def instrument():
+    return SimulatedPNA(latency=0.001, byte_time=1e-6, sweep_time=0.05, seed=1, calibrated=True)
+
+
+@pytest.fixture(scope='module')
+def pna(instrument):
+    # Port 0 picks a free port
+    server = SimulatorServer(instrument, port=0).start()
+    pna = PNA(server.address, gui=False)
+    assert pna.connect_to_pna() == 0
+    pna.input_pow = INPUT_POWER
+    yield pna
+    pna.close_session()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('mode', [ACQUIRE_SINGLE_SWEEP, ACQUIRE_SEQUENTIAL])
+@pytest.mark.parametrize('data_format', [DATA_FORMAT_REAL64, DATA_FORMAT_ASCII])
+def test_two_tone_test_matches_the_model(pna, instrument, mode, data_format):
+    pna.acquisition_mode = mode
+    pna.data_format = data_format
+    pna.two_tone_test(INPUT_POWER)
+
+    # The primary tone range is read back from the PNA
+    assert len(pna.x_axis) == FREQ_PLAN['points']
+    np.testing.assert_allclose(pna.x_axis[[0, -1]] * 1e9, [FREQ_PLAN['primary_start'], FREQ_PLAN['primary_stop']])
+    # The gain, OIP2 and OIP3 models of SimulatedPNA._synthesize, over the simulator's own sweep
+    freq_ghz = instrument._frequencies() / 1e9
+    gain = -5 - 2 * freq_ghz
+    oip2 = 40 - 3 * freq_ghz
+    oip3 = 25 - 2 * freq_ghz
+    np.testing.assert_allclose(pna.primary_low, INPUT_POWER + gain, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.primary_high, INPUT_POWER + gain - 0.2, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.gain, gain, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.OIP2, oip2, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.OIP3, oip3, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.IIp2, oip2 - gain, atol=TOLERANCE_DB)
+    np.testing.assert_allclose(pna.IIp3, oip3 - gain, atol=TOLERANCE_DB)
+
+
+def test_acquisition_budget(pna):
+    pna.acquisition_mode = ACQUIRE_SINGLE_SWEEP
+    pna.data_format = DATA_FORMAT_REAL64
+    # The first run builds the channels, keep it out of the timing
+    pna.two_tone_test(INPUT_POWER)
+    runs = 3
+    start = time.perf_counter()
+    for _ in range(runs):
+        pna.two_tone_test(INPUT_POWER)
+    seconds = (time.perf_counter() - start) / runs
+    assert seconds < ACQUISITION_BUDGET, 'Two-tone test took %.3f s per DUT' % seconds
+
+
+
+@pytest.mark.parametrize('mode, traces_read', [(ACQUIRE_SINGLE_SWEEP, 0), (ACQUIRE_SEQUENTIAL, 4)])
+def test_after_sweep_runs_before_the_last_trace_is_read(pna, mode, traces_read):
+    pna.acquisition_mode = mode
+    emitted = []
+    seen = []
+    pna.trace_callback = lambda name, x_axis, values: emitted.append(name)
+    try:
+        pna.two_tone_test(INPUT_POWER, after_sweep=lambda: seen.append(len(emitted)))
+    finally:
+        pna.trace_callback = None
+    assert seen == [traces_read]
@@ -0,0 +1,46 @@
+import numpy as np
+
+from ftx_ctl.telemetry import TelemetrySampler, read_getters
+
+
+def test_ring_buffer_keeps_the_newest_samples_in_order():
+    counter = iter(range(100))
+    sampler = TelemetrySampler(lambda: {'a': next(counter)}, ['a', 'b'], capacity=4)
+    for _ in range(6):
+        sampler.sample_once()
+    assert len(sampler) == 4
+    times, data = sampler.snapshot()
+    np.testing.assert_array_equal(data[:, 0], [2, 3, 4, 5])
+    assert np.all(np.isnan(data[:, 1]))
+    assert np.all(np.diff(times) >= 0)
+    np.testing.assert_array_equal(sampler.series('a', last=2)[1], [4, 5])
+    assert sampler.latest()['a'] == 5
+    assert sampler.stats()['a'] == {'min': 2, 'max': 5, 'mean': 3.5}
+    assert np.isnan(sampler.stats()['b']['mean'])
+
+
+def test_failed_reads_leave_gaps():
+    def read():
+        raise OSError('bus error')
+    sampler = TelemetrySampler(read, ['a'], capacity=4)
+    sampler.sample_once()
+    assert sampler.errors == 1
+    assert np.isnan(sampler.latest()['a'])
+
+
+def test_read_getters_isolates_failures():
+    def broken():
+        raise TimeoutError()
+    read = read_getters({'ok': lambda: 1.5, 'broken': broken})
+    values = read()
+    assert values['ok'] == 1.5
+    assert np.isnan(values['broken'])
+
+
+def test_export_csv(tmp_path):
+    sampler = TelemetrySampler(lambda: {'a': 1.0, 'b': 2.0}, ['a', 'b'], capacity=4)
+    sampler.sample_once()
+    sampler.export_csv(str(tmp_path / 'telemetry.csv'))
+    lines = (tmp_path / 'telemetry.csv').read_text().splitlines()
+    assert lines[0] == 'time,a,b'
+    assert lines[1].endswith(',1,2')
@@ -0,0 +1,99 @@
+# wait_for_opc against a fake session whose status register and replies are scripted
+import pytest
+import pyvisa as visa
+from pyvisa.constants import StatusCode
+
+from pna import ESR_OPC, InstrumentError, wait_for_opc
+
+TIMEOUT = visa.VisaIOError(StatusCode.error_timeout)
+
+
+class FakeSession:
+    """Answers *ESR? with the next entry of replies, an exception entry is raised instead.
+
+    A reply that timed out stays owed and is returned by the next read().
+    """
+
+    def __init__(self, replies, errors=()):
+        self.replies = list(replies)
+        self.errors = list(errors)
+        self.sent = []
+        self.timeout = 2000
+        self.cleared = 0
+
+    def write(self, message):
+        self.sent.append(message)
+
+    def _next(self):
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def query(self, message):
+        self.sent.append(message)
+        if message.startswith('SYSTem:ERRor?'):
+            return self.errors.pop(0) if self.errors else '+0,"No error"'
+        return self._next()
+
+    def read(self):
+        self.sent.append('read')
+        return self._next()
+
+    def clear(self):
+        self.cleared += 1
+
+
+def test_returns_once_opc_is_set():
+    session = FakeSession(['0', '0', str(ESR_OPC)])
+    wait_for_opc(session, ':INIT', 1, poll_interval=0)
+    assert session.sent == ['*CLS;:INIT;*OPC', '*ESR?', '*ESR?', '*ESR?']
+
+
+def test_a_timed_out_poll_is_read_again_without_a_clear():
+    session = FakeSession(['0', TIMEOUT, TIMEOUT, str(ESR_OPC)])
+    wait_for_opc(session, ':INIT', 1, poll_interval=0)
+    # The owed replies are read instead of sending a new *ESR? over them, and *OPC survives
+    assert session.sent == ['*CLS;:INIT;*OPC', '*ESR?', '*ESR?', 'read', 'read']
+    assert session.cleared == 0
+
+
+def test_error_bits_raise_with_the_error_queue():
+    session = FakeSession([str(ESR_OPC | 0b100000)], errors=['-113,"Undefined header"'])
+    with pytest.raises(InstrumentError, match=r'^:FOO: -113,"Undefined header"$'):
+        wait_for_opc(session, ':FOO', 1, poll_interval=0)
+
+
+def test_times_out_and_drops_the_owed_reply():
+    session = FakeSession([TIMEOUT] * 100)
+    with pytest.raises(TimeoutError):
+        wait_for_opc(session, ':INIT', 0.02, poll_interval=0.005)
+    assert session.cleared == 1
+
+
+def test_check_cancelled_runs_between_polls():
+    class Stop(Exception):
+        pass
+
+    def check_cancelled():
+        raise Stop()
+
+    session = FakeSession(['0', str(ESR_OPC)])
+    with pytest.raises(Stop):
+        wait_for_opc(session, ':INIT', 1, check_cancelled, poll_interval=0)
+
+
+def test_sequential_waits_on_one_opc_query_with_the_timeout_raised():
+    session = FakeSession(['1', '0'])
+    timeouts = []
+    original_query = session.query
+
+    def query(message):
+        timeouts.append(session.timeout)
+        return original_query(message)
+
+    session.query = query
+    wait_for_opc(session, ':SENS:CORR:COLL:ACQ', 30, sequential=True)
+    assert session.sent == ['*CLS;:SENS:CORR:COLL:ACQ', '*OPC?', '*ESR?']
+    assert timeouts == [30000, 2000]
+    assert session.timeout == 2000
@@ -0,0 +1,80 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from guiloop import CallbackDispatcher
+from worker import Cancelled, InstrumentWorker
+
+
+@pytest.fixture
+def worker():
+    worker = InstrumentWorker()
+    yield worker
+    worker.stop(1)
+
+
+def test_jobs_run_in_order(worker):
+    results = []
+    futures = [worker.submit(results.append, i) for i in range(5)]
+    for future in futures:
+        future.result(1)
+    assert results == [0, 1, 2, 3, 4]
+
+
+def test_cancel_stops_the_running_job_and_drops_the_queue(worker):
+    started = threading.Event()
+
+    def long_job():
+        started.set()
+        while True:
+            worker.check_cancelled()
+            time.sleep(0.001)
+
+    running = worker.submit(long_job)
+    queued = worker.submit(lambda: 1)
+    started.wait(1)
+    worker.cancel()
+    with pytest.raises(Cancelled):
+        running.result(1)
+    assert queued.cancelled()
+    # Jobs submitted after the cancel run as usual
+    assert worker.submit(lambda: 2).result(1) == 2
+
+
+def test_cancel_right_after_submit_is_never_lost(worker):
+    def job():
+        for _ in range(50):
+            worker.check_cancelled()
+            time.sleep(0.001)
+        return 'finished'
+
+    for i in range(100):
+        future = worker.submit(job)
+        time.sleep(0.0001 * (i % 5))
+        worker.cancel()
+        with pytest.raises((Cancelled, CancelledError)):
+            future.result(1)
+
+
+def test_stop_does_not_hang_on_a_job_waiting_for_the_render_thread():
+    dispatcher = CallbackDispatcher()
+    worker = InstrumentWorker()
+    waiting = threading.Event()
+
+    def ask_the_operator():
+        # Like msgbox from a job, the render thread never gets round to answering
+        future = dispatcher.post(lambda: 'Yes')
+        waiting.set()
+        return future.result()
+
+    future = worker.submit(ask_the_operator)
+    assert waiting.wait(1)
+    worker.cancel()
+    dispatcher.close()
+    assert worker.stop(1)
+    with pytest.raises(CancelledError):
+        future.result(0)
+    # Anything posted after the close fails straight away too
+    assert dispatcher.post(lambda: None).cancelled()
@@ -5,9 +5,18 @@ from pyftdi.i2c import I2cController, I2cIOError
 from rfof import Ftx
 from rfof import Frx
 import time
-from pna import PNA, handle_callbacks_and_render_one_frame
+from pna import PNA, handle_callbacks_and_render_one_frame, call_on_render_thread, msgbox
+from guiloop import dispatcher, scheduler, install_input_handlers
+from worker import InstrumentWorker, Cancelled
+from archive import MeasurementArchive, pack_run
+from attensweep import AttenuationSweep
+from productionqueue import ProductionQueue
 import binascii
+import os
 import numpy as np
+from busscheduler import BusScheduler
+from ftx_ctl.telemetry import TelemetrySampler, read_getters
+from plotting import LivePlot, MINMAX, decimate
 
 
 def add_text_to_console(msg) -> None:
@@ -21,10 +30,25 @@ def is_pna_connected():
     return state.get("enabled")
 
 
-def clear_graph():
-    dpg.delete_item("y_axis", children_only=True, slot=1)
-    dpg.delete_item("iip2 y_axis", children_only=True, slot=1)
-    dpg.delete_item("iip3 y_axis", children_only=True, slot=1)
+# Seconds of telemetry history shown in the plots
+TELEMETRY_PLOT_WINDOW = 300
+# (sampler attribute, board, channel, plot series, units) for each telemetry trace
+TELEMETRY_TRACES = (('ftx_telemetry', 'FTX', 'ld_current', 'telemetry_ld_series', 'mA'),
+                    ('frx_telemetry', 'FRX', 'pd_current', 'telemetry_pd_series', 'mA'),
+                    ('ftx_telemetry', 'FTX', 'rf_power', 'telemetry_ftx_rf_series', 'dBm'),
+                    ('frx_telemetry', 'FRX', 'rf_power', 'telemetry_frx_rf_series', 'dBm'))
+# Most points drawn per telemetry trace, about the plot width in pixels
+TELEMETRY_PLOT_POINTS = 1000
+
+# (PNA trace, plot, y axis) of the measurement plots
+TRACE_PLOTS = (('gain', 'gain plot', 'y_axis'), ('IIP2', 'IIP2 plot', 'iip2 y_axis'),
+               ('IIP3', 'IIP3 plot', 'iip3 y_axis'))
+# Width of the measurement plots in pixels, traces are decimated to it
+TRACE_PLOT_WIDTH = 690
+# Earlier runs kept overlaid on the measurement plots
+TRACE_PLOT_HISTORY = 50
+# Seconds to wait on exit for the running PNA job to stop before its session is closed under it
+WORKER_STOP_TIMEOUT = 10
 
 
 class UserInterface:
@@ -38,6 +62,15 @@ class UserInterface:
         self.i2c_receive = None
         self.frx = None
         self.pna = None
+        # PNA I/O runs here so the render loop and telemetry keep going during sweeps
+        self.pna_worker = InstrumentWorker('pna')
+        # Each board's I2C traffic runs on its own worker, so FTX and FRX proceed in parallel
+        self.buses = BusScheduler()
+        self.ftx_telemetry = None
+        self.frx_telemetry = None
+        self.telemetry_rate = 10.0
+        # LivePlot of each PNA trace shown, keyed by trace name
+        self.trace_plots = {}
         self._lna_current_id = 0
         self._lna_voltage_id = 0
         self._laser_current_id = 0
@@ -65,30 +98,33 @@ class UserInterface:
         dpg.show_viewport()
         dpg.set_viewport_resizable(False)
         dpg.configure_app(manual_callback_management=True)
-        ti = dpg.get_total_time()
+        install_input_handlers()
+        scheduler.call_every(2, self._timer_callback)
+        # Paced by the scheduler, fast while there is something to update and slow when idle
         while dpg.is_dearpygui_running():
-            tf = dpg.get_total_time()
-            if (tf - ti) > 2:  # approx 2 second intervals
-                ti = tf
-                self._timer_callback()
             handle_callbacks_and_render_one_frame()
         dpg.destroy_context()
 
     def _timer_callback(self) -> None:
-        """Timer callback that runs approx every 2 second.
+        """Timer callback that runs every 2 seconds from the scheduler.
 
         If the frx or ftx is connected, this will refresh the
-        monitor data"""
+        monitor data from their telemetry buffers"""
         if self.frx is not None:
             self._update_mon_frx()
 
         if self.ftx is not None:
             self._update_mon_ftx()
 
+        self._update_telemetry_plot()
+
     def connect_pna(self):
         #  Connect to the PNA
         if self.pna is None:
             self.pna = PNA()
+            self.pna.cancel_event = self.pna_worker.cancel_event
+            self.pna.trace_callback = self._trace_arrived
+        self.pna.VISA_ADDRESS = dpg.get_value("visa_address")
         if self.pna.connect_to_pna() == 0:
             # Send *IDN? and read the response
             idn = self.pna.get_idn()
@@ -100,6 +136,8 @@ class UserInterface:
             dpg.configure_item("start_cal_button", enabled=True)
             #  Enable starting a measurement
             dpg.configure_item("start_measure_button", enabled=True)
+            dpg.configure_item("start_atten_sweep_button", enabled=True)
+            dpg.configure_item("start_lot_button", enabled=True)
         else:
             dpg.add_text('Couldn\'t connect to \'%s\', exiting now...' % self.pna.VISA_ADDRESS,
                          parent=self._console_window_id)
@@ -115,23 +153,197 @@ class UserInterface:
         dpg.configure_item("start_cal_button", enabled=False)
         #  Disable starting a measurement
         dpg.configure_item("start_measure_button", enabled=False)
+        dpg.configure_item("start_atten_sweep_button", enabled=False)
+        dpg.configure_item("start_lot_button", enabled=False)
+
+    def _run_pna_job(self, fn, done_callback, *args) -> None:
+        """Runs fn on the PNA worker, then passes its result to done_callback on the render thread."""
+        self._set_pna_busy(True)
+        future = self.pna_worker.submit(fn, *args)
+        future.add_done_callback(lambda f: call_on_render_thread(self._pna_job_done, f, done_callback))
+
+    def _pna_job_done(self, future, done_callback) -> None:
+        self._set_pna_busy(False)
+        if future.cancelled() or isinstance(future.exception(), Cancelled):
+            dpg.add_text('Cancelled.', parent=self._console_window_id)
+        elif future.exception() is not None:
+            dpg.add_text('PNA error: ' + str(future.exception()), parent=self._console_window_id)
+        else:
+            done_callback(future.result())
+
+    def _run_bus_job(self, bus, done_callback, error_msg, fn, *args) -> None:
+        """Runs fn on the worker of an I2C bus, then passes its result to done_callback on the render thread."""
+        future = self.buses.submit(bus, fn, *args)
+        future.add_done_callback(lambda f: call_on_render_thread(self._bus_job_done, f, done_callback, error_msg))
+
+    def _bus_job_done(self, future, done_callback, error_msg) -> None:
+        if future.cancelled():
+            return
+        if isinstance(future.exception(), (TimeoutError, I2cIOError)):
+            add_text_to_console(error_msg)
+        elif future.exception() is not None:
+            add_text_to_console("I2C error: " + str(future.exception()))
+        else:
+            done_callback(future.result())
+
+    @staticmethod
+    def _set_and_read_back(setter, getter, value):
+        setter(value)
+        time.sleep(0.1)
+        return getter()
+
+    def _check_read_back(self, new_value, set_value) -> None:
+        if new_value != set_value:
+            add_text_to_console(
+                "**WARNING** Value input: " + str(round(new_value, 2)) + ", value set: " + str(set_value) + ".")
+
+    def _set_pna_busy(self, busy) -> None:
+        dpg.configure_item("start_cal_button", enabled=not busy)
+        dpg.configure_item("start_measure_button", enabled=not busy)
+        dpg.configure_item("start_atten_sweep_button", enabled=not busy)
+        dpg.configure_item("start_lot_button", enabled=not busy)
+        dpg.configure_item("disconnect_button", enabled=not busy)
+        dpg.configure_item("cancel_measure_button", enabled=busy)
+
+    def cancel_pna_job(self):
+        self.pna_worker.cancel()
+        dpg.add_text('Cancelling, the PNA will stop after the current step...', parent=self._console_window_id)
+
+    def _calibrate(self, power, reuse) -> bool:
+        """Runs on the PNA worker. Returns True if a saved calibration was loaded instead."""
+        if reuse and self.pna.recall_calibration(power):
+            return True
+        self.pna.calibration(power)
+        return False
 
     def start_calibration(self):
         dpg.add_text('Starting the calibration routine...', parent=self._console_window_id)
-        self.pna.calibration(str(dpg.get_value("cal_input")))
-        dpg.add_text('Finished receiver power calibration.', parent=self._console_window_id)
+        self._run_pna_job(self._calibrate, self._calibration_done, str(dpg.get_value("cal_input")),
+                          dpg.get_value("reuse_cal_checkbox"))
+
+    def _calibration_done(self, recalled) -> None:
+        if recalled:
+            dpg.add_text('Loaded the saved calibration for ' + str(dpg.get_value("cal_input")) + ' dBm.',
+                         parent=self._console_window_id)
+        else:
+            dpg.add_text('Finished receiver power calibration.', parent=self._console_window_id)
+
+    def _measure(self, power) -> bool:
+        """Runs on the PNA worker. Returns True if a saved calibration had to be loaded first."""
+        recalled = self.pna.input_pow is None and self.pna.recall_calibration(power)
+        self.pna.two_tone_test(power)
+        return recalled
 
     def start_measurement(self):
-        # TODO: what if we start a measurement from a pre-calibrated machine
         dpg.add_text("Starting two-tone measurement...", parent=self._console_window_id)
-        self.pna.two_tone_test(dpg.get_value("cal_input"))
-        if self.pna.x_axis is not None:
-            dpg.configure_item("gain plot", show=True)
-            dpg.add_line_series(self.pna.x_axis, self.pna.gain, parent="y_axis")
-            dpg.configure_item("IIP2 plot", show=True)
-            dpg.add_line_series(self.pna.x_axis, self.pna.IIp2, parent="iip2 y_axis")
-            dpg.configure_item("IIP3 plot", show=True)
-            dpg.add_line_series(self.pna.x_axis, self.pna.IIp3, parent="iip3 y_axis")
+        self._run_pna_job(self._measure, self._measurement_done, dpg.get_value("cal_input"))
+
+    def _measurement_done(self, recalled) -> None:
+        if recalled:
+            dpg.add_text('Loaded the saved calibration for ' + str(dpg.get_value("cal_input")) + ' dBm.',
+                         parent=self._console_window_id)
+        if self.pna.timing is not None:
+            dpg.add_text("Acquisition took " + ", ".join("%s %.1f ms" % (stage, seconds * 1e3)
+                                                          for stage, seconds in self.pna.timing.items()) + ".",
+                         parent=self._console_window_id)
+
+    def _trace_arrived(self, name, x_axis, values) -> None:
+        """PNA trace_callback, runs on the PNA worker as each trace is read or computed."""
+        if name in self.trace_plots:
+            call_on_render_thread(self._show_trace, name, x_axis, values)
+
+    def _show_trace(self, name, x_axis, values) -> None:
+        for trace, plot, y_axis in TRACE_PLOTS:
+            if trace == name:
+                dpg.configure_item(plot, show=True)
+        self.trace_plots[name].push(x_axis, values)
+
+    def clear_graph(self) -> None:
+        for plot in self.trace_plots.values():
+            plot.clear()
+
+    def _atten_sweep(self, power, steps) -> AttenuationSweep:
+        """Runs on the PNA worker, the attenuators are driven on their own bus workers."""
+        if self.pna.input_pow is None:
+            self.pna.recall_calibration(power)
+        boards = {'ftx': self.ftx, 'frx': self.frx}
+        sweep = AttenuationSweep(self.pna, self.buses, {name: boards[name] for name in steps[0]}, steps)
+        sweep.run(power)
+        return sweep
+
+    def start_atten_sweep(self):
+        try:
+            values = [float(value) for value in dpg.get_value("atten_sweep_input").split(',') if value.strip()]
+        except ValueError:
+            add_text_to_console("Attenuation list must be comma separated numbers.")
+            return
+        names = {'FTX': ['ftx'], 'FRX': ['frx'], 'Both': ['ftx', 'frx']}[dpg.get_value("atten_sweep_board")]
+        for name in names:
+            if getattr(self, name) is None:
+                dpg.add_text('Connect the ' + name.upper() + ' board before sweeping its attenuation.',
+                             parent=self._console_window_id)
+                return
+        if not values:
+            return
+        steps = [{name: value for name in names} for value in values]
+        dpg.add_text("Starting attenuation sweep over " + str(len(steps)) + " steps...",
+                     parent=self._console_window_id)
+        self._run_pna_job(self._atten_sweep, self._atten_sweep_done, dpg.get_value("cal_input"), steps)
+
+    def _atten_sweep_done(self, sweep) -> None:
+        if sweep.error is not None:
+            dpg.add_text("Attenuation sweep stopped after " + str(len(sweep.readbacks)) + " of " +
+                         str(len(sweep.steps)) + " steps: " + str(sweep.error), parent=self._console_window_id)
+        if not sweep.readbacks:
+            return
+        archive = MeasurementArchive('atten_sweep_' + time.strftime("%Y%m%d_%H%M%S", time.localtime()))
+        snapshot = self._monitor_snapshot()
+        for step, readback, run in zip(sweep.steps, sweep.readbacks, sweep.results):
+            archive.append(run, dict(snapshot, **{'Attenuation (dB)': step, 'Attenuation read back (dB)': readback}))
+            dpg.add_text("Attenuation " + str(readback) + ": min IIP3 " + "{:.2f}".format(run['iip3'].min()) +
+                         " dBm, mean gain " + "{:.2f}".format(run['gain'].mean()) + " dB",
+                         parent=self._console_window_id)
+        dpg.add_text("Saved the attenuation sweep to " + archive.data_path, parent=self._console_window_id)
+
+    def _prompt_for_dut(self, serial) -> bool:
+        if serial is None:
+            return msgbox('Insert the next DUT, then press Yes. Press No to stop the lot.', extra_button=True) == 'Yes'
+        return msgbox('Insert DUT ' + serial + ', then press Yes. Press No to stop the lot.',
+                      extra_button=True) == 'Yes'
+
+    def _run_lot(self, power, serials, checkpoint_path, out_dir) -> dict:
+        """Runs on the PNA worker, prompting for every DUT."""
+        lot = ProductionQueue(self.pna, power, checkpoint_path, out_dir,
+                              log=lambda message: call_on_render_thread(add_text_to_console, message))
+        read_serial = None
+        if serials is None:
+            # No list given, so every DUT identifies itself from the FTX EEPROM
+            read_serial = lambda: str(self.buses.call('ftx', self.ftx.get_uid))
+        return lot.run(serials, read_serial, prompt=self._prompt_for_dut,
+                       metadata=lambda: call_on_render_thread(self._monitor_snapshot).result(),
+                       check_cancelled=self.pna_worker.check_cancelled)
+
+    def start_lot(self):
+        serials = [serial.strip() for serial in dpg.get_value("lot_serials").replace(',', '\n').split('\n')
+                   if serial.strip()]
+        if not serials:
+            if self.ftx is None:
+                add_text_to_console("Enter the DUT serials or connect the FTX board to read them.")
+                return
+            serials = None
+        os.makedirs(dpg.get_value("lot_out_dir"), exist_ok=True)
+        dpg.add_text("Starting production lot...", parent=self._console_window_id)
+        self._run_pna_job(self._run_lot, self._lot_done, dpg.get_value("cal_input"), serials,
+                          dpg.get_value("lot_checkpoint"), dpg.get_value("lot_out_dir"))
+
+    def _lot_done(self, report) -> None:
+        message = (str(report['session_done']) + " DUTs measured in " + "{:.0f}".format(report['elapsed']) +
+                   " s (" + "{:.1f}".format(report['duts_per_hour']) + " DUTs/hour), " + str(report['done']) +
+                   " done in the lot")
+        if report['failed']:
+            message += ", failed: " + ", ".join(report['failed'])
+        dpg.set_value("lot_status", message)
+        dpg.add_text(message, parent=self._console_window_id)
 
     def _connect_frx(self, sender=None, data=None) -> None:
         """Callback for clicking the frx connect button.
@@ -147,12 +359,26 @@ class UserInterface:
         try:
             self.i2c_receive.configure(dev, interface=1)
             # self.i2c_receive.configure(dev, interface=2)  # Tigard
-            self.frx = Frx(self.i2c_receive)
+            self.buses.add_bus('frx')
+            self.frx = self.buses.call('frx', Frx, self.i2c_receive)
+            dpg.set_value(self._frx_sn_id, self.buses.call('frx', self.frx.get_uid))
         except I2cIOError:
             # Log the error to the console
             add_text_to_console("Could not connect to FRX board, check connection and try again.")
+            self.buses.remove_bus('frx')
+            self.frx = None
             return
 
+        getters = {'rf_power': self.frx.get_rf_power,
+                   'pd_current': self.frx.get_pd_current,
+                   'temp': self.frx.get_temp,
+                   'atten': self.frx.get_atten}
+        read = read_getters(getters)
+        self.frx_telemetry = TelemetrySampler(lambda: self.buses.call('frx', read), list(getters),
+                                              rate=self.telemetry_rate)
+        self.frx_telemetry.sample_once()
+        self.frx_telemetry.start()
+
         add_text_to_console("Connected to the FRX board. Control fields are now enabled.")
 
         dpg.configure_item("frx_connect_button", show=False)
@@ -169,6 +395,9 @@ class UserInterface:
         """
         dpg.configure_item("frx_connect_button", show=True)
         dpg.configure_item("frx_disconnect_button", show=False)
+        self.frx_telemetry.stop()
+        self.frx_telemetry = None
+        self.buses.remove_bus('frx')
         self.i2c_receive.close()
         self.frx = None
         add_text_to_console("FRX board connection closed. OK to unplug.")
@@ -177,30 +406,24 @@ class UserInterface:
 
     def _update_frx_attn(self) -> None:
         new_value = dpg.get_value("frx_output_attn")
-        self.frx.set_atten(new_value)
         add_text_to_console("Setting output attenuation to " + str(new_value) + "...")
-        time.sleep(0.1)
-        try:
-            set_value = self.frx.get_atten()
-            dpg.set_value(self._frx_attn_id, set_value)
-            if new_value != set_value:
-                add_text_to_console("**WARNING** Value input: " + str(round(new_value, 2)) + ", value set: " +
-                                    str(set_value) + ".")
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FRX attenuation value.")
+        self._run_bus_job('frx', lambda set_value: self._frx_attn_done(new_value, set_value),
+                          "Timeout while reading FRX attenuation value.",
+                          self._set_and_read_back, self.frx.set_atten, self.frx.get_atten, new_value)
+
+    def _frx_attn_done(self, new_value, set_value) -> None:
+        dpg.set_value(self._frx_attn_id, set_value)
+        self._check_read_back(new_value, set_value)
 
     def _update_mon_frx(self) -> None:
-        """ Reads all the monitor data and updates the
-            display accordingly. Called every 2 second.
+        """ Shows the latest telemetry sample of the monitor data.
+            Called every 2 second.
         """
-        try:
-            dpg.set_value(self._frx_rfmon_id, "{:.2f}".format(self.frx.get_rf_power()))
-            dpg.set_value(self._pd_current_id, "{:.2f}".format(self.frx.get_pd_current()))
-            dpg.set_value(self._frx_sn_id, self.frx.get_uid())
-            dpg.set_value(self._temp_id, "{:.2f}".format(self.frx.get_temp()))
-            dpg.set_value(self._frx_attn_id, "{:.2f}".format(self.frx.get_atten()))
-        except TimeoutError:
-            add_text_to_console("Timeout while updating FRX monitor values.")
+        values = self.frx_telemetry.latest()
+        dpg.set_value(self._frx_rfmon_id, "{:.2f}".format(values['rf_power']))
+        dpg.set_value(self._pd_current_id, "{:.2f}".format(values['pd_current']))
+        dpg.set_value(self._temp_id, "{:.2f}".format(values['temp']))
+        dpg.set_value(self._frx_attn_id, "{:.2f}".format(values['atten']))
 
     def _connect_ftx(self, sender=None, data=None) -> None:
         """Callback for clicking the connect button.
@@ -217,12 +440,32 @@ class UserInterface:
         self.i2c_transmit = I2cController()
         try:
             self.i2c_transmit.configure(dev, interface=2)
-            self.ftx = Ftx(self.i2c_transmit)
+            self.buses.add_bus('ftx')
+            self.ftx = self.buses.call('ftx', Ftx, self.i2c_transmit)
+            dpg.set_value(self._ftx_sn_id, self.buses.call('ftx', self.ftx.get_uid))
         except I2cIOError:
             # Log the error to the console
             add_text_to_console("Could not connect to FTX board, check connection and try again.")
+            self.buses.remove_bus('ftx')
+            self.ftx = None
             return
 
+        getters = {'lna_current': self.ftx.get_lna_current,
+                   'lna_voltage': self.ftx.get_lna_voltage,
+                   'ld_current': self.ftx.get_ld_current,
+                   'pd_current': self.ftx.get_pd_current,
+                   'rf_power': self.ftx.get_rf_power,
+                   'atten': self.ftx.get_atten,
+                   'vdda': self.ftx.get_vdda_voltage,
+                   'vdd': self.ftx.get_vdd_voltage,
+                   'temp': self.ftx.get_temp,
+                   'lna_fault': self.ftx.get_lna_fault}
+        read = read_getters(getters)
+        self.ftx_telemetry = TelemetrySampler(lambda: self.buses.call('ftx', read), list(getters),
+                                              rate=self.telemetry_rate)
+        self.ftx_telemetry.sample_once()
+        self.ftx_telemetry.start()
+
         add_text_to_console("Connected to the FTX board. Control fields are now enabled.")
         dpg.configure_item("ftx_connect_button", show=False)
         dpg.configure_item("ftx_disconnect_button", show=True)
@@ -240,6 +483,9 @@ class UserInterface:
         """
         dpg.configure_item("ftx_connect_button", show=True)
         dpg.configure_item("ftx_disconnect_button", show=False)
+        self.ftx_telemetry.stop()
+        self.ftx_telemetry = None
+        self.buses.remove_bus('ftx')
         self.i2c_transmit.close()
         add_text_to_console("FTX board connection closed. OK to unplug.")
         self.ftx = None
@@ -249,82 +495,83 @@ class UserInterface:
         dpg.configure_item("ftx_laser_current", enabled=False)
 
     def _update_mon_ftx(self) -> None:
-        """ Reads all the monitor data and updates the
-            display accordingly
+        """ Shows the latest telemetry sample of the monitor data
+            and updates the display accordingly
         """
-        try:
-            if dpg.get_value("lna_bias_checkbox"):
-                dpg.set_value(self._lna_current_id, "{:.2f}".format(self.ftx.get_lna_current()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            if dpg.get_value("lna_bias_checkbox"):
-                dpg.set_value(self._lna_voltage_id, "{:.2f}".format(self.ftx.get_lna_voltage()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._laser_current_id, "{:.2f}".format(self.ftx.get_ld_current()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._laserpd_mon_id, "{:.2f}".format(self.ftx.get_pd_current()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._ftx_sn_id, self.ftx.get_uid())
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._ftx_rfmon_id, "{:.2f}".format(self.ftx.get_rf_power()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._ftx_attn_id, "{:.2f}".format(self.ftx.get_atten()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        # try:
-        #     dpg.set_value(self._ftx_temp_id, "{:.2f}".format(self.ftx.get_temp()))
-        # except Exception as inst:
-        #     print(type(inst))  # the exception type
-        #     print(inst.args)  # arguments stored in .args
-        #     print(inst)
-        #     add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._ftx_vdda_id, "{:.2f}".format(self.ftx.get_vdda_voltage()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
-        try:
-            dpg.set_value(self._ftx_vdd_id, "{:.2f}".format(self.ftx.get_vdd_voltage()))
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX monitor values.")
+        values = self.ftx_telemetry.latest()
+        if dpg.get_value("lna_bias_checkbox"):
+            dpg.set_value(self._lna_current_id, "{:.2f}".format(values['lna_current']))
+            dpg.set_value(self._lna_voltage_id, "{:.2f}".format(values['lna_voltage']))
+        dpg.set_value(self._laser_current_id, "{:.2f}".format(values['ld_current']))
+        dpg.set_value(self._laserpd_mon_id, "{:.2f}".format(values['pd_current']))
+        dpg.set_value(self._ftx_rfmon_id, "{:.2f}".format(values['rf_power']))
+        dpg.set_value(self._ftx_attn_id, "{:.2f}".format(values['atten']))
+        dpg.set_value(self._ftx_temp_id, "{:.2f}".format(values['temp']))
+        dpg.set_value(self._ftx_vdda_id, "{:.2f}".format(values['vdda']))
+        dpg.set_value(self._ftx_vdd_id, "{:.2f}".format(values['vdd']))
+
+    def _update_telemetry_plot(self) -> None:
+        """Redraws the telemetry plots and statistics from the sample buffers."""
+        now = time.time()
+        lines = []
+        for attr, board, channel, series, units in TELEMETRY_TRACES:
+            sampler = getattr(self, attr)
+            if sampler is None:
+                dpg.set_value(series, [[], []])
+                continue
+            last = int(TELEMETRY_PLOT_WINDOW * sampler.rate)
+            times, values = sampler.series(channel, last=last)
+            times, values = decimate(times - now, values, TELEMETRY_PLOT_POINTS, MINMAX)
+            dpg.set_value(series, [list(times), list(values)])
+            stats = sampler.stats(last=last)[channel]
+            lines.append(board + ' ' + channel + ' (' + units + '): min ' + "{:.3f}".format(stats['min']) +
+                         ', max ' + "{:.3f}".format(stats['max']) + ', mean ' + "{:.3f}".format(stats['mean']))
+        dpg.set_value("telemetry_stats", '\n'.join(lines))
+        dpg.fit_axis_data("telemetry_current_y_axis")
+        dpg.fit_axis_data("telemetry_rf_y_axis")
+
+    def _update_telemetry_rate(self) -> None:
+        self.telemetry_rate = dpg.get_value("telemetry_rate")
+        for sampler in (self.ftx_telemetry, self.frx_telemetry):
+            if sampler is not None:
+                sampler.rate = self.telemetry_rate
+        add_text_to_console("Telemetry sample rate set to " + str(self.telemetry_rate) + " Hz.")
+
+    def _export_telemetry(self) -> None:
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime())
+        for sampler, board in ((self.ftx_telemetry, 'ftx'), (self.frx_telemetry, 'frx')):
+            if sampler is not None and len(sampler) > 0:
+                filepath = 'telemetry_' + board + '_' + stamp + '.csv'
+                sampler.export_csv(filepath)
+                add_text_to_console("Saved " + str(len(sampler)) + " telemetry samples to " + filepath)
 
     def _update_ftx_attn(self) -> None:
         new_value = dpg.get_value("ftx_input_attn")
-        self.ftx.set_atten(new_value)
         add_text_to_console("Setting input attenuation to " + str(new_value) + "...")
-        time.sleep(0.1)
-        try:
-            set_value = self.ftx.get_atten()
-            dpg.set_value("ftx_attn", set_value)
-            if new_value != set_value:
-                add_text_to_console(
-                    "**WARNING** Value input: " + str(round(new_value, 2)) + ", value set: " + str(set_value) + ".")
-        except TimeoutError:
-            add_text_to_console("Timeout while reading FTX attenuation value.")
+        self._run_bus_job('ftx', lambda set_value: self._ftx_attn_done(new_value, set_value),
+                          "Timeout while reading FTX attenuation value.",
+                          self._set_and_read_back, self.ftx.set_atten, self.ftx.get_atten, new_value)
+
+    def _ftx_attn_done(self, new_value, set_value) -> None:
+        dpg.set_value("ftx_attn", set_value)
+        self._check_read_back(new_value, set_value)
 
     def _update_ftx_laser(self) -> None:
         new_value = dpg.get_value("ftx_laser_current")
-        self.ftx.set_ld_current(new_value)
         add_text_to_console("Setting laser current to " + str(new_value) + "...")
-        time.sleep(0.1)
-        try:
-            set_value = self.ftx.get_ld_current()
-            dpg.set_value("ftx_laser_current_mon", set_value)
-            if new_value != set_value:
-                add_text_to_console(
-                    "**WARNING** Value input: " + str(round(new_value, 2)) + ", value set: " + str(set_value) + ".")
-        except TimeoutError:
-            add_text_to_console("Timeout while reading Laser Diode current.")
+        self._run_bus_job('ftx', lambda set_value: self._ftx_laser_done(new_value, set_value),
+                          "Timeout while reading Laser Diode current.",
+                          self._set_and_read_back, self.ftx.set_ld_current, self.ftx.get_ld_current, new_value)
+
+    def _ftx_laser_done(self, new_value, set_value) -> None:
+        dpg.set_value("ftx_laser_current_mon", set_value)
+        self._check_read_back(new_value, set_value)
+
+    def _set_lna_bias(self, value):
+        self.ftx.set_lna_enable(value)
+        if value:
+            return self.ftx.get_lna_current(), self.ftx.get_lna_voltage()
+        return None
 
     def _lna_bias_checked(self, sender) -> None:
         """ Callback for when the lna bias enable checkbox is clicked.
@@ -333,16 +580,17 @@ class UserInterface:
         If turned off, sends the lna bias disable command
         """
         value = dpg.get_value(sender)
-        self.ftx.set_lna_enable(value)
         if value:
             add_text_to_console("LNA bias enabled.")
-            try:
-                dpg.set_value(self._lna_current_id, "{:.2f}".format(self.ftx.get_lna_current()))
-                dpg.set_value(self._lna_voltage_id, "{:.2f}".format(self.ftx.get_lna_voltage()))
-            except TimeoutError:
-                add_text_to_console("Timeout while reading LNA current and voltage.")
         else:
             add_text_to_console("LNA bias disabled.")
+        self._run_bus_job('ftx', self._lna_bias_done, "Timeout while reading LNA current and voltage.",
+                          self._set_lna_bias, value)
+
+    def _lna_bias_done(self, lna_values) -> None:
+        if lna_values is not None:
+            dpg.set_value(self._lna_current_id, "{:.2f}".format(lna_values[0]))
+            dpg.set_value(self._lna_voltage_id, "{:.2f}".format(lna_values[1]))
 
     def _show_popup_window(self, sender=None, data=None, user_data=None) -> None:
         """Callback for when certain buttons are clicked.
@@ -377,7 +625,53 @@ class UserInterface:
     def _save_callback(self, sender, app_data) -> None:
         self.save_measurement(app_data.get('file_path_name'))
 
+    def _monitor_snapshot(self) -> dict:
+        """Collects the report header and the FTX/FRX monitor values shown in the GUI."""
+        snapshot = {'Optical Attenuation': self.opt_attn,
+                    'Comments': dpg.get_value('notes_input'),
+                    'PNA calibration power': dpg.get_value("cal_input"),
+                    'FTX': None,
+                    'FRX': None}
+        if self.ftx is not None:
+            lna_enabled = dpg.get_value("lna_bias_checkbox")
+            # NaN until the first sample, or if the fault pin could not be read
+            lna_fault = self.ftx_telemetry.latest()['lna_fault'] if self.ftx_telemetry is not None else np.nan
+            snapshot['FTX'] = {'LNA Bias Enable': 'ON' if lna_enabled else 'OFF',
+                               'LNA Current (mA)': dpg.get_value(self._lna_current_id) if lna_enabled else 'N/A',
+                               'LNA Voltage (V)': dpg.get_value(self._lna_voltage_id) if lna_enabled else 'N/A',
+                               'LNA Fault': 'N/A' if np.isnan(lna_fault) else ('FAULT' if lna_fault else 'OK'),
+                               'RF Monitor (dBm)': dpg.get_value(self._ftx_rfmon_id),
+                               'Input Attenuation (dB)': dpg.get_value(self._ftx_attn_id),
+                               'Laser Current (mA)': dpg.get_value(self._laser_current_id),
+                               'PD Current (uA)': dpg.get_value(self._laserpd_mon_id),
+                               'FTX SN': dpg.get_value(self._ftx_sn_id),
+                               'FTX Temp (degC)': dpg.get_value(self._ftx_temp_id),
+                               'Vdd Voltage (V)': dpg.get_value(self._ftx_vdd_id),
+                               'Vdda Voltage (V)': dpg.get_value(self._ftx_vdda_id)}
+        if self.frx is not None:
+            snapshot['FRX'] = {'PD Current (mA)': dpg.get_value(self._pd_current_id),
+                               'RF Monitor (dBm)': dpg.get_value(self._frx_rfmon_id),
+                               'Output Attenuation (dB)': dpg.get_value(self._frx_attn_id),
+                               'Temperature (degC)': dpg.get_value(self._temp_id),
+                               'FRX SN': dpg.get_value(self._frx_sn_id)}
+        return snapshot
+
+    def save_archive(self, filepath):
+        """Appends the last measurement and the monitor snapshot to a binary DUT archive."""
+        if self.pna is None or self.pna.x_axis is None:
+            add_text_to_console("No measurement to save.")
+            return
+        run = pack_run(self.pna.x_axis * 1000000000, self.pna.primary_low, self.pna.primary_high,
+                       self.pna.second_intermod, self.pna.third_intermod_low, self.pna.third_intermod_high,
+                       self.pna.OIP2, self.pna.OIP3, self.pna.gain, self.pna.IIp2, self.pna.IIp3)
+        archive = MeasurementArchive(filepath)
+        index = archive.append(run, self._monitor_snapshot())
+        add_text_to_console("Saved run " + str(index) + " to " + archive.data_path)
+
     def save_measurement(self, filepath):
+        if filepath.endswith('.npy'):
+            self.save_archive(filepath)
+            return
         with open(filepath, 'w') as f:
             f.write('Two-Tone Test Report\n')
             f.write('Date,' + time.strftime("%m/%d/%Y", time.localtime()) + '\n')
@@ -434,6 +728,7 @@ class UserInterface:
         with dpg.file_dialog(directory_selector=False, show=False, callback=self._save_callback,
                              tag="save_as_dialog_id", width=700, height=400):
             dpg.add_file_extension(".csv", color=(0, 255, 0, 255), custom_text="[CSV]")
+            dpg.add_file_extension(".npy", color=(0, 255, 255, 255), custom_text="[Archive]")
 
         with dpg.window(label="Two Tone Test Program", tag="primary_window"):
             with dpg.menu_bar():
@@ -445,34 +740,48 @@ class UserInterface:
             with dpg.tab_bar(tag="tabs"):
                 self._make_pna_tab()
                 self._make_usb_tab()
+                self._make_telemetry_tab()
+                self._make_production_tab()
 
     def _make_pna_tab(self):
         """Create the layout for the PNA tab."""
         with dpg.tab(label="PNA", tag="pna_tab"):
             with dpg.group(horizontal=True):
                 with dpg.group(label="left side"):
-                    with dpg.child_window(label="connection_window", height=100, width=200):
+                    with dpg.child_window(label="connection_window", height=125, width=200):
                         dpg.add_text("PNA Connection Control")
+                        # Point this at TCPIP0::127.0.0.1::5025::SOCKET to use simulator.py instead
+                        dpg.add_input_text(tag="visa_address", default_value='GPIB0::16::INSTR', width=185)
                         dpg.add_button(label="Connect", tag="connect_button", enabled=True, show=True,
                                        callback=self.connect_pna, indent=55, width=60)
                         dpg.add_button(label="Disconnect", tag="disconnect_button", enabled=False, show=False,
                                        callback=self.disconnect_pna, indent=35, width=100)
-                    with dpg.child_window(label="calibration_window", height=150, width=200):
+                    with dpg.child_window(label="calibration_window", height=175, width=200):
                         dpg.add_text("Re-Calibrate PNA")
                         dpg.add_spacer()
                         dpg.add_text("Source Power (dBm)")
                         dpg.add_input_float(tag="cal_input", step=0, on_enter=True,
                                             callback=lambda: print('Check if input is valid'), min_value=-50,
                                             min_clamped=True, max_value=10, max_clamped=True)
+                        dpg.add_checkbox(label="Reuse saved cal", tag="reuse_cal_checkbox", default_value=True)
                         dpg.add_spacer(height=10)
                         dpg.add_button(label="Start", tag="start_cal_button", enabled=False,
                                        callback=self.start_calibration, indent=55, width=60)
-                    with dpg.child_window(label="measurement_window", height=75, width=200):
+                    with dpg.child_window(label="measurement_window", height=100, width=200):
                         dpg.add_button(label="Measure", tag="start_measure_button", enabled=False,
                                        callback=self.start_measurement, indent=55, width=60)
+                        dpg.add_button(label="Cancel", tag="cancel_measure_button", enabled=False,
+                                       callback=self.cancel_pna_job, indent=55, width=60)
                         dpg.add_button(label="Clear", tag="clear_graph_button", enabled=True,
-                                       callback=clear_graph, indent=55, width=60)
-                    with dpg.child_window(label="notes_window", height=400, width=200):
+                                       callback=self.clear_graph, indent=55, width=60)
+                    with dpg.child_window(label="atten_sweep_window", height=100, width=200):
+                        dpg.add_input_text(tag="atten_sweep_input", default_value='0, 5, 10, 15, 20', width=185,
+                                           hint="Attenuations (dB)")
+                        dpg.add_combo(("FTX", "FRX", "Both"), tag="atten_sweep_board", default_value="FTX",
+                                      width=185)
+                        dpg.add_button(label="Atten Sweep", tag="start_atten_sweep_button", enabled=False,
+                                       callback=self.start_atten_sweep, indent=45, width=90)
+                    with dpg.child_window(label="notes_window", height=225, width=200):
                         dpg.add_input_text(multiline=True, tag='notes_input', default_value='Fiber Length:\nBias T ' +
                                            'direct to laser\nLaser SN:\nLaser current:\nLaser wavelength:\nBias T ' +
                                            'direct to PD\nPD SN:\nPD current:\nopt attn:')
@@ -491,6 +800,8 @@ class UserInterface:
                         with dpg.plot(tag="IIP3 plot", width=690, height=300, show=False):
                             dpg.add_plot_axis(dpg.mvXAxis, label="Frequency (GHz)")
                             dpg.add_plot_axis(dpg.mvYAxis, label="IIP3 (dBm)", tag="iip3 y_axis")
+                    self.trace_plots = {trace: LivePlot(y_axis, TRACE_PLOT_HISTORY, TRACE_PLOT_WIDTH)
+                                        for trace, plot, y_axis in TRACE_PLOTS}
 
     def _make_usb_tab(self):
         """Create the layout for the USB-I2C control tab."""
@@ -598,19 +909,68 @@ class UserInterface:
                 dpg.add_text("Welcome to the console.")
                 dpg.add_text("Connect to the RF over Fiber boards to begin.")
 
+    def _make_telemetry_tab(self):
+        """Create the layout for the monitor telemetry tab."""
+        with dpg.tab(label="Telemetry", tag="telemetry_tab"):
+            with dpg.group(horizontal=True):
+                dpg.add_text("Sample Rate (Hz)")
+                dpg.add_input_float(tag="telemetry_rate", default_value=self.telemetry_rate, min_value=0.1,
+                                    max_value=100, step=1, callback=self._update_telemetry_rate, on_enter=True,
+                                    min_clamped=True, max_clamped=True, format='%.1f', width=150)
+                dpg.add_button(label="Export", callback=self._export_telemetry)
+            with dpg.plot(label="Currents", height=220, width=-1):
+                dpg.add_plot_legend()
+                dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)")
+                with dpg.plot_axis(dpg.mvYAxis, label="Current (mA)", tag="telemetry_current_y_axis"):
+                    dpg.add_line_series([], [], label="FTX Laser Current", tag="telemetry_ld_series")
+                    dpg.add_line_series([], [], label="FRX Photodiode Current", tag="telemetry_pd_series")
+            with dpg.plot(label="RF Monitors", height=220, width=-1):
+                dpg.add_plot_legend()
+                dpg.add_plot_axis(dpg.mvXAxis, label="Time (s)")
+                with dpg.plot_axis(dpg.mvYAxis, label="RF Monitor (dBm)", tag="telemetry_rf_y_axis"):
+                    dpg.add_line_series([], [], label="FTX", tag="telemetry_ftx_rf_series")
+                    dpg.add_line_series([], [], label="FRX", tag="telemetry_frx_rf_series")
+            dpg.add_text("", tag="telemetry_stats")
+
+    def _make_production_tab(self):
+        """Create the layout for running a lot of DUTs."""
+        with dpg.tab(label="Production", tag="production_tab"):
+            dpg.add_text("DUT serials, one per line. Leave empty to read each serial from the FTX EEPROM.")
+            dpg.add_input_text(multiline=True, tag="lot_serials", width=400, height=250)
+            with dpg.group(horizontal=True):
+                dpg.add_text("Checkpoint file")
+                dpg.add_input_text(tag="lot_checkpoint", default_value='lot_checkpoint.json', width=300)
+            with dpg.group(horizontal=True):
+                dpg.add_text("Output folder  ")
+                dpg.add_input_text(tag="lot_out_dir", default_value='lot', width=300)
+            dpg.add_button(label="Run Lot", tag="start_lot_button", enabled=False, callback=self.start_lot,
+                           width=100)
+            dpg.add_text("Cancel from the PNA tab. Finished DUTs are skipped when the lot is run again.")
+            dpg.add_text("", tag="lot_status")
+
     def _exit_callback(self):
-        if is_pna_connected():
+        # A job waiting on the render thread, e.g. for a msgbox answer, would never get one now, so cancel
+        # the running job and fail whatever it is waiting for here
+        self.pna_worker.cancel()
+        dispatcher.close()
+        # Let the job reach a cancellation point, so the session is not closed in the middle of its I/O
+        stopped = self.pna_worker.stop(WORKER_STOP_TIMEOUT)
+        if is_pna_connected() and stopped:
             self.pna.close_session()
             dpg.add_text('Disconnecting from the PNA...', parent=self._console_window_id)
 
         if self.frx is not None:
             dpg.add_text("Disconnecting from FRX board...",
                          parent=self._console_window_id)
+            self.frx_telemetry.stop()
+            self.buses.remove_bus('frx')
             self.i2c_receive.close()
             self.frx = None
         if self.ftx is not None:
             dpg.add_text("Disconnecting from FTX board...",
                          parent=self._console_window_id)
+            self.ftx_telemetry.stop()
+            self.buses.remove_bus('ftx')
             self.i2c_transmit.close()
             self.ftx = None
 
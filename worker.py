@@ -0,0 +1,87 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class Cancelled(Exception):
+    """Raised inside a running job once the worker has been asked to cancel it."""
+
+
+class InstrumentWorker:
+    """Runs instrument I/O jobs one at a time on a dedicated thread.
+
+    Jobs are queued with submit() and their results come back through a Future,
+    so the thread that submits them never waits on the bus. Long jobs should
+    call check_cancelled() between steps so cancel() can stop them early.
+    """
+
+    def __init__(self, name='instrument'):
+        self._jobs = queue.Queue()
+        self.cancel_event = threading.Event()
+        self._running = None
+        # Bumped by every cancel(), a job submitted before the last cancel never starts
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            self._jobs.put((future, fn, args, kwargs, self._generation))
+        return future
+
+    def is_current(self) -> bool:
+        """True when called from a job running on this worker."""
+        return threading.current_thread() is self._thread
+
+    def is_busy(self) -> bool:
+        return self._running is not None or not self._jobs.empty()
+
+    def cancel(self) -> None:
+        """Drops every queued job and asks the running one to stop."""
+        with self._lock:
+            self._generation += 1
+            while True:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    job[0].cancel()
+            # A job the worker has taken off the queue but not started yet is dropped by the generation check
+            if self._running is not None:
+                self.cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise Cancelled()
+
+    def stop(self, timeout=None) -> bool:
+        """Cancels all jobs and ends the thread, returns False if it is still running after timeout."""
+        self.cancel()
+        self._jobs.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            future, fn, args, kwargs, generation = job
+            with self._lock:
+                if generation != self._generation:
+                    future.cancel()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.cancel_event.clear()
+                self._running = future
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as ex:
+                future.set_exception(ex)
+            else:
+                future.set_result(result)
+            finally:
+                self._running = None